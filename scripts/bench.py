@@ -0,0 +1,404 @@
+#!/usr/bin/env python
+"""Benchmark the recommendation service against the latency-realistic local mock.
+
+Modes:
+  inproc   drive the FastAPI app in-process through its ASGI interface (no sockets)
+  uvicorn  start `uvicorn main:app --workers N` and drive it over HTTP/1.1 keep-alive
+  stages   time each stage of recommend_objective directly (no HTTP, no event loop)
+  compare  diff two result files
+
+Every run prints a summary and writes a JSON result to bench-results/<commit>-<mode>.json,
+so a regression shows up as `python scripts/bench.py compare old.json new.json`.
+
+Examples:
+  python scripts/bench.py inproc --requests 2000 --concurrency 64 --latency-ms 800 --tps 80
+  python scripts/bench.py uvicorn --workers 4 --concurrency 256 --latency-ms 800 --tail-rate 0.01
+  python scripts/bench.py stages --iterations 5000
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+SRC = ROOT / "src"
+API_KEY = "bench"
+MODEL_ID = "bench-model"
+
+
+# -------- helpers --------
+def percentile(sorted_values: list[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+
+def summarize(latencies: list[float]) -> dict:
+    values = sorted(latencies)
+    return {
+        "count": len(values),
+        "mean_ms": round(statistics.fmean(values) * 1000, 3) if values else 0.0,
+        "p50_ms": round(percentile(values, 50) * 1000, 3),
+        "p95_ms": round(percentile(values, 95) * 1000, 3),
+        "p99_ms": round(percentile(values, 99) * 1000, 3),
+        "max_ms": round(values[-1] * 1000, 3) if values else 0.0,
+    }
+
+
+def git_commit() -> str:
+    try:
+        sha = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--", "src"], cwd=ROOT, capture_output=True, text=True)
+        return sha + ("-dirty" if dirty.stdout.strip() else "")
+    except Exception:
+        return "unknown"
+
+
+def service_env(args) -> dict:
+    """Environment for an ENV=local service backed by the mock (no AWS calls)."""
+    env = dict(os.environ)
+    env.pop("SECRET_NAME", None)
+    env.update(
+        {
+            "ENV": "local",
+            "REGION": env.get("REGION") or "us-east-1",
+            "API_KEY": API_KEY,
+            "BEDROCK_MODEL_ID": MODEL_ID,
+            "MOCK_LATENCY_MS": str(args.latency_ms),
+            "MOCK_LATENCY_SIGMA": str(args.sigma),
+            "MOCK_TAIL_RATE": str(args.tail_rate),
+            "MOCK_TAIL_MULTIPLIER": str(args.tail_multiplier),
+            "MOCK_TOKENS_PER_SECOND": str(args.tps),
+            "MOCK_THROTTLE_RATE": str(args.throttle_rate),
+            "MOCK_ERROR_RATE": str(args.error_rate),
+        }
+    )
+    if args.replay:
+        env["MOCK_REPLAY_PATH"] = str(Path(args.replay).resolve())
+    return env
+
+
+def request_bodies(n: int, repeat_ratio: float) -> list[bytes]:
+    """n request bodies; repeat_ratio of them reuse a small pool (exercises cache/coalescing)."""
+    pool = max(1, int(n * (1 - repeat_ratio)))
+    return [
+        json.dumps(
+            {
+                "objective": f"What is this extra charge on bill {i % pool}?",
+                "context": {"persona": "telecom postpaid customer", "domain": "billing"},
+            }
+        ).encode("utf-8")
+        for i in range(n)
+    ]
+
+
+async def closed_loop(bodies: list[bytes], concurrency: int, send_one) -> dict:
+    """Run `concurrency` workers until bodies run out; returns latency/status stats."""
+    latencies: list[float] = []
+    statuses: dict[str, int] = {}
+    cursor = iter(bodies)
+
+    async def worker(worker_id: int):
+        for body in cursor:
+            started = time.perf_counter()
+            status = await send_one(worker_id, body)
+            elapsed = time.perf_counter() - started
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+            if status == 200:
+                latencies.append(elapsed)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    wall = time.perf_counter() - started
+    return {
+        "wall_seconds": round(wall, 3),
+        "throughput_rps": round(len(latencies) / wall, 2) if wall else 0.0,
+        "statuses": statuses,
+        "latency": summarize(latencies),
+    }
+
+
+# -------- stages --------
+def run_stages(iterations: int) -> dict:
+    """Per-stage timings of the recommend_objective pipeline against an instant mock."""
+    sys.path.insert(0, str(SRC))
+    from inference import recommendation as rec
+    from local.bedrock_client import BedrockClient as LocalBedrockClient
+
+    client = LocalBedrockClient(region_name="us-east-1")
+    payload = json.loads(request_bodies(1, 0.0)[0])
+    timings: dict[str, list[float]] = {
+        name: []
+        for name in ("validate_request", "build_prompt", "invoke", "extract", "parse")
+    }
+    clock = time.perf_counter
+    for _ in range(iterations):
+        t0 = clock()
+        req = rec.SimpleObjectiveRequest.model_validate(payload)
+        t1 = clock()
+        body = rec._build_request_body(req)
+        t2 = clock()
+        resp = client.invoke_model(MODEL_ID, body)
+        t3 = clock()
+        text = rec._extract_text_from_anthropic_bedrock(resp)
+        t4 = clock()
+        rec._validate_model_text(text)  # parse + validate in one pass
+        t5 = clock()
+        for name, seconds in zip(timings, (t1 - t0, t2 - t1, t3 - t2, t4 - t3, t5 - t4)):
+            timings[name].append(seconds)
+
+    return {
+        name: {
+            "mean_us": round(statistics.fmean(values) * 1e6, 2),
+            "p50_us": round(percentile(sorted(values), 50) * 1e6, 2),
+            "p99_us": round(percentile(sorted(values), 99) * 1e6, 2),
+        }
+        for name, values in timings.items()
+    }
+
+
+# -------- in-process (ASGI) --------
+async def run_inproc(args) -> dict:
+    os.environ.pop("SECRET_NAME", None)
+    os.environ.update(service_env(args))
+    os.chdir(SRC)
+    sys.path.insert(0, str(SRC))
+    import main  # noqa: E402  (configured from the environment above)
+
+    app = main.app
+    path = f"/{os.environ['ENV']}/recommendation"
+    headers = [
+        (b"host", b"bench"),
+        (b"content-type", b"application/json"),
+        (b"x-api-key", API_KEY.encode()),
+    ]
+
+    # lifespan startup
+    lifespan_in: asyncio.Queue = asyncio.Queue()
+    lifespan_out: asyncio.Queue = asyncio.Queue()
+    await lifespan_in.put({"type": "lifespan.startup"})
+    lifespan = asyncio.ensure_future(
+        app({"type": "lifespan", "asgi": {"version": "3.0"}}, lifespan_in.get, lifespan_out.put)
+    )
+    await lifespan_out.get()
+
+    async def send_one(_worker_id: int, body: bytes) -> int:
+        done = asyncio.Event()
+        delivered = False
+        status = 0
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "POST",
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": b"",
+            "root_path": "",
+            "headers": headers + [(b"content-length", str(len(body)).encode())],
+            "client": ("127.0.0.1", 0),
+            "server": ("bench", 80),
+        }
+
+        async def receive():
+            nonlocal delivered
+            if not delivered:
+                delivered = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            await done.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body" and not message.get("more_body"):
+                done.set()
+
+        await app(scope, receive, send)
+        done.set()
+        return status
+
+    bodies = request_bodies(args.requests, args.repeat_ratio)
+    if args.warmup:
+        await closed_loop(bodies[: args.warmup], min(args.concurrency, args.warmup), send_one)
+    result = await closed_loop(bodies, args.concurrency, send_one)
+
+    await lifespan_in.put({"type": "lifespan.shutdown"})
+    await lifespan_out.get()
+    await lifespan
+    return result
+
+
+# -------- uvicorn (real sockets, N workers) --------
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def run_uvicorn(args) -> dict:
+    port = args.port or free_port()
+    env = service_env(args)
+    path = f"/{env['ENV']}/recommendation"
+    proc = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "main:app",
+            "--host", "127.0.0.1", "--port", str(port),
+            "--workers", str(args.workers), "--log-level", "warning",
+        ],
+        cwd=SRC,
+        env={**env, "PYTHONPATH": str(SRC)},
+    )
+    connections: dict[int, tuple[asyncio.StreamReader, asyncio.StreamWriter]] = {}
+
+    async def send_one(worker_id: int, body: bytes) -> int:
+        if worker_id not in connections:
+            connections[worker_id] = await asyncio.open_connection("127.0.0.1", port)
+        reader, writer = connections[worker_id]
+        writer.write(
+            (
+                f"POST {path} HTTP/1.1\r\nHost: 127.0.0.1:{port}\r\n"
+                f"Content-Type: application/json\r\nX-API-Key: {API_KEY}\r\n"
+                f"Content-Length: {len(body)}\r\n\r\n"
+            ).encode()
+            + body
+        )
+        await writer.drain()
+        status_line = await reader.readline()
+        length = 0
+        keep_alive = True
+        while (line := await reader.readline()) not in (b"\r\n", b""):
+            name, _, value = line.decode("latin-1").partition(":")
+            if name.lower() == "content-length":
+                length = int(value)
+            elif name.lower() == "connection" and value.strip().lower() == "close":
+                keep_alive = False
+        await reader.readexactly(length)
+        if not keep_alive:
+            writer.close()
+            del connections[worker_id]
+        return int(status_line.split()[1]) if status_line else 0
+
+    try:
+        probe = request_bodies(1, 0.0)[0]
+        deadline = time.monotonic() + 60
+        while True:
+            try:
+                if await send_one(-1, probe) == 200:
+                    break
+            except OSError:
+                connections.pop(-1, None)
+            if time.monotonic() > deadline or proc.poll() is not None:
+                raise RuntimeError("uvicorn did not become ready")
+            await asyncio.sleep(0.2)
+
+        bodies = request_bodies(args.requests, args.repeat_ratio)
+        if args.warmup:
+            await closed_loop(bodies[: args.warmup], min(args.concurrency, args.warmup), send_one)
+        return await closed_loop(bodies, args.concurrency, send_one)
+    finally:
+        for _, writer in connections.values():
+            writer.close()
+        proc.terminate()
+        proc.wait(timeout=30)
+
+
+# -------- compare --------
+def compare(old_path: str, new_path: str) -> None:
+    old = json.loads(Path(old_path).read_text())
+    new = json.loads(Path(new_path).read_text())
+
+    def flatten(d: dict, prefix: str = "") -> dict:
+        out = {}
+        for k, v in d.items():
+            if isinstance(v, dict):
+                out.update(flatten(v, f"{prefix}{k}."))
+            elif isinstance(v, (int, float)):
+                out[f"{prefix}{k}"] = v
+        return out
+
+    a, b = flatten(old["results"]), flatten(new["results"])
+    print(f"{old['commit']} -> {new['commit']}")
+    for key in sorted(set(a) & set(b)):
+        delta = (b[key] - a[key]) / a[key] * 100 if a[key] else 0.0
+        print(f"  {key:45s} {a[key]:>12} -> {b[key]:>12}  ({delta:+.1f}%)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="mode", required=True)
+
+    for mode in ("inproc", "uvicorn"):
+        p = sub.add_parser(mode)
+        p.add_argument("--requests", type=int, default=1000)
+        p.add_argument("--concurrency", type=int, default=32)
+        p.add_argument("--warmup", type=int, default=50)
+        p.add_argument("--repeat-ratio", type=float, default=0.0, help="share of requests that repeat earlier ones")
+        p.add_argument("--latency-ms", type=float, default=0.0, help="mock median time to first token")
+        p.add_argument("--sigma", type=float, default=0.0, help="mock lognormal latency spread")
+        p.add_argument("--tail-rate", type=float, default=0.0)
+        p.add_argument("--tail-multiplier", type=float, default=10.0)
+        p.add_argument("--tps", type=float, default=0.0, help="mock output tokens per second (0 = instant)")
+        p.add_argument("--throttle-rate", type=float, default=0.0)
+        p.add_argument("--error-rate", type=float, default=0.0)
+        p.add_argument("--replay", help="JSONL of recorded Bedrock responses to replay")
+        p.add_argument("--stage-iterations", type=int, default=500)
+        p.add_argument("--out", help="result file (default bench-results/<commit>-<mode>.json)")
+        if mode == "uvicorn":
+            p.add_argument("--workers", type=int, default=2)
+            p.add_argument("--port", type=int, default=0)
+
+    p = sub.add_parser("stages")
+    p.add_argument("--iterations", type=int, default=2000)
+    p.add_argument("--out")
+
+    p = sub.add_parser("compare")
+    p.add_argument("old")
+    p.add_argument("new")
+
+    args = parser.parse_args()
+    if args.mode == "compare":
+        compare(args.old, args.new)
+        return
+
+    commit = git_commit()
+    if args.mode == "stages":
+        results = {"stages": run_stages(args.iterations)}
+        params = {"iterations": args.iterations}
+    else:
+        runner = run_inproc if args.mode == "inproc" else run_uvicorn
+        results = asyncio.run(runner(args))
+        results["stages"] = run_stages(args.stage_iterations)
+        params = {k: v for k, v in vars(args).items() if k not in ("mode", "out")}
+
+    record = {
+        "commit": commit,
+        "mode": args.mode,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": sys.version.split()[0],
+        "params": params,
+        "results": results,
+    }
+    out = Path(args.out) if args.out else ROOT / "bench-results" / f"{commit}-{args.mode}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(record, indent=2))
+    print(json.dumps(record["results"], indent=2))
+    print(f"wrote {out}")
+
+
+if __name__ == "__main__":
+    main()
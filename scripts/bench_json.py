@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+"""Micro-benchmark: CPU per request from Bedrock response bytes to API response bytes.
+
+"baseline" replays the decode chain used before the single-pass pipeline:
+bytes -> str -> json.loads -> extract text -> json.loads (find/rfind recovery) ->
+model_validate -> FastAPI-style re-validation, jsonable_encoder and json.dumps.
+"current" is what the service does now: fastjson.loads (orjson when installed) ->
+extract text -> model_validate_json (raw_decode recovery) -> model_dump_json.
+
+Examples:
+  python scripts/bench_json.py
+  python scripts/bench_json.py --iterations 50000
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from bench import MODEL_ID, ROOT, SRC, git_commit, request_bodies  # noqa: E402
+
+sys.path.insert(0, str(SRC))
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+
+from core import fastjson  # noqa: E402
+from inference import recommendation as rec  # noqa: E402
+from local.bedrock_client import BedrockClient as LocalBedrockClient  # noqa: E402
+
+
+def baseline(raw: bytes) -> bytes:
+    resp = json.loads(raw.decode("utf-8"))
+    text = rec._extract_text_from_anthropic_bedrock(resp)
+    try:
+        parsed = json.loads(text)
+    except json.JSONDecodeError:
+        parsed = json.loads(text[text.find("{") : text.rfind("}") + 1])
+    result = rec.SimpleRecommendResponse.model_validate(parsed)
+    # FastAPI with response_model: validate the return value again, encode, dump
+    checked = rec.SimpleRecommendResponse.model_validate(result.model_dump())
+    return json.dumps(jsonable_encoder(checked), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def current(raw: bytes) -> bytes:
+    resp = fastjson.loads(raw)
+    text = rec._extract_text_from_anthropic_bedrock(resp)
+    return rec._validate_model_text(text).model_dump_json().encode("utf-8")
+
+
+def bedrock_bytes(wrapped: bool) -> bytes:
+    body = rec._build_request_body(rec.SimpleObjectiveRequest.model_validate_json(request_bodies(1, 0.0)[0]))
+    resp = LocalBedrockClient(region_name="us-east-1").invoke_model(MODEL_ID, body)
+    if wrapped:
+        text = resp["content"][0]["text"]
+        resp["content"][0]["text"] = f"Here is the improved objective:\n{text}\nLet me know if you need more."
+    return json.dumps(resp).encode("utf-8")
+
+
+def cpu_us_per_call(fn, raw: bytes, iterations: int) -> float:
+    for _ in range(min(1000, iterations)):
+        fn(raw)
+    started = time.process_time()
+    for _ in range(iterations):
+        fn(raw)
+    return (time.process_time() - started) / iterations * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--out", help="result file (default bench-results/<commit>-json.json)")
+    args = parser.parse_args()
+
+    results = {}
+    for case, wrapped in (("clean", False), ("wrapped", True)):
+        raw = bedrock_bytes(wrapped)
+        assert json.loads(baseline(raw)) == json.loads(current(raw))
+        before = cpu_us_per_call(baseline, raw, args.iterations)
+        after = cpu_us_per_call(current, raw, args.iterations)
+        results[case] = {
+            "baseline_cpu_us": round(before, 2),
+            "current_cpu_us": round(after, 2),
+            "saving_pct": round((1 - after / before) * 100, 1),
+        }
+
+    commit = git_commit()
+    record = {
+        "commit": commit,
+        "mode": "json",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": sys.version.split()[0],
+        "params": {"iterations": args.iterations, "backend": fastjson.BACKEND},
+        "results": results,
+    }
+    out = Path(args.out) if args.out else ROOT / "bench-results" / f"{commit}-json.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(record, indent=2))
+    print(json.dumps(record["results"], indent=2))
+    print(f"wrote {out}")
+
+
+if __name__ == "__main__":
+    main()
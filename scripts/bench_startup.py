@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+"""Measure cold-start cost: `import main` time and uvicorn time-to-first-request.
+
+Each run is a fresh interpreter. By default the service runs as ENV=local against the
+mock; with --inherit-env it uses the caller's environment unchanged (SECRET_NAME,
+CONFIG_SNAPSHOT_PATH, STARTUP_PREWARM, ...), so snapshot and prewarm gains can be
+measured against real AWS.
+
+Examples:
+  python scripts/bench_startup.py --runs 10
+  SECRET_NAME=... REGION=... CONFIG_SNAPSHOT_PATH=/tmp/cfg.snap python scripts/bench_startup.py --inherit-env
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from bench import API_KEY, MODEL_ID, ROOT, SRC, free_port, git_commit, request_bodies  # noqa: E402
+
+
+def startup_env(args) -> dict:
+    env = dict(os.environ)
+    if not args.inherit_env:
+        env.pop("SECRET_NAME", None)
+        env.update(
+            {
+                "ENV": "local",
+                "REGION": env.get("REGION") or "us-east-1",
+                "API_KEY": API_KEY,
+                "BEDROCK_MODEL_ID": MODEL_ID,
+            }
+        )
+    env["PYTHONPATH"] = str(SRC)
+    return env
+
+
+def import_seconds(env: dict) -> float:
+    code = "import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)"
+    out = subprocess.run(
+        [sys.executable, "-c", code], cwd=SRC, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return float(out.strip().splitlines()[-1])
+
+
+def first_request_seconds(env: dict, timeout: float = 60.0) -> float:
+    """Spawn uvicorn and time until the first recommendation request returns 200."""
+    port = free_port()
+    path = f"/{env.get('ENV') or 'dev'}/recommendation"
+    body = request_bodies(1, 0.0)[0]
+    request = (
+        f"POST {path} HTTP/1.1\r\nHost: 127.0.0.1:{port}\r\nContent-Type: application/json\r\n"
+        f"X-API-Key: {env.get('API_KEY', '')}\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n"
+    ).encode() + body
+
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=SRC,
+        env=env,
+        stdout=subprocess.DEVNULL,
+    )
+    try:
+        while True:
+            try:
+                with socket.create_connection(("127.0.0.1", port), timeout=timeout) as sock:
+                    sock.sendall(request)
+                    status_line = sock.makefile("rb").readline()
+                if status_line.split()[1:2] == [b"200"]:
+                    return time.perf_counter() - started
+                raise RuntimeError(f"first request failed: {status_line.decode(errors='replace').strip()}")
+            except ConnectionRefusedError:
+                pass
+            if proc.poll() is not None or time.perf_counter() - started > timeout:
+                raise RuntimeError("uvicorn did not become ready")
+            time.sleep(0.005)
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+
+
+def summarize(values: list[float]) -> dict:
+    return {
+        "runs": len(values),
+        "median_ms": round(statistics.median(values) * 1000, 1),
+        "min_ms": round(min(values) * 1000, 1),
+        "max_ms": round(max(values) * 1000, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--inherit-env", action="store_true", help="use the caller's environment as-is")
+    parser.add_argument("--out", help="result file (default bench-results/<commit>-startup.json)")
+    args = parser.parse_args()
+
+    env = startup_env(args)
+    imports = [import_seconds(env) for _ in range(args.runs)]
+    first_requests = [first_request_seconds(env) for _ in range(args.runs)]
+
+    commit = git_commit()
+    record = {
+        "commit": commit,
+        "mode": "startup",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": sys.version.split()[0],
+        "params": {"runs": args.runs, "inherit_env": args.inherit_env},
+        "results": {
+            "import_main": summarize(imports),
+            "time_to_first_request": summarize(first_requests),
+        },
+    }
+    out = Path(args.out) if args.out else ROOT / "bench-results" / f"{commit}-startup.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(record, indent=2))
+    print(json.dumps(record["results"], indent=2))
+    print(f"wrote {out}")
+
+
+if __name__ == "__main__":
+    main()
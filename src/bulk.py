@@ -0,0 +1,322 @@
+"""Bulk recommendations from a JSONL file, resumable after a crash or Ctrl-C.
+
+Each input line is a SimpleObjectiveRequest (an extra "id" field is copied to the
+output). Results are appended to the output JSONL as they finish, in completion order,
+each tagged with its input line number:
+
+    {"line": 0, "id": "tc-17", "status": "ok", "result": {...}}
+    {"line": 1, "status": "error", "error": "..."}
+
+Progress is checkpointed next to the output as a watermark (input byte offset below
+which every line is finished) plus the finished line numbers above it; at most
+--window lines are read ahead of the watermark, so memory stays constant however big
+the input is. On restart the output is truncated to the checkpointed size and the
+run continues from the watermark, skipping lines already finished. While the Bedrock
+circuit breaker is open, workers wait for it to close instead of failing their lines.
+
+Usage (with src/ on PYTHONPATH, configured like the service - env vars or SECRET_NAME):
+    python -m bulk objectives.jsonl results.jsonl --workers 16 --rps 5
+    python -m bulk objectives.jsonl results.jsonl --mode thread --workers 8
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Iterator
+
+from core import fastjson
+from core.breaker import CircuitOpen
+from core.config import Config
+from inference.recommendation import arecommend_objective, recommend_objective
+from runtime import Runtime, build_runtime
+
+
+class RateLimiter:
+    """Spaces item starts at least 1/rps apart across all workers (rps=0: unlimited)."""
+
+    def __init__(self, rps: float):
+        self.interval = 1.0 / rps if rps > 0 else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            at = max(now, self._next)
+            self._next = at + self.interval
+            return at - now
+
+    def wait(self) -> None:
+        delay = self._reserve() if self.interval else 0.0
+        if delay > 0:
+            time.sleep(delay)
+
+    async def await_turn(self) -> None:
+        delay = self._reserve() if self.interval else 0.0
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class Progress:
+    """Input lines finished so far, as a watermark plus the finished lines above it."""
+
+    def __init__(self, checkpoint_path: str, line: int = 0, input_offset: int = 0, done: list[int] = ()):
+        self.checkpoint_path = checkpoint_path
+        self.watermark = line
+        self.input_offset = input_offset
+        self.done = set(done)
+        self.offsets: dict[int, int] = {}  # line -> byte offset, for lines at/above the watermark
+        self.read_offset = input_offset
+        self.ok = 0
+        self.failed = 0
+        self.skipped = 0
+        self.lock = threading.Lock()
+        self.window_open = threading.Condition(self.lock)
+
+    @classmethod
+    def load(cls, checkpoint_path: str) -> Progress | None:
+        try:
+            with open(checkpoint_path, encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        progress = cls(checkpoint_path, data["line"], data["input_offset"], data["done"])
+        progress.output_offset = data["output_offset"]
+        return progress
+
+    def read(self, line: int, offset: int, next_offset: int) -> None:
+        self.offsets[line] = offset
+        self.read_offset = next_offset
+
+    def finish(self, line: int) -> None:
+        """Caller holds self.lock."""
+        self.done.add(line)
+        while self.watermark in self.done:
+            self.done.remove(self.watermark)
+            self.offsets.pop(self.watermark, None)
+            self.watermark += 1
+        self.input_offset = self.offsets.get(self.watermark, self.read_offset)
+        self.window_open.notify_all()
+
+    def save(self, sink: BinaryIO) -> None:
+        """Caller holds self.lock. Output is synced first so the checkpoint never runs ahead of it."""
+        sink.flush()
+        os.fsync(sink.fileno())
+        data = {
+            "line": self.watermark,
+            "input_offset": self.input_offset,
+            "output_offset": sink.tell(),
+            "done": sorted(self.done),
+        }
+        tmp = self.checkpoint_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp, self.checkpoint_path)
+
+
+class BulkRun:
+    def __init__(self, args, runtime: Runtime, source: BinaryIO, sink: BinaryIO, progress: Progress):
+        self.args = args
+        self.runtime = runtime
+        self.source = source
+        self.sink = sink
+        self.progress = progress
+        self.rate = RateLimiter(args.rps)
+        self._last_save = time.monotonic()
+
+    def lines(self) -> Iterator[tuple[int, bytes]]:
+        """Unfinished input lines, never more than --window ahead of the watermark."""
+        progress = self.progress
+        line = progress.watermark
+        self.source.seek(progress.input_offset)
+        while True:
+            offset = self.source.tell()
+            raw = self.source.readline()
+            if not raw:
+                return
+            with progress.lock:
+                progress.read(line, offset, self.source.tell())
+                if line in progress.done or not raw.strip():
+                    progress.skipped += 1
+                    progress.done.discard(line)
+                    progress.finish(line)
+                    line += 1
+                    continue
+            yield line, raw
+            line += 1
+
+    def wait_for_window(self, line: int) -> None:
+        with self.progress.window_open:
+            self.progress.window_open.wait_for(lambda: line - self.progress.watermark < self.args.window)
+
+    def pipeline_options(self) -> dict:
+        return {
+            "bedrock_client": self.runtime.bedrock_client,
+            "model_id": self.runtime.primary_model_id,
+            "cache": self.runtime.cache,
+            "near_duplicates": self.runtime.near_duplicates,
+            "cascade": self.runtime.cascade,
+            "use_cache": not self.args.no_cache,
+            "prompt": self.runtime.prompt_options,
+        }
+
+    def record(self, line: int, payload: dict | None, result=None, error: Exception | None = None) -> None:
+        out: dict = {"line": line}
+        if isinstance(payload, dict) and "id" in payload:
+            out["id"] = payload["id"]
+        if error is None:
+            out["status"] = "ok"
+            out["result"] = result.model_dump()
+        else:
+            out["status"] = "error"
+            out["error"] = f"{type(error).__name__}: {error}"
+        encoded = fastjson.dumps(out) + b"\n"
+
+        progress = self.progress
+        with progress.lock:
+            self.sink.write(encoded)
+            if error is None:
+                progress.ok += 1
+            else:
+                progress.failed += 1
+            progress.finish(line)
+            now = time.monotonic()
+            if now - self._last_save >= self.args.checkpoint_seconds:
+                progress.save(self.sink)
+                self._last_save = now
+
+    def save(self) -> None:
+        with self.progress.lock:
+            self.progress.save(self.sink)
+
+    # -------- thread pool --------
+    def run_threads(self) -> None:
+        options = self.pipeline_options()
+        slots = threading.BoundedSemaphore(self.args.workers)
+
+        def work(line: int, raw: bytes) -> None:
+            payload = None
+            try:
+                payload = fastjson.loads(raw)
+                while True:
+                    self.rate.wait()
+                    try:
+                        result = recommend_objective(payload, **options)
+                        break
+                    except CircuitOpen as e:
+                        time.sleep(e.retry_after)
+            except Exception as e:
+                self.record(line, payload, error=e)
+            else:
+                self.record(line, payload, result)
+            finally:
+                slots.release()
+
+        with ThreadPoolExecutor(self.args.workers, thread_name_prefix="bulk") as pool:
+            for line, raw in self.lines():
+                self.wait_for_window(line)
+                slots.acquire()
+                pool.submit(work, line, raw)
+
+    # -------- asyncio --------
+    async def run_async(self) -> None:
+        options = {**self.pipeline_options(), "batcher": self.runtime.batcher}
+        slots = asyncio.Semaphore(self.args.workers)
+        tasks: set[asyncio.Task] = set()
+
+        async def work(line: int, raw: bytes) -> None:
+            payload = None
+            try:
+                payload = fastjson.loads(raw)
+                while True:
+                    await self.rate.await_turn()
+                    try:
+                        result = await arecommend_objective(payload, **options)
+                        break
+                    except CircuitOpen as e:
+                        await asyncio.sleep(e.retry_after)
+            except Exception as e:
+                self.record(line, payload, error=e)
+            else:
+                self.record(line, payload, result)
+            finally:
+                slots.release()
+
+        try:
+            for line, raw in self.lines():
+                # the window only closes while tasks are running, and they finish on this loop
+                while line - self.progress.watermark >= self.args.window:
+                    await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                await slots.acquire()
+                task = asyncio.create_task(work(line, raw))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.wait(tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="JSONL of SimpleObjectiveRequest records")
+    parser.add_argument("output", help="JSONL results (appended; truncated to the checkpoint on resume)")
+    parser.add_argument("--mode", choices=("async", "thread"), default="async")
+    parser.add_argument("--workers", type=int, default=8, help="items in flight")
+    parser.add_argument("--rps", type=float, default=0.0, help="max items started per second (0 = no cap)")
+    parser.add_argument("--window", type=int, default=0, help="max lines read ahead of the watermark (default 4x workers)")
+    parser.add_argument("--checkpoint", help="checkpoint file (default <output>.checkpoint)")
+    parser.add_argument("--checkpoint-seconds", type=float, default=1.0)
+    parser.add_argument("--no-cache", action="store_true", help="always call Bedrock (results are still cached)")
+    parser.add_argument("--fresh", action="store_true", help="ignore any checkpoint and start over")
+    args = parser.parse_args(argv)
+    args.window = args.window or args.workers * 4
+    checkpoint = args.checkpoint or args.output + ".checkpoint"
+
+    progress = None if args.fresh else Progress.load(checkpoint)
+    if progress is None:
+        progress = Progress(checkpoint)
+        progress.output_offset = 0
+    elif progress.watermark:
+        print(f"Resuming at line {progress.watermark} ({len(progress.done)} later lines already done)", file=sys.stderr)
+
+    runtime = build_runtime(Config.load_config())
+    if not runtime.primary_model_id:
+        print("BEDROCK_MODEL_ID is not configured", file=sys.stderr)
+        return 2
+
+    started = time.monotonic()
+    with open(args.input, "rb") as source, open(args.output, "ab+") as sink:
+        sink.truncate(progress.output_offset)
+        sink.seek(progress.output_offset)
+        run = BulkRun(args, runtime, source, sink, progress)
+        try:
+            if args.mode == "async":
+                asyncio.run(run.run_async())
+            else:
+                run.run_threads()
+        except KeyboardInterrupt:
+            print("Interrupted; progress saved, rerun the same command to resume", file=sys.stderr)
+            return 130
+        finally:
+            run.save()
+            runtime.close()
+
+    elapsed = time.monotonic() - started
+    print(
+        f"done: {progress.ok} ok, {progress.failed} failed, {progress.skipped} skipped in {elapsed:.1f}s",
+        file=sys.stderr,
+    )
+    return 0 if progress.failed == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
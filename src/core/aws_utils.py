@@ -1,4 +1,3 @@
-import boto3
 import json
 from botocore.exceptions import ClientError
 
@@ -8,19 +7,23 @@ class AwsUtils:
         self.region_name = region_name
         self.aws_endpoint_url = aws_endpoint_url
 
-    def get_secrets(self, secret_name):
+    def secrets_client(self):
+        import boto3  # deferred: importing boto3 costs more than the rest of startup
+
         session = boto3.session.Session()
         if self.aws_endpoint_url:
-            client = session.client(
+            return session.client(
                 service_name="secretsmanager",
                 region_name=self.region_name,
                 endpoint_url=self.aws_endpoint_url,
             )
-        else:
-            client = session.client(
-                service_name="secretsmanager",
-                region_name=self.region_name,
-            )
+        return session.client(
+            service_name="secretsmanager",
+            region_name=self.region_name,
+        )
+
+    def get_secrets(self, secret_name):
+        client = self.secrets_client()
 
         try:
             get_secret_value_response = client.get_secret_value(SecretId=secret_name)
@@ -4,25 +4,37 @@ Use this in non-dev environments when you want to reach Bedrock using temporary
 credentials minted via Cognito (User Pool -> Identity Pool).
 
 This keeps dev simple (use the local mock), and avoids long-lived AWS access keys.
+
+Credentials live in a botocore RefreshableCredentials attached to one long-lived
+bedrock-runtime client, so rotating them never drops pooled TLS connections. A
+background thread logs in ahead of expiry; requests only ever wait for a login on
+the very first call (or if the background refresh keeps failing).
 """
 
 from __future__ import annotations
 
+import asyncio
 import base64
+import functools
 import hashlib
 import hmac
-import json
+import threading
+import logging
 import time
-from dataclasses import dataclass
-from typing import Any
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Iterator
 
 import boto3
+import botocore.session
+from botocore.config import Config as BotoConfig
+from botocore.credentials import RefreshableCredentials
 
+from . import fastjson
+from .metrics import record_stage
+from .shared_store import SharedStore
 
-@dataclass
-class _CachedBedrock:
-    client: Any
-    exp_epoch: float
+logger = logging.getLogger(__name__)
 
 
 class BedrockClient:
@@ -34,12 +46,48 @@ class BedrockClient:
         config: dict,
         endpoint_url: str | None = None,
         refresh_skew_seconds: int = 60,
+        max_concurrency: int = 32,
+        background_refresh_seconds: int = 300,
+        credentials_from: BedrockClient | None = None,
+        shared_store: SharedStore | None = None,
     ):
         self.region_name = region_name
         self.endpoint_url = endpoint_url
         self.config = config
+        # botocore refreshes on the request path only inside this window (mandatory at
+        # the skew, advisory at twice it); the background thread refreshes well before.
         self.refresh_skew_seconds = refresh_skew_seconds
-        self._cached: _CachedBedrock | None = None
+        self.background_refresh_seconds = background_refresh_seconds
+        self.max_concurrency = max_concurrency
+
+        self._client = None
+        self._client_lock = threading.Lock()
+        self._idp = None
+        self._identity = None
+        self._refresh_lock = threading.Lock()
+        self._latest: dict | None = None
+        self._latest_exp_epoch = 0.0
+        self._stop = threading.Event()
+        self._refresher: threading.Thread | None = None
+        # Cognito creds are plain IAM creds, valid in every region: clients for other
+        # regions (see for_region) borrow them instead of logging in again.
+        self._credential_source = credentials_from or self
+        # Worker processes on one host share credentials through this store, so only one
+        # of them logs in per rotation.
+        self._shared_store = shared_store
+
+        self.refresh_count = 0
+        self.refresh_failures = 0
+        self.refresh_seconds_total = 0.0
+        self.last_refresh_seconds = 0.0
+        self.shared_adoptions = 0
+
+        # boto3 is blocking; the async path parks calls on this pool so the event
+        # loop stays free. Sized with the HTTP pool so threads never wait on sockets.
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_concurrency,
+            thread_name_prefix="bedrock",
+        )
 
     # -------- Cognito helpers --------
     def _compute_secret_hash(self, username: str) -> str | None:
@@ -77,7 +125,10 @@ class BedrockClient:
                 "Missing required Cognito config keys: " + ", ".join(missing)
             )
 
-        idp = boto3.client("cognito-idp", region_name=self.region_name)
+        if self._idp is None:
+            self._idp = boto3.client("cognito-idp", region_name=self.region_name)
+            self._identity = boto3.client("cognito-identity", region_name=self.region_name)
+        idp = self._idp
         auth_params: dict[str, str] = {"USERNAME": username, "PASSWORD": password}
         secret_hash = self._compute_secret_hash(username)
         if secret_hash:
@@ -91,7 +142,7 @@ class BedrockClient:
         id_token = auth["AuthenticationResult"]["IdToken"]
 
         provider = f"cognito-idp.{self.region_name}.amazonaws.com/{user_pool_id}"
-        ident = boto3.client("cognito-identity", region_name=self.region_name)
+        ident = self._identity
         identity_id = ident.get_id(
             IdentityPoolId=identity_pool_id,
             Logins={provider: id_token},
@@ -111,26 +162,172 @@ class BedrockClient:
         exp_epoch = exp.timestamp() if hasattr(exp, "timestamp") else (time.time() + 900)
         return access_key, secret_key, session_token, float(exp_epoch)
 
+    # -------- Credential refresh --------
+    def _fetch_credentials(self, min_ttl_seconds: float) -> dict:
+        """Return botocore credential metadata valid for at least min_ttl_seconds.
+
+        Single-flight: concurrent callers queue on the lock and reuse whatever the
+        first caller fetched instead of each logging in. With a shared store the same
+        holds across processes: the first one to take the store's lock logs in and
+        publishes, the others wait on the lock and adopt what it published.
+        """
+        with self._refresh_lock:
+            if self._latest and self._latest_exp_epoch - time.time() > min_ttl_seconds:
+                return self._latest
+            if self._shared_store is None:
+                return self._login()
+
+            if self._adopt_shared(min_ttl_seconds):
+                return self._latest
+            with self._shared_store.lock("cognito-refresh"):
+                if self._adopt_shared(min_ttl_seconds):
+                    return self._latest
+                latest = self._login()
+                self._shared_store.set(self._shared_key(), latest, self._latest_exp_epoch)
+                return latest
+
+    def _login(self) -> dict:
+        started = time.monotonic()
+        try:
+            access_key, secret_key, session_token, exp_epoch = self._get_temp_credentials()
+        except Exception:
+            self.refresh_failures += 1
+            raise
+        finally:
+            self.last_refresh_seconds = time.monotonic() - started
+            self.refresh_seconds_total += self.last_refresh_seconds
+            record_stage("cognito_refresh", self.last_refresh_seconds)
+
+        self.refresh_count += 1
+        self._latest_exp_epoch = exp_epoch
+        self._latest = {
+            "access_key": access_key,
+            "secret_key": secret_key,
+            "token": session_token,
+            "expiry_time": datetime.fromtimestamp(exp_epoch, tz=timezone.utc).isoformat(),
+        }
+        return self._latest
+
+    def _shared_key(self) -> str:
+        identity = "\0".join(
+            str(self.config.get(k) or "")
+            for k in ("user_pool_id", "client_id", "identity_pool_id", "cognito_username")
+        )
+        return "cognito-credentials:" + hashlib.sha256(identity.encode("utf-8")).hexdigest()[:16]
+
+    def _adopt_shared(self, min_ttl_seconds: float) -> bool:
+        shared = self._shared_store.get(self._shared_key())
+        if not shared:
+            return False
+        exp_epoch = datetime.fromisoformat(shared["expiry_time"]).timestamp()
+        if exp_epoch - time.time() <= min_ttl_seconds:
+            return False
+        self._latest = shared
+        self._latest_exp_epoch = exp_epoch
+        self.shared_adoptions += 1
+        return True
+
+    def _ensure_refresher(self) -> None:
+        with self._refresh_lock:
+            if self._refresher is None:
+                self._refresher = threading.Thread(
+                    target=self._refresh_loop,
+                    name="cognito-credential-refresh",
+                    daemon=True,
+                )
+                self._refresher.start()
+
+    def _refresh_loop(self) -> None:
+        backoff = 1.0
+        while not self._stop.is_set():
+            lead = self._latest_exp_epoch - self.background_refresh_seconds - time.time()
+            if lead > 0:
+                self._stop.wait(lead)
+                continue
+            try:
+                self._fetch_credentials(self.background_refresh_seconds)
+                backoff = 1.0
+            except Exception:
+                logger.exception("Background Cognito credential refresh failed")
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, 60.0)
+
+    def credential_stats(self) -> dict:
+        return {
+            "refresh_count": self.refresh_count,
+            "refresh_failures": self.refresh_failures,
+            "refresh_seconds_total": self.refresh_seconds_total,
+            "last_refresh_seconds": self.last_refresh_seconds,
+            "shared_adoptions": self.shared_adoptions,
+            "expires_in_seconds": max(0.0, self._latest_exp_epoch - time.time()),
+        }
+
+    def close(self) -> None:
+        self._stop.set()
+        self._executor.shutdown(wait=False)
+
     # -------- Bedrock runtime --------
     def _get_bedrock_client(self):
-        now = time.time()
-        if self._cached and now < (self._cached.exp_epoch - self.refresh_skew_seconds):
-            return self._cached.client
-
-        access_key, secret_key, session_token, exp_epoch = self._get_temp_credentials()
-        kwargs: dict[str, Any] = {
-            "service_name": "bedrock-runtime",
-            "region_name": self.region_name,
-            "aws_access_key_id": access_key,
-            "aws_secret_access_key": secret_key,
-            "aws_session_token": session_token,
-        }
-        if self.endpoint_url:
-            kwargs["endpoint_url"] = self.endpoint_url
+        if self._client is not None:
+            return self._client
+
+        with self._client_lock:
+            if self._client is not None:
+                return self._client
+
+            source = self._credential_source
+            credentials = RefreshableCredentials.create_from_metadata(
+                metadata=source._fetch_credentials(self.refresh_skew_seconds),
+                refresh_using=lambda: source._fetch_credentials(self.refresh_skew_seconds * 2),
+                method="cognito-identity",
+                advisory_timeout=self.refresh_skew_seconds * 2,
+                mandatory_timeout=self.refresh_skew_seconds,
+            )
+            session = botocore.session.get_session()
+            session._credentials = credentials
+
+            kwargs: dict[str, Any] = {
+                "service_name": "bedrock-runtime",
+                "region_name": self.region_name,
+                "config": BotoConfig(max_pool_connections=self.max_concurrency),
+            }
+            if self.endpoint_url:
+                kwargs["endpoint_url"] = self.endpoint_url
+
+            self._client = boto3.session.Session(botocore_session=session).client(**kwargs)
+            source._ensure_refresher()
+            return self._client
+
+    def prewarm(self, connections: int = 1) -> None:
+        """Log in, build the client and open TLS connections before the first request.
 
-        client = boto3.client(**kwargs)
-        self._cached = _CachedBedrock(client=client, exp_epoch=exp_epoch)
-        return client
+        The connections are parked in botocore's pool, so the first invoke_model skips
+        the handshake. Reaches into botocore internals; failures only cost the warm-up.
+        """
+        client = self._get_bedrock_client()
+        url = client.meta.endpoint_url
+        try:
+            pool = client._endpoint.http_session._get_connection_manager(url).connection_from_url(url)
+            opened = [pool._get_conn() for _ in range(min(connections, self.max_concurrency))]
+            for conn in opened:
+                conn.connect()
+            for conn in opened:
+                pool._put_conn(conn)
+        except Exception:
+            logger.warning("Could not pre-open Bedrock connections to %s", url, exc_info=True)
+
+    def for_region(self, region_name: str) -> BedrockClient:
+        """Bedrock client for another region sharing this client's Cognito credentials."""
+        if region_name == self.region_name:
+            return self
+        return BedrockClient(
+            region_name=region_name,
+            config=self.config,
+            refresh_skew_seconds=self.refresh_skew_seconds,
+            max_concurrency=self.max_concurrency,
+            background_refresh_seconds=self.background_refresh_seconds,
+            credentials_from=self._credential_source,
+        )
 
     def invoke_model(
         self,
@@ -141,7 +338,7 @@ class BedrockClient:
     ) -> dict:
         """Invoke the model. body can be a dict (JSON-serialized) or bytes."""
         if isinstance(body, dict):
-            body = json.dumps(body).encode("utf-8")
+            body = fastjson.dumps(body)
 
         response = self._get_bedrock_client().invoke_model(
             modelId=model_id,
@@ -151,5 +348,83 @@ class BedrockClient:
         )
         response_body = response["body"].read()
         if accept == "application/json":
-            return json.loads(response_body.decode("utf-8"))
-        return {"raw": response_body.decode("utf-8")}
\ No newline at end of file
+            return fastjson.loads(response_body)
+        return {"raw": response_body.decode("utf-8")}
+
+    async def ainvoke_model(
+        self,
+        model_id: str,
+        body: dict | bytes,
+        content_type: str = "application/json",
+        accept: str = "application/json",
+    ) -> dict:
+        """Async invoke_model: runs the blocking call (and any Cognito login) off the event loop."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor,
+            functools.partial(self.invoke_model, model_id, body, content_type, accept),
+        )
+
+    def invoke_model_stream(
+        self,
+        model_id: str,
+        body: dict | bytes,
+        content_type: str = "application/json",
+        accept: str = "application/json",
+    ) -> Iterator[dict]:
+        """Invoke with response streaming; yields each decoded model event as it arrives."""
+        if isinstance(body, dict):
+            body = fastjson.dumps(body)
+
+        response = self._get_bedrock_client().invoke_model_with_response_stream(
+            modelId=model_id,
+            body=body,
+            contentType=content_type,
+            accept=accept,
+        )
+        stream = response["body"]
+        try:
+            for event in stream:
+                chunk = event.get("chunk")
+                if chunk:
+                    yield fastjson.loads(chunk["bytes"])
+        finally:
+            stream.close()
+
+    async def ainvoke_model_stream(
+        self,
+        model_id: str,
+        body: dict | bytes,
+        content_type: str = "application/json",
+        accept: str = "application/json",
+    ) -> AsyncIterator[dict]:
+        """Async invoke_model_stream: the blocking stream is drained on the worker pool
+        and events are handed to the event loop as they arrive."""
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        stop = threading.Event()
+        end = object()
+
+        def pump():
+            try:
+                for event in self.invoke_model_stream(model_id, body, content_type, accept):
+                    if stop.is_set():
+                        break
+                    loop.call_soon_threadsafe(queue.put_nowait, (event, None))
+                loop.call_soon_threadsafe(queue.put_nowait, (end, None))
+            except Exception as e:
+                loop.call_soon_threadsafe(queue.put_nowait, (end, e))
+
+        pumping = loop.run_in_executor(self._executor, pump)
+        try:
+            while True:
+                event, error = await queue.get()
+                if error is not None:
+                    raise error
+                if event is end:
+                    break
+                yield event
+        finally:
+            # Caller stopped early (e.g. client disconnected): let the pump close the stream
+            stop.set()
+            await asyncio.shield(pumping)
\ No newline at end of file
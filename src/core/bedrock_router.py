@@ -0,0 +1,287 @@
+"""Latency-aware routing across several Bedrock endpoints.
+
+An endpoint is a (region, model id) pair - typically the same model reached through
+different regions or cross-region inference profiles. The router sends each call to
+the endpoint with the best recent latency/error score (EWMA), fails over to the next
+one on throttling, 5xx or connection errors, and takes an endpoint out of rotation
+for a cooldown after repeated failures.
+"""
+
+from __future__ import annotations
+
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, Iterator
+
+from botocore.exceptions import ConnectionError as BotoConnectionError
+from botocore.exceptions import ReadTimeoutError
+
+RETRYABLE_ERROR_CODES = {
+    "ThrottlingException",
+    "TooManyRequestsException",
+    "ServiceUnavailableException",
+    "InternalServerException",
+    "ModelNotReadyException",
+    "ModelTimeoutException",
+}
+
+
+def is_throttle(exc: BaseException) -> bool:
+    response = getattr(exc, "response", None)
+    if not isinstance(response, dict):
+        return False
+    code = (response.get("Error") or {}).get("Code")
+    status = (response.get("ResponseMetadata") or {}).get("HTTPStatusCode") or 0
+    return code in ("ThrottlingException", "TooManyRequestsException") or status == 429
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Errors another endpoint may not have: throttling, 5xx, connection trouble."""
+    if isinstance(exc, (BotoConnectionError, ReadTimeoutError)):
+        return True
+    response = getattr(exc, "response", None)
+    if not isinstance(response, dict):
+        return False
+    code = (response.get("Error") or {}).get("Code")
+    status = (response.get("ResponseMetadata") or {}).get("HTTPStatusCode") or 0
+    return code in RETRYABLE_ERROR_CODES or status == 429 or status >= 500
+
+
+@dataclass
+class Endpoint:
+    region: str
+    model_id: str | None
+    client: Any
+    ewma_latency: float | None = None
+    ewma_error: float = 0.0
+    consecutive_failures: int = 0
+    ejected_until: float = 0.0
+    requests: int = 0
+    failures: int = 0
+    throttles: int = 0
+    ejections: int = 0
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    @property
+    def name(self) -> str:
+        return f"{self.region}/{self.model_id or '*'}"
+
+    def score(self) -> float:
+        # Unmeasured endpoints score 0 so they get tried; errors inflate latency
+        return (self.ewma_latency or 0.0) * (1.0 + 4.0 * self.ewma_error)
+
+
+class BedrockRouter:
+    """Drop-in for a Bedrock client that spreads calls over several endpoints.
+
+    When the caller asks for the router's primary model_id, each endpoint substitutes
+    its own model id (if it has one), so per-region inference profiles work. Any other
+    model id is sent as-is to whichever region is chosen.
+    """
+
+    def __init__(
+        self,
+        endpoints: list[tuple[str, str | None]],
+        client_factory: Callable[[str], Any],
+        model_id: str | None = None,
+        alpha: float = 0.3,
+        eject_after_failures: int = 2,
+        cooldown_seconds: float = 30.0,
+        explore_ratio: float = 0.05,
+    ):
+        if not endpoints:
+            raise ValueError("BedrockRouter needs at least one endpoint")
+        clients: dict[str, Any] = {}
+        self.endpoints: list[Endpoint] = []
+        for region, endpoint_model_id in endpoints:
+            if region not in clients:
+                clients[region] = client_factory(region)
+            self.endpoints.append(Endpoint(region, endpoint_model_id, clients[region]))
+        self.model_id = model_id
+        self.alpha = alpha
+        self.eject_after_failures = eject_after_failures
+        self.cooldown_seconds = cooldown_seconds
+        self.explore_ratio = explore_ratio
+        self.failovers = 0
+
+    # -------- selection / bookkeeping --------
+    def _ranked(self) -> list[Endpoint]:
+        now = time.monotonic()
+        healthy = [e for e in self.endpoints if e.ejected_until <= now]
+        ejected = sorted(
+            (e for e in self.endpoints if e.ejected_until > now),
+            key=lambda e: e.ejected_until,
+        )
+        # stable sort keeps the configured order as the tie-breaker
+        healthy.sort(key=Endpoint.score)
+        if len(healthy) > 1 and random.random() < self.explore_ratio:
+            # occasionally probe a non-preferred endpoint so its stats stay current
+            healthy.insert(0, healthy.pop(random.randrange(1, len(healthy))))
+        # everything ejected: still try, soonest-to-recover first
+        return healthy + ejected
+
+    def _model_for(self, endpoint: Endpoint, model_id: str) -> str:
+        if endpoint.model_id and (self.model_id is None or model_id == self.model_id):
+            return endpoint.model_id
+        return model_id
+
+    def _record_success(self, endpoint: Endpoint, seconds: float) -> None:
+        with endpoint.lock:
+            endpoint.requests += 1
+            endpoint.consecutive_failures = 0
+            endpoint.ewma_error *= 1.0 - self.alpha
+            if endpoint.ewma_latency is None:
+                endpoint.ewma_latency = seconds
+            else:
+                endpoint.ewma_latency += self.alpha * (seconds - endpoint.ewma_latency)
+
+    def _record_failure(self, endpoint: Endpoint, exc: BaseException) -> None:
+        with endpoint.lock:
+            endpoint.requests += 1
+            endpoint.failures += 1
+            endpoint.ewma_error += self.alpha * (1.0 - endpoint.ewma_error)
+            endpoint.consecutive_failures += 1
+            if is_throttle(exc):
+                endpoint.throttles += 1
+            if endpoint.consecutive_failures >= self.eject_after_failures:
+                endpoint.ejected_until = time.monotonic() + self.cooldown_seconds
+                endpoint.consecutive_failures = 0
+                endpoint.ejections += 1
+
+    def stats(self) -> list[dict]:
+        now = time.monotonic()
+        return [
+            {
+                "endpoint": e.name,
+                "ewma_latency_seconds": e.ewma_latency,
+                "ewma_error_rate": e.ewma_error,
+                "requests": e.requests,
+                "failures": e.failures,
+                "throttles": e.throttles,
+                "ejections": e.ejections,
+                "ejected": e.ejected_until > now,
+            }
+            for e in self.endpoints
+        ]
+
+    # -------- Bedrock client surface --------
+    def invoke_model(
+        self,
+        model_id: str,
+        body: dict | bytes,
+        content_type: str = "application/json",
+        accept: str = "application/json",
+    ) -> dict:
+        last_error: BaseException | None = None
+        for attempt, endpoint in enumerate(self._ranked()):
+            if attempt:
+                self.failovers += 1
+            started = time.monotonic()
+            try:
+                resp = endpoint.client.invoke_model(
+                    self._model_for(endpoint, model_id), body, content_type, accept
+                )
+            except Exception as e:
+                if not is_retryable(e):
+                    raise
+                self._record_failure(endpoint, e)
+                last_error = e
+                continue
+            self._record_success(endpoint, time.monotonic() - started)
+            return resp
+        raise last_error
+
+    async def ainvoke_model(
+        self,
+        model_id: str,
+        body: dict | bytes,
+        content_type: str = "application/json",
+        accept: str = "application/json",
+    ) -> dict:
+        last_error: BaseException | None = None
+        for attempt, endpoint in enumerate(self._ranked()):
+            if attempt:
+                self.failovers += 1
+            started = time.monotonic()
+            try:
+                resp = await endpoint.client.ainvoke_model(
+                    self._model_for(endpoint, model_id), body, content_type, accept
+                )
+            except Exception as e:
+                if not is_retryable(e):
+                    raise
+                self._record_failure(endpoint, e)
+                last_error = e
+                continue
+            self._record_success(endpoint, time.monotonic() - started)
+            return resp
+        raise last_error
+
+    def invoke_model_stream(
+        self,
+        model_id: str,
+        body: dict | bytes,
+        content_type: str = "application/json",
+        accept: str = "application/json",
+    ) -> Iterator[dict]:
+        """Fails over only until the first event; after that errors reach the caller."""
+        last_error: BaseException | None = None
+        for attempt, endpoint in enumerate(self._ranked()):
+            if attempt:
+                self.failovers += 1
+            started = time.monotonic()
+            events = endpoint.client.invoke_model_stream(
+                self._model_for(endpoint, model_id), body, content_type, accept
+            )
+            try:
+                first = next(events)
+            except StopIteration:
+                self._record_success(endpoint, time.monotonic() - started)
+                return
+            except Exception as e:
+                if not is_retryable(e):
+                    raise
+                self._record_failure(endpoint, e)
+                last_error = e
+                continue
+            # time-to-first-event is what routing should optimise for streams
+            self._record_success(endpoint, time.monotonic() - started)
+            yield first
+            yield from events
+            return
+        raise last_error
+
+    async def ainvoke_model_stream(
+        self,
+        model_id: str,
+        body: dict | bytes,
+        content_type: str = "application/json",
+        accept: str = "application/json",
+    ) -> AsyncIterator[dict]:
+        last_error: BaseException | None = None
+        for attempt, endpoint in enumerate(self._ranked()):
+            if attempt:
+                self.failovers += 1
+            started = time.monotonic()
+            events = endpoint.client.ainvoke_model_stream(
+                self._model_for(endpoint, model_id), body, content_type, accept
+            )
+            try:
+                first = await events.__anext__()
+            except StopAsyncIteration:
+                self._record_success(endpoint, time.monotonic() - started)
+                return
+            except Exception as e:
+                if not is_retryable(e):
+                    raise
+                self._record_failure(endpoint, e)
+                last_error = e
+                continue
+            self._record_success(endpoint, time.monotonic() - started)
+            yield first
+            async for event in events:
+                yield event
+            return
+        raise last_error
@@ -0,0 +1,220 @@
+"""Circuit breaker around the Bedrock client.
+
+Closed: calls pass and their outcomes fill a window of the last `window` calls. Once
+it holds at least min_calls, the breaker opens when the share of failed calls (5xx,
+timeouts, connection errors) reaches failure_rate, or the share of calls slower than
+slow_call_seconds reaches slow_call_rate. Open: calls fail at once with CircuitOpen
+for open_seconds instead of waiting out the botocore timeout. Half-open: up to
+`probes` calls go through; if all of them succeed in time the breaker closes with an
+empty window, and any failure or slow probe opens it again.
+
+Throttling is not a failure here - Bedrock is answering, just asking for less, which
+is the adaptive limiter's job - and neither are client errors or shed load.
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+import threading
+import time
+from collections import deque
+from typing import Any, AsyncIterator
+
+from .bedrock_router import is_retryable, is_throttle
+
+logger = logging.getLogger(__name__)
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+STATES = (CLOSED, OPEN, HALF_OPEN)
+
+
+class CircuitOpen(Exception):
+    """Raised instead of calling Bedrock while the breaker is open; carries a Retry-After hint."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def is_failure(exc: BaseException) -> bool:
+    return is_retryable(exc) and not is_throttle(exc)
+
+
+class CircuitBreaker:
+    """Thread-safe; shared by the sync (thread) and async call paths."""
+
+    def __init__(
+        self,
+        failure_rate: float = 0.5,
+        slow_call_seconds: float = 20.0,
+        slow_call_rate: float = 0.8,
+        window: int = 20,
+        min_calls: int = 10,
+        open_seconds: float = 30.0,
+        probes: int = 2,
+    ):
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.min_calls = min(min_calls, window)
+        self.open_seconds = open_seconds
+        self.probes = max(1, probes)
+
+        self.state = CLOSED
+        self.opens = 0
+        self.rejected = 0
+        # (failed, slow) per call, newest last
+        self._outcomes: deque[tuple[bool, bool]] = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Admit a call or raise CircuitOpen. True if the call is a half-open probe."""
+        with self._lock:
+            if self.state == OPEN:
+                remaining = self._opened_at + self.open_seconds - time.monotonic()
+                if remaining > 0:
+                    self.rejected += 1
+                    raise CircuitOpen(f"Bedrock circuit open; retry in {math.ceil(remaining)}s", remaining)
+                self._transition(HALF_OPEN)
+            if self.state == HALF_OPEN:
+                if self._probes_in_flight + self._probe_successes >= self.probes:
+                    self.rejected += 1
+                    raise CircuitOpen("Bedrock circuit half-open; waiting on probe calls", 1.0)
+                self._probes_in_flight += 1
+                return True
+            return False
+
+    def record(self, probe: bool, seconds: float, error: BaseException | None = None) -> None:
+        """Outcome of an admitted call. Errors other than failures (see is_failure) only
+        free a probe slot; they say nothing about Bedrock's health."""
+        failed = error is not None and is_failure(error)
+        neutral = error is not None and not failed
+        slow = seconds >= self.slow_call_seconds
+        with self._lock:
+            if probe:
+                self._probes_in_flight -= 1
+                if self.state != HALF_OPEN or neutral:
+                    return
+                if failed or slow:
+                    self._transition(OPEN)
+                    return
+                self._probe_successes += 1
+                if self._probe_successes >= self.probes:
+                    self._transition(CLOSED)
+                return
+            # calls admitted before the breaker opened still finish afterwards
+            if self.state != CLOSED or neutral:
+                return
+            self._outcomes.append((failed, slow))
+            if len(self._outcomes) < self.min_calls:
+                return
+            calls = len(self._outcomes)
+            failures = sum(1 for f, _ in self._outcomes if f)
+            slow_calls = sum(1 for _, s in self._outcomes if s)
+            if failures / calls >= self.failure_rate or slow_calls / calls >= self.slow_call_rate:
+                self._transition(OPEN)
+
+    def retry_after(self) -> float:
+        """Seconds until a call could be admitted (0 if one would be now)."""
+        with self._lock:
+            if self.state == OPEN:
+                return max(0.0, self._opened_at + self.open_seconds - time.monotonic())
+            if self.state == HALF_OPEN and self._probes_in_flight + self._probe_successes >= self.probes:
+                return 1.0
+            return 0.0
+
+    def stats(self) -> dict:
+        with self._lock:
+            calls = len(self._outcomes)
+            return {
+                "state": self.state,
+                "opens": self.opens,
+                "rejected": self.rejected,
+                "window_calls": calls,
+                "failure_rate": sum(1 for f, _ in self._outcomes if f) / calls if calls else 0.0,
+                "slow_call_rate": sum(1 for _, s in self._outcomes if s) / calls if calls else 0.0,
+            }
+
+    def _transition(self, state: str) -> None:
+        """Caller holds self._lock."""
+        logger.warning("Bedrock circuit breaker: %s -> %s", self.state, state)
+        self.state = state
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        if state == OPEN:
+            self.opens += 1
+            self._opened_at = time.monotonic()
+        elif state == CLOSED:
+            self._outcomes.clear()
+
+
+class CircuitBreakerBedrockClient:
+    """Wraps a Bedrock client so every call goes through a CircuitBreaker.
+
+    Streams are judged by their time to first event; an error mid-stream still counts.
+    """
+
+    def __init__(self, inner: Any, breaker: CircuitBreaker):
+        self.inner = inner
+        self.breaker = breaker
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.inner, name)
+
+    def invoke_model(
+        self,
+        model_id: str,
+        body: dict | bytes,
+        content_type: str = "application/json",
+        accept: str = "application/json",
+    ) -> dict:
+        probe = self.breaker.allow()
+        started = time.monotonic()
+        try:
+            resp = self.inner.invoke_model(model_id, body, content_type, accept)
+        except BaseException as e:
+            self.breaker.record(probe, time.monotonic() - started, e)
+            raise
+        self.breaker.record(probe, time.monotonic() - started)
+        return resp
+
+    async def ainvoke_model(
+        self,
+        model_id: str,
+        body: dict | bytes,
+        content_type: str = "application/json",
+        accept: str = "application/json",
+    ) -> dict:
+        probe = self.breaker.allow()
+        started = time.monotonic()
+        try:
+            resp = await self.inner.ainvoke_model(model_id, body, content_type, accept)
+        except BaseException as e:
+            self.breaker.record(probe, time.monotonic() - started, e)
+            raise
+        self.breaker.record(probe, time.monotonic() - started)
+        return resp
+
+    async def ainvoke_model_stream(
+        self,
+        model_id: str,
+        body: dict | bytes,
+        content_type: str = "application/json",
+        accept: str = "application/json",
+    ) -> AsyncIterator[dict]:
+        probe = self.breaker.allow()
+        started = time.monotonic()
+        first_event = None
+        try:
+            async for event in self.inner.ainvoke_model_stream(model_id, body, content_type, accept):
+                if first_event is None:
+                    first_event = time.monotonic() - started
+                yield event
+        except BaseException as e:
+            self.breaker.record(probe, first_event if first_event is not None else time.monotonic() - started, e)
+            raise
+        self.breaker.record(probe, first_event if first_event is not None else time.monotonic() - started)
@@ -0,0 +1,209 @@
+"""Adaptive upstream concurrency limit with admission control.
+
+AIMD: the in-flight limit grows by ~1 per round trip while Bedrock keeps up and is
+cut multiplicatively when it throttles (or, optionally, when latency exceeds a
+target). Callers over the limit wait in a bounded queue for at most
+queue_timeout seconds; when the queue is full or the wait runs out they get
+Overloaded immediately instead of piling up until their own client times out.
+
+The queue is weighted-fair across shares (API-key tenants): each waiter gets a
+virtual finish time of max(now, its share's last finish) + 1/weight, and slots go to
+the earliest finish time. A share with a deep backlog therefore cannot starve one
+that queues occasionally; with a single share this is plain FIFO.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import heapq
+import itertools
+import math
+import time
+from typing import Any, AsyncIterator
+
+from .bedrock_router import is_throttle
+
+
+# (share name, weight) that queued calls from the current request are scheduled under
+current_share: contextvars.ContextVar[tuple[str, float]] = contextvars.ContextVar("current_share", default=("", 1.0))
+
+
+class Overloaded(Exception):
+    """Raised when a call is shed instead of queued; carries a Retry-After hint."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency limiter for one event loop."""
+
+    def __init__(
+        self,
+        initial_limit: int = 16,
+        min_limit: int = 1,
+        max_limit: int = 256,
+        max_queue: int = 64,
+        queue_timeout: float = 5.0,
+        latency_target: float | None = None,
+        backoff_ratio: float = 0.7,
+    ):
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.latency_target = latency_target
+        self.backoff_ratio = backoff_ratio
+
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.decreases = 0
+        # heap of (virtual finish, seq, future); seq keeps FIFO order within a share
+        self._waiters: list[tuple[float, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._virtual_time = 0.0
+        self._last_finish: dict[str, float] = {}
+        self._ewma_latency = 1.0
+        self._last_decrease = 0.0
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def retry_after(self) -> float:
+        """Rough time for the current queue to drain at the current limit."""
+        drain = (len(self._waiters) + 1) * self._ewma_latency / max(self.limit, 1.0)
+        return float(max(1, math.ceil(drain)))
+
+    async def acquire(self, timeout: float | None = None) -> None:
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            self.admitted += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            raise Overloaded("Upstream concurrency limit reached and queue is full", self.retry_after())
+
+        fut = asyncio.get_running_loop().create_future()
+        share, weight = current_share.get()
+        finish = max(self._virtual_time, self._last_finish.get(share, 0.0)) + 1.0 / max(weight, 1e-6)
+        self._last_finish[share] = finish
+        entry = (finish, next(self._seq), fut)
+        heapq.heappush(self._waiters, entry)
+        try:
+            await asyncio.wait_for(asyncio.shield(fut), timeout or self.queue_timeout)
+        except asyncio.TimeoutError:
+            if fut.done():
+                self.admitted += 1  # slot granted just as the deadline hit
+                return
+            fut.cancel()
+            self._forget_waiter(entry)
+            self.timed_out += 1
+            raise Overloaded("Timed out waiting for upstream capacity", self.retry_after()) from None
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                self._release_slot()  # granted, but the caller is gone: pass it on
+            else:
+                fut.cancel()
+                self._forget_waiter(entry)
+            raise
+        self.admitted += 1
+
+    def release(self, latency: float, congested: bool = False) -> None:
+        """Return a slot and feed the outcome of the call into the limit."""
+        self._ewma_latency += 0.2 * (latency - self._ewma_latency)
+        if self.latency_target and latency > self.latency_target:
+            congested = True
+
+        now = time.monotonic()
+        if congested:
+            # one decrease per round trip, so a burst of throttles doesn't collapse the limit
+            if now - self._last_decrease > self._ewma_latency:
+                self.limit = max(float(self.min_limit), self.limit * self.backoff_ratio)
+                self._last_decrease = now
+                self.decreases += 1
+        elif self.in_flight >= int(self.limit):
+            # only grow while the limit is actually the bottleneck
+            self.limit = min(float(self.max_limit), self.limit + 1.0 / self.limit)
+        self._release_slot()
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "queued": len(self._waiters),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "decreases": self.decreases,
+        }
+
+    def _forget_waiter(self, entry: tuple) -> None:
+        if entry in self._waiters:
+            self._waiters.remove(entry)
+            heapq.heapify(self._waiters)
+
+    def _release_slot(self) -> None:
+        self.in_flight -= 1
+        while self._waiters and self.in_flight < int(self.limit):
+            finish, _, fut = heapq.heappop(self._waiters)
+            self._virtual_time = finish
+            if not fut.done():
+                self.in_flight += 1
+                fut.set_result(None)
+        if not self._waiters:
+            # idle: start every share afresh so old finish times don't linger
+            self._last_finish.clear()
+
+
+class LimitedBedrockClient:
+    """Wraps a Bedrock client so async calls go through an AdaptiveLimiter.
+
+    The sync path is passed through untouched; only the async service path is limited.
+    """
+
+    def __init__(self, inner: Any, limiter: AdaptiveLimiter):
+        self.inner = inner
+        self.limiter = limiter
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.inner, name)
+
+    async def ainvoke_model(
+        self,
+        model_id: str,
+        body: dict | bytes,
+        content_type: str = "application/json",
+        accept: str = "application/json",
+    ) -> dict:
+        await self.limiter.acquire()
+        started = time.monotonic()
+        try:
+            resp = await self.inner.ainvoke_model(model_id, body, content_type, accept)
+        except BaseException as e:
+            self.limiter.release(time.monotonic() - started, congested=is_throttle(e))
+            raise
+        self.limiter.release(time.monotonic() - started)
+        return resp
+
+    async def ainvoke_model_stream(
+        self,
+        model_id: str,
+        body: dict | bytes,
+        content_type: str = "application/json",
+        accept: str = "application/json",
+    ) -> AsyncIterator[dict]:
+        await self.limiter.acquire()
+        started = time.monotonic()
+        try:
+            async for event in self.inner.ainvoke_model_stream(model_id, body, content_type, accept):
+                yield event
+        except BaseException as e:
+            self.limiter.release(time.monotonic() - started, congested=is_throttle(e))
+            raise
+        self.limiter.release(time.monotonic() - started)
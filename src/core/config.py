@@ -1,11 +1,173 @@
 # src/core/config.py
+import json
 import os
 from dotenv import load_dotenv
 
 from .aws_utils import AwsUtils
+from .config_snapshot import ConfigSnapshot
+
+
+def _as_int(value, default: int) -> int:
+    """Secrets and env vars are strings; tolerate blanks and junk by falling back."""
+    try:
+        return int(value) if value not in (None, "") else default
+    except (TypeError, ValueError):
+        return default
+
+
+def _as_float(value, default: float) -> float:
+    try:
+        return float(value) if value not in (None, "") else default
+    except (TypeError, ValueError):
+        return default
+
+
+def _as_bool(value, default: bool) -> bool:
+    if value in (None, ""):
+        return default
+    return str(value).strip().lower() in ("1", "true", "yes", "on")
+
+
+def _as_endpoints(value) -> list[tuple[str, str | None]]:
+    """BEDROCK_ENDPOINTS, in preference order. Either a JSON list of
+    {"region": ..., "model_id": ...} objects or "region[=model_id],..." shorthand."""
+    if not value:
+        return []
+    if isinstance(value, str) and value.strip().startswith("["):
+        value = json.loads(value)
+    if isinstance(value, list):
+        return [(e["region"], e.get("model_id")) for e in value]
+    endpoints = []
+    for item in str(value).split(","):
+        region, _, model_id = item.strip().partition("=")
+        if region:
+            endpoints.append((region.strip(), model_id.strip() or None))
+    return endpoints
+
+
+def _as_list(value) -> list[str]:
+    """JSON list or comma-separated string."""
+    if not value:
+        return []
+    if isinstance(value, str) and value.strip().startswith("["):
+        value = json.loads(value)
+    if isinstance(value, list):
+        return [str(v).strip() for v in value if str(v).strip()]
+    return [v.strip() for v in str(value).split(",") if v.strip()]
+
+
+def _as_json(value, default):
+    if not value:
+        return default
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except ValueError:
+            return default
+    return value
 
 
 class Config:
+    @staticmethod
+    def _load_tuning(get) -> dict:
+        """Performance knobs; same keys whether they come from the secret or env."""
+        return {
+            # Max Bedrock calls in flight per worker process (async path)
+            "bedrock_max_concurrency": _as_int(get("BEDROCK_MAX_CONCURRENCY"), 32),
+
+            # Response cache (temperature 0 => same request, same answer)
+            "cache_enabled": _as_bool(get("CACHE_ENABLED"), True),
+            "cache_max_entries": _as_int(get("CACHE_MAX_ENTRIES"), 1024),
+            "cache_ttl_seconds": _as_float(get("CACHE_TTL_SECONDS"), 3600.0),
+            "cache_db_path": get("CACHE_DB_PATH") or None,
+
+            # Merge identical Bedrock calls that are already in flight
+            "coalesce_enabled": _as_bool(get("COALESCE_ENABLED"), True),
+            # Reuse answers for near-identical objectives with the same context (opt-in)
+            "near_duplicate_enabled": _as_bool(get("NEAR_DUPLICATE_ENABLED"), False),
+            "near_duplicate_threshold": _as_float(get("NEAR_DUPLICATE_THRESHOLD"), 0.85),
+            "near_duplicate_max_entries": _as_int(get("NEAR_DUPLICATE_MAX_ENTRIES"), 10000),
+
+            # Fast models tried before BEDROCK_MODEL_ID; escalate only when the answer fails checks
+            "cascade_model_ids": _as_list(get("CASCADE_MODEL_IDS")),
+            "cascade_max_field_chars": _as_int(get("CASCADE_MAX_FIELD_CHARS"), 800),
+
+            # Pack requests arriving within a few ms into one Bedrock call (async routes)
+            "micro_batch_enabled": _as_bool(get("MICRO_BATCH_ENABLED"), False),
+            "micro_batch_window_ms": _as_float(get("MICRO_BATCH_WINDOW_MS"), 10.0),
+            "micro_batch_max_items": _as_int(get("MICRO_BATCH_MAX_ITEMS"), 8),
+
+            # POST /{env}/recommendation/batch
+            "batch_max_items": _as_int(get("BATCH_MAX_ITEMS"), 1000),
+            "batch_max_concurrency": _as_int(get("BATCH_MAX_CONCURRENCY"), 8),
+
+            # Prompt shape: minified/null-stripped payload, cache_control on the system prompt
+            "prompt_compact": _as_bool(get("PROMPT_COMPACT"), True),
+            "prompt_cache_system": _as_bool(get("PROMPT_CACHE_SYSTEM"), False),
+            "max_tokens_cap": _as_int(get("MAX_TOKENS_CAP"), 512),
+            # Answer through a forced tool call (structured input) instead of free-text JSON
+            "prompt_tool_output": _as_bool(get("PROMPT_TOOL_OUTPUT"), False),
+            # Extra Bedrock calls for a reply that cannot be used or repaired locally
+            "output_max_reinvokes": _as_int(get("OUTPUT_MAX_REINVOKES"), 1),
+
+            # Multi-region / multi-model routing; empty => single REGION + BEDROCK_MODEL_ID
+            "bedrock_endpoints": _as_endpoints(get("BEDROCK_ENDPOINTS")),
+            "router_cooldown_seconds": _as_float(get("ROUTER_COOLDOWN_SECONDS"), 30.0),
+            "router_eject_after_failures": _as_int(get("ROUTER_EJECT_AFTER_FAILURES"), 2),
+
+            # Adaptive upstream concurrency limit + bounded wait queue (async path)
+            "limiter_enabled": _as_bool(get("LIMITER_ENABLED"), True),
+            "limiter_initial_limit": _as_int(get("LIMITER_INITIAL_LIMIT"), 16),
+            "limiter_max_queue": _as_int(get("LIMITER_MAX_QUEUE"), 64),
+            "limiter_queue_timeout_seconds": _as_float(get("LIMITER_QUEUE_TIMEOUT_SECONDS"), 5.0),
+            "limiter_latency_target_seconds": _as_float(get("LIMITER_LATENCY_TARGET_SECONDS"), 0.0),
+
+            # Fail fast while Bedrock is erroring or very slow; optionally serve expired cache entries
+            "breaker_enabled": _as_bool(get("BREAKER_ENABLED"), True),
+            "breaker_failure_rate": _as_float(get("BREAKER_FAILURE_RATE"), 0.5),
+            "breaker_slow_call_seconds": _as_float(get("BREAKER_SLOW_CALL_SECONDS"), 20.0),
+            "breaker_slow_call_rate": _as_float(get("BREAKER_SLOW_CALL_RATE"), 0.8),
+            "breaker_window": _as_int(get("BREAKER_WINDOW"), 20),
+            "breaker_min_calls": _as_int(get("BREAKER_MIN_CALLS"), 10),
+            "breaker_open_seconds": _as_float(get("BREAKER_OPEN_SECONDS"), 30.0),
+            "breaker_probes": _as_int(get("BREAKER_PROBES"), 2),
+            "breaker_serve_stale": _as_bool(get("BREAKER_SERVE_STALE"), False),
+            "cache_stale_seconds": _as_float(get("CACHE_STALE_SECONDS"), 86400.0),
+
+            # Local mock only: latency model / fault injection / replay, plus per-region
+            # overrides as {"<region>": {"latency_ms": .., "throttle_rate": .., ...}}
+            "mock_profile": {
+                "latency_ms": _as_float(get("MOCK_LATENCY_MS"), 0.0),
+                "latency_sigma": _as_float(get("MOCK_LATENCY_SIGMA"), 0.0),
+                "tail_rate": _as_float(get("MOCK_TAIL_RATE"), 0.0),
+                "tail_multiplier": _as_float(get("MOCK_TAIL_MULTIPLIER"), 10.0),
+                "tokens_per_second": _as_float(get("MOCK_TOKENS_PER_SECOND"), 0.0),
+                "throttle_rate": _as_float(get("MOCK_THROTTLE_RATE"), 0.0),
+                "error_rate": _as_float(get("MOCK_ERROR_RATE"), 0.0),
+                "malformed_rate": _as_float(get("MOCK_MALFORMED_RATE"), 0.0),
+                "outage_after_seconds": _as_float(get("MOCK_OUTAGE_AFTER_SECONDS"), 0.0),
+                "outage_seconds": _as_float(get("MOCK_OUTAGE_SECONDS"), 0.0),
+                "replay_path": get("MOCK_REPLAY_PATH") or None,
+            },
+            "mock_region_profiles": _as_json(get("MOCK_REGION_PROFILES"), {}),
+            # Per-model overrides for the cascade: {"<model_id>": {"latency_ms": .., "echo_rate": ..}}
+            "mock_model_profiles": _as_json(get("MOCK_MODEL_PROFILES"), {}),
+            # Non-local only: append every real Bedrock response to this JSONL file
+            "bedrock_record_path": get("BEDROCK_RECORD_PATH") or None,
+            # Share of requests run under cProfile (0 = off); .prof files land in PROFILE_DIR
+            "profile_sample_rate": _as_float(get("PROFILE_SAMPLE_RATE"), 0.0),
+            "profile_dir": get("PROFILE_DIR") or None,
+            # Log in to Cognito and open Bedrock connections during startup
+            "startup_prewarm": _as_bool(get("STARTUP_PREWARM"), False),
+            # Poll the secret for changes (0 = never) and swap in a rebuilt runtime; the old one
+            # is closed once requests still using it are done, or after the grace period
+            "config_reload_seconds": _as_float(get("CONFIG_RELOAD_SECONDS"), 60.0),
+            "config_reload_grace_seconds": _as_float(get("CONFIG_RELOAD_GRACE_SECONDS"), 120.0),
+            # SQLite file shared by the workers on this host (credentials, and the cache
+            # unless CACHE_DB_PATH is set); put it on tmpfs, e.g. /dev/shm/recommendation.db
+            "shared_store_path": get("SHARED_STORE_PATH") or None,
+        }
+
     @staticmethod
     def _load_secrets(chamber_of_secrets: dict, region: str) -> dict:
         # ENV: prefer process env (Vercel) over secret; normalize lowercase
@@ -18,6 +180,8 @@ class Config:
             "bedrock_model_id": chamber_of_secrets.get("BEDROCK_MODEL_ID"),
             "bedrock_mock": chamber_of_secrets.get("BEDROCK_MOCK"),
             "api_key": chamber_of_secrets.get("API_KEY"),
+            # Per-tenant keys and quotas, see core/tenants.py
+            "api_keys": _as_json(chamber_of_secrets.get("API_KEYS"), {}),
 
             # Cognito -> Bedrock (always used except ENV=local)
             "user_pool_id": chamber_of_secrets.get("USER_POOL_ID"),
@@ -26,6 +190,8 @@ class Config:
             "identity_pool_id": chamber_of_secrets.get("IDENTITY_POOL_ID"),
             "cognito_username": chamber_of_secrets.get("COGNITO_USERNAME"),
             "cognito_password": chamber_of_secrets.get("COGNITO_PASSWORD"),
+
+            **Config._load_tuning(chamber_of_secrets.get),
         }
 
     @staticmethod
@@ -38,6 +204,7 @@ class Config:
             "bedrock_model_id": os.getenv("BEDROCK_MODEL_ID", None),
             "bedrock_mock": os.getenv("BEDROCK_MOCK", None),
             "api_key": os.getenv("API_KEY", None),
+            "api_keys": _as_json(os.getenv("API_KEYS"), {}),
 
             "user_pool_id": os.getenv("USER_POOL_ID", None),
             "client_id": os.getenv("CLIENT_ID", None),
@@ -45,8 +212,22 @@ class Config:
             "identity_pool_id": os.getenv("IDENTITY_POOL_ID", None),
             "cognito_username": os.getenv("COGNITO_USERNAME", None),
             "cognito_password": os.getenv("COGNITO_PASSWORD", None),
+
+            **Config._load_tuning(os.getenv),
         }
 
+    @staticmethod
+    def _snapshot() -> ConfigSnapshot | None:
+        # Bootstrap settings like SECRET_NAME: they decide whether the secret is fetched at all
+        path = os.environ.get("CONFIG_SNAPSHOT_PATH")
+        if not path:
+            return None
+        return ConfigSnapshot(
+            path,
+            ttl_seconds=_as_float(os.environ.get("CONFIG_SNAPSHOT_TTL_SECONDS"), 300.0),
+            key=os.environ.get("CONFIG_SNAPSHOT_KEY") or None,
+        )
+
     @staticmethod
     def load_config() -> dict:
         # Only load local .env outside Vercel; never override real env vars
@@ -66,16 +247,24 @@ class Config:
         cognito_password = os.environ.get("COGNITO_PASSWORD", None)
 
         if secret_name and region:
+            snapshot = Config._snapshot()
+            cached = snapshot.load(secret_name) if snapshot else None
+            if cached is not None:
+                return Config._load_secrets(cached, region)
+
             aws_utils = AwsUtils(
                 region_name=region,
                 aws_endpoint_url=aws_endpoint
             )
             try:
                 chamber_of_secrets = aws_utils.get_secrets(secret_name)
-                return Config._load_secrets(chamber_of_secrets, region)
+                config = Config._load_secrets(chamber_of_secrets, region)
             except Exception:
                 # Fall back to env vars
                 return Config._load_env_vars()
+            if snapshot:
+                snapshot.save(secret_name, chamber_of_secrets)
+            return config
 
 
         return Config._load_env_vars()
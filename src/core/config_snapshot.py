@@ -0,0 +1,63 @@
+"""Local snapshot of the Secrets Manager secret so restarts can skip the round trip.
+
+The snapshot holds the raw secret and is reused while it is younger than ttl_seconds.
+With a Fernet key (needs the optional `cryptography` package) it is encrypted at rest;
+without one it is plain JSON readable only by the owning user.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import time
+
+try:
+    from cryptography.fernet import Fernet, InvalidToken
+except ImportError:  # optional: only needed for encrypted snapshots
+    Fernet = None
+    InvalidToken = ValueError
+
+logger = logging.getLogger(__name__)
+
+
+class ConfigSnapshot:
+    def __init__(self, path: str, ttl_seconds: float = 300.0, key: str | None = None):
+        if key and Fernet is None:
+            raise RuntimeError("CONFIG_SNAPSHOT_KEY is set but the 'cryptography' package is not installed")
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._fernet = Fernet(key.encode("ascii")) if key else None
+
+    def load(self, secret_name: str) -> dict | None:
+        """Cached secret for secret_name, or None if missing, stale or unreadable."""
+        try:
+            with open(self.path, "rb") as f:
+                raw = f.read()
+        except FileNotFoundError:
+            return None
+        try:
+            if self._fernet is not None:
+                raw = self._fernet.decrypt(raw)
+            snapshot = json.loads(raw)
+        except (InvalidToken, ValueError):
+            logger.warning("Ignoring unreadable config snapshot %s", self.path)
+            return None
+        if snapshot.get("secret_name") != secret_name:
+            return None
+        if time.time() - snapshot.get("saved_at", 0) > self.ttl_seconds:
+            return None
+        return snapshot.get("secret")
+
+    def save(self, secret_name: str, secret: dict) -> None:
+        raw = json.dumps({"secret_name": secret_name, "saved_at": time.time(), "secret": secret}).encode("utf-8")
+        if self._fernet is not None:
+            raw = self._fernet.encrypt(raw)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "wb") as f:
+                f.write(raw)
+            os.replace(tmp, self.path)
+        except OSError:
+            logger.warning("Could not write config snapshot %s", self.path, exc_info=True)
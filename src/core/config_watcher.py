@@ -0,0 +1,145 @@
+"""Hot reload of the Secrets Manager secret without restarting the workers.
+
+ConfigWatcher polls the secret's metadata with DescribeSecret every interval and
+compares the version id currently staged AWSCURRENT with the last one it saw; only
+when it differs is the value fetched (GetSecretValue for that version) and parsed
+like at startup. A config that differs from the current one is handed to on_change,
+which builds the new runtime and swaps it in.
+
+The secrets client is injectable: anything with describe_secret and get_secret_value
+(boto3 style, keyword SecretId / VersionId) works, so LocalStack or an in-process
+stand-in can drive it.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+from typing import Any, Awaitable, Callable
+
+from .aws_utils import AwsUtils
+from .config import Config
+from .config_snapshot import ConfigSnapshot
+
+logger = logging.getLogger(__name__)
+
+OnChange = Callable[[dict], Awaitable[None]]
+
+
+def current_version(description: dict) -> str | None:
+    """Version id staged AWSCURRENT in a DescribeSecret response."""
+    for version_id, stages in (description.get("VersionIdsToStages") or {}).items():
+        if "AWSCURRENT" in stages:
+            return version_id
+    return None
+
+
+class ConfigWatcher:
+    def __init__(
+        self,
+        secret_name: str,
+        region: str,
+        config: dict,
+        on_change: OnChange,
+        client: Any = None,
+        aws_endpoint: str | None = None,
+        interval_seconds: float = 60.0,
+        snapshot: ConfigSnapshot | None = None,
+    ):
+        """config: the one currently in use; only a config that differs from it is applied."""
+        self.secret_name = secret_name
+        self.region = region
+        self.config = config
+        self.on_change = on_change
+        self.interval_seconds = interval_seconds
+        self.snapshot = snapshot
+        self.version: str | None = None
+        self.polls = 0
+        self.reloads = 0
+        self.failures = 0
+        self._client = client
+        self._aws_endpoint = aws_endpoint
+        self._task: asyncio.Task | None = None
+
+    @classmethod
+    def from_environment(cls, config: dict, on_change: OnChange) -> ConfigWatcher | None:
+        """Watcher for the secret named by SECRET_NAME / REGION, or None when config came
+        from env vars only or reloading is off (CONFIG_RELOAD_SECONDS=0)."""
+        secret_name = os.environ.get("SECRET_NAME")
+        region = os.environ.get("REGION")
+        if not (secret_name and region) or config["config_reload_seconds"] <= 0:
+            return None
+        return cls(
+            secret_name,
+            region,
+            config,
+            on_change,
+            aws_endpoint=os.environ.get("AWS_ENDPOINT"),
+            interval_seconds=config["config_reload_seconds"],
+            snapshot=Config._snapshot(),
+        )
+
+    @property
+    def client(self) -> Any:
+        if self._client is None:
+            self._client = AwsUtils(region_name=self.region, aws_endpoint_url=self._aws_endpoint).secrets_client()
+        return self._client
+
+    def poll(self) -> tuple[str | None, dict, dict] | None:
+        """Blocking. (version, raw secret, config) if the secret changed to something other
+        than the current config, else None. The version is only recorded by check, once
+        the config has been applied, so a failed reload is retried on the next poll."""
+        self.polls += 1
+        version = current_version(self.client.describe_secret(SecretId=self.secret_name))
+        if version is not None and version == self.version:
+            return None
+        kwargs = {"VersionId": version} if version else {}
+        secret = json.loads(self.client.get_secret_value(SecretId=self.secret_name, **kwargs)["SecretString"])
+        config = Config._load_secrets(secret, self.region)
+        if config == self.config:
+            # new version, same content: nothing to apply
+            self.version = version
+            return None
+        return version, secret, config
+
+    async def check(self) -> bool:
+        """Poll once and apply a changed config; True if it was applied."""
+        try:
+            changed = await asyncio.to_thread(self.poll)
+            if changed is None:
+                return False
+            version, secret, config = changed
+            await self.on_change(config)
+        except Exception:
+            self.failures += 1
+            logger.exception("Config reload from %s failed; keeping the current config", self.secret_name)
+            return False
+        self.version = version
+        self.config = config
+        self.reloads += 1
+        logger.info("Config reloaded from %s (version %s)", self.secret_name, version)
+        if self.snapshot is not None:
+            await asyncio.to_thread(self.snapshot.save, self.secret_name, secret)
+        return True
+
+    def start(self) -> None:
+        self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {"polls": self.polls, "reloads": self.reloads, "failures": self.failures, "version": self.version}
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            await self.check()
@@ -0,0 +1,366 @@
+"""In-process metrics with Prometheus text exposition and Server-Timing support.
+
+Deliberately small: counters and fixed-bucket histograms guarded by a lock each, plus
+callbacks that read stats() from long-lived components at scrape time. `stage(name)`
+times a block into `recommendation_stage_seconds{stage=...}` and, inside an HTTP
+request, also into that request's Server-Timing header.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import cProfile
+import os
+import random
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+TOKEN_BUCKETS = (32, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+
+
+def _escape(value: Any) -> str:
+    # Prometheus text format: label values escape backslash, double quote and newline
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _fmt_labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in self._values.items():
+                lines.append(f"{self.name}{_fmt_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # labels -> [per-bucket counts..., +Inf count, sum]
+        self._series: dict[tuple, list[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0.0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, series in self._series.items():
+                cumulative = 0.0
+                for bound, count in zip(self.buckets, series):
+                    cumulative += count
+                    le = _fmt_labels(self.labelnames, labels, f'le="{bound}"')
+                    lines.append(f"{self.name}_bucket{le} {cumulative}")
+                cumulative += series[len(self.buckets)]
+                inf = _fmt_labels(self.labelnames, labels, 'le="+Inf"')
+                lines.append(f"{self.name}_bucket{inf} {cumulative}")
+                lines.append(f"{self.name}_sum{_fmt_labels(self.labelnames, labels)} {series[-1]}")
+                lines.append(f"{self.name}_count{_fmt_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: list[Counter | Histogram] = []
+        self._callbacks: list[tuple[str, str, str, Callable[[], Any]]] = []
+
+    def counter(self, name: str, help: str, labelnames: tuple[str, ...] = ()) -> Counter:
+        metric = Counter(name, help, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help: str, labelnames: tuple[str, ...] = (), buckets=LATENCY_BUCKETS) -> Histogram:
+        metric = Histogram(name, help, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def callback(self, name: str, kind: str, help: str, fn: Callable[[], Any]) -> None:
+        """Value read at scrape time. fn returns a number or a list of (labels dict, number)."""
+        self._callbacks = [c for c in self._callbacks if c[0] != name]
+        self._callbacks.append((name, kind, help, fn))
+
+    def unregister(self, name: str) -> None:
+        """Drop a callback, e.g. for a feature a reloaded config no longer builds."""
+        self._callbacks = [c for c in self._callbacks if c[0] != name]
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for name, kind, help, fn in self._callbacks:
+            try:
+                value = fn()
+            except Exception:
+                continue
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            samples = value if isinstance(value, list) else [({}, value)]
+            for labels, sample in samples:
+                if sample is None:
+                    continue
+                label_str = _fmt_labels(tuple(labels), tuple(labels.values()))
+                lines.append(f"{name}{label_str} {float(sample)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+HTTP_REQUESTS = REGISTRY.counter("http_requests_total", "HTTP requests by route and status.", ("route", "status"))
+HTTP_LATENCY = REGISTRY.histogram("http_request_duration_seconds", "HTTP request latency.", ("route",))
+STAGE_LATENCY = REGISTRY.histogram(
+    "recommendation_stage_seconds", "Time spent per pipeline stage.", ("stage",)
+)
+BEDROCK_TOKENS = REGISTRY.counter(
+    "bedrock_tokens_total", "Tokens reported by Bedrock usage blocks.", ("direction",)
+)
+BEDROCK_ERRORS = REGISTRY.counter("bedrock_errors_total", "Failed Bedrock calls by error code.", ("code",))
+BEDROCK_THROTTLES = REGISTRY.counter("bedrock_throttles_total", "Bedrock calls rejected by throttling.")
+INPUT_TOKENS_ESTIMATE = REGISTRY.histogram(
+    "recommendation_input_tokens_estimate", "Estimated input tokens per Bedrock request.", buckets=TOKEN_BUCKETS
+)
+JSON_RECOVERIES = REGISTRY.counter(
+    "recommendation_json_recoveries_total", "Model replies that needed JSON recovery (extra text around the object)."
+)
+OUTPUT_REPAIRS = REGISTRY.counter(
+    "recommendation_output_repairs_total",
+    "Model replies fixed locally instead of re-invoking, by kind (truncated, keys).",
+    ("kind",),
+)
+OUTPUT_REINVOKES = REGISTRY.counter(
+    "recommendation_output_reinvokes_total",
+    "Bedrock calls repeated because the reply could not be used or repaired, by reason.",
+    ("reason",),
+)
+MICRO_BATCH_SIZE = REGISTRY.histogram(
+    "recommendation_micro_batch_size", "Objectives per micro-batch.", buckets=(1, 2, 4, 8, 16, 32, 64)
+)
+MICRO_BATCH_FALLBACKS = REGISTRY.counter(
+    "recommendation_micro_batch_fallbacks_total", "Batched objectives missing from the batch reply, sent on their own."
+)
+CASCADE_CALLS = REGISTRY.counter(
+    "recommendation_cascade_calls_total",
+    "Cascade attempts per model by outcome (accepted, rejected, error).",
+    ("model", "outcome"),
+)
+CASCADE_REJECTIONS = REGISTRY.counter(
+    "recommendation_cascade_rejections_total", "Cascade answers escalated to the next model, by reason.", ("model", "reason")
+)
+CASCADE_LATENCY = REGISTRY.histogram(
+    "recommendation_cascade_seconds", "Bedrock call plus quality checks per cascade tier.", ("model",)
+)
+STALE_SERVED = REGISTRY.counter(
+    "recommendation_stale_served_total", "Expired cached answers served while the Bedrock circuit was open."
+)
+STALE_REFRESHES = REGISTRY.counter(
+    "recommendation_stale_refreshes_total",
+    "Background refreshes of answers served stale, by outcome (ok, failed, deferred).",
+    ("outcome",),
+)
+
+_request_timings: contextvars.ContextVar[list | None] = contextvars.ContextVar("request_timings", default=None)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - started)
+
+
+def record_stage(name: str, seconds: float) -> None:
+    STAGE_LATENCY.observe(seconds, name)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((name, seconds))
+
+
+def error_code(exc: BaseException) -> str:
+    response = getattr(exc, "response", None)
+    if isinstance(response, dict):
+        code = (response.get("Error") or {}).get("Code")
+        if code:
+            return str(code)
+    return type(exc).__name__
+
+
+def server_timing(timings: list[tuple[str, float]]) -> str:
+    """Server-Timing value; repeated stages (e.g. failover) are summed."""
+    totals: dict[str, float] = {}
+    for name, seconds in timings:
+        totals[name] = totals.get(name, 0.0) + seconds
+    return ", ".join(f"{name};dur={seconds * 1000:.2f}" for name, seconds in totals.items())
+
+
+class InstrumentedBedrockClient:
+    """Wraps a raw Bedrock client: times each call and counts tokens, errors and throttles."""
+
+    def __init__(self, inner: Any):
+        self.inner = inner
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.inner, name)
+
+    @staticmethod
+    def _record(resp: dict | None, exc: BaseException | None) -> None:
+        if exc is not None:
+            code = error_code(exc)
+            BEDROCK_ERRORS.inc(code)
+            if code in ("ThrottlingException", "TooManyRequestsException"):
+                BEDROCK_THROTTLES.inc()
+            return
+        usage = resp.get("usage") if isinstance(resp, dict) else None
+        if isinstance(usage, dict):
+            BEDROCK_TOKENS.inc("in", amount=usage.get("input_tokens") or 0)
+            BEDROCK_TOKENS.inc("out", amount=usage.get("output_tokens") or 0)
+
+    def invoke_model(self, model_id, body, content_type="application/json", accept="application/json") -> dict:
+        with stage("bedrock"):
+            try:
+                resp = self.inner.invoke_model(model_id, body, content_type, accept)
+            except Exception as e:
+                self._record(None, e)
+                raise
+        self._record(resp, None)
+        return resp
+
+    async def ainvoke_model(self, model_id, body, content_type="application/json", accept="application/json") -> dict:
+        with stage("bedrock"):
+            try:
+                resp = await self.inner.ainvoke_model(model_id, body, content_type, accept)
+            except Exception as e:
+                self._record(None, e)
+                raise
+        self._record(resp, None)
+        return resp
+
+    async def ainvoke_model_stream(self, model_id, body, content_type="application/json", accept="application/json"):
+        started = time.perf_counter()
+        first = True
+        try:
+            async for event in self.inner.ainvoke_model_stream(model_id, body, content_type, accept):
+                if first:
+                    record_stage("bedrock_first_event", time.perf_counter() - started)
+                    first = False
+                if event.get("type") == "message_start":
+                    usage = (event.get("message") or {}).get("usage") or {}
+                    BEDROCK_TOKENS.inc("in", amount=usage.get("input_tokens") or 0)
+                elif event.get("type") == "message_delta":
+                    BEDROCK_TOKENS.inc("out", amount=(event.get("usage") or {}).get("output_tokens") or 0)
+                yield event
+        except Exception as e:
+            self._record(None, e)
+            raise
+        finally:
+            record_stage("bedrock", time.perf_counter() - started)
+
+
+class _Profiling:
+    sample_rate = 0.0
+    directory = "/tmp/recommendation-profiles"
+    lock = threading.Lock()
+
+
+def configure_profiling(sample_rate: float, directory: str | None = None) -> None:
+    """Run that share of requests under cProfile (one at a time), dumping to directory."""
+    _Profiling.sample_rate = sample_rate
+    if directory:
+        _Profiling.directory = directory
+
+
+class MetricsMiddleware:
+    """ASGI middleware: request count/latency, Server-Timing header, sampled profiling.
+
+    Profiling is off until configure_profiling() is called. The profiler sees the whole
+    event loop thread, so requests running concurrently show up in the profile too.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings: list[tuple[str, float]] = []
+        token = _request_timings.set(timings)
+        started = time.perf_counter()
+        status = 500
+
+        profiler = None
+        if _Profiling.sample_rate and random.random() < _Profiling.sample_rate:
+            if _Profiling.lock.acquire(blocking=False):
+                profiler = cProfile.Profile()
+                try:
+                    profiler.enable()
+                except ValueError:  # another profiler is active
+                    profiler = None
+                    _Profiling.lock.release()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if timings:
+                    timings.append(("total", time.perf_counter() - started))
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", server_timing(timings).encode("latin-1")))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            HTTP_REQUESTS.inc(route_path, str(status))
+            HTTP_LATENCY.observe(time.perf_counter() - started, route_path)
+            _request_timings.reset(token)
+            if profiler is not None:
+                profiler.disable()
+                _Profiling.lock.release()
+                os.makedirs(_Profiling.directory, exist_ok=True)
+                name = route_path.strip("/").replace("/", "_").replace("{", "").replace("}", "") or "root"
+                profiler.dump_stats(os.path.join(_Profiling.directory, f"{int(time.time() * 1000)}-{name}.prof"))
@@ -0,0 +1,89 @@
+"""Micro-batching of concurrent calls that can be answered together.
+
+Items submitted to the same group within a short window (or until the batch is full)
+are handed to one flush call, and each submitter gets its own entry of the result.
+Used to pack several objectives into a single Bedrock invocation.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable
+
+Flush = Callable[[list], Awaitable[list]]
+
+
+class _Batch:
+    def __init__(self, flush: Flush):
+        self.flush = flush
+        self.items: list = []
+        self.futures: list[asyncio.Future] = []
+        self.timer: asyncio.TimerHandle | None = None
+
+
+class MicroBatcher:
+    """Collect items per group for up to window_ms, at most max_items per batch.
+
+    flush(items) returns one result per item, in order; an entry that is an exception
+    is raised to that item's submitter only. If flush itself raises, every submitter in
+    the batch gets the exception. Async callers on one event loop only.
+    """
+
+    def __init__(self, window_ms: float = 10.0, max_items: int = 8):
+        self.window = window_ms / 1000
+        self.max_items = max_items
+        self.batches = 0
+        self.items = 0
+        self._open: dict[Hashable, _Batch] = {}
+        self._running: set[asyncio.Task] = set()
+
+    async def submit(self, group: Hashable, item: Any, flush: Flush) -> Any:
+        """Add item to the open batch for group (flush is taken from its first item)."""
+        loop = asyncio.get_running_loop()
+        batch = self._open.get(group)
+        if batch is None:
+            batch = self._open[group] = _Batch(flush)
+            batch.timer = loop.call_later(self.window, self._flush, group, batch)
+        future = loop.create_future()
+        batch.items.append(item)
+        batch.futures.append(future)
+        if len(batch.items) >= self.max_items:
+            self._flush(group, batch)
+        # shield: one caller going away must not cancel the batch the others wait on
+        return await asyncio.shield(future)
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "open": sum(len(b.items) for b in self._open.values()),
+        }
+
+    def _flush(self, group: Hashable, batch: _Batch) -> None:
+        if self._open.get(group) is not batch:
+            return
+        del self._open[group]
+        batch.timer.cancel()
+        self.batches += 1
+        self.items += len(batch.items)
+        task = asyncio.ensure_future(self._run(batch))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+    @staticmethod
+    async def _run(batch: _Batch) -> None:
+        try:
+            results = await batch.flush(batch.items)
+        except asyncio.CancelledError:
+            for future in batch.futures:
+                future.cancel()
+            raise
+        except Exception as e:
+            results = [e] * len(batch.items)
+        for future, result in zip(batch.futures, results):
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
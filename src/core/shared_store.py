@@ -0,0 +1,64 @@
+"""State shared by the uvicorn worker processes on one host.
+
+A small key/value table with expiry plus named cross-process locks, both backed by
+one SQLite (WAL) file. Put the file on tmpfs (e.g. /dev/shm) to keep it in memory.
+Locks use flock(2), so this is POSIX only.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+
+class SharedStore:
+    def __init__(self, path: str):
+        try:
+            import fcntl
+        except ImportError:
+            raise RuntimeError("SHARED_STORE_PATH needs a POSIX host (fcntl.flock)") from None
+        self._fcntl = fcntl
+        self.path = path
+        # Create the file ourselves so the credentials in it are readable by this user only;
+        # SQLite gives its -wal/-shm files the same mode.
+        os.close(os.open(path, os.O_RDWR | os.O_CREAT, 0o600))
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=10)
+        self._db.execute("PRAGMA busy_timeout=10000")
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS shared_kv ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+
+    def get(self, key: str) -> Any | None:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value, expires_at FROM shared_kv WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or row[1] <= time.time():
+            return None
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any, expires_at: float) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO shared_kv (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), expires_at),
+            )
+
+    @contextmanager
+    def lock(self, name: str) -> Iterator[None]:
+        """Exclusive across every process using this store; blocks until acquired."""
+        with open(f"{self.path}.{name}.lock", "a") as f:
+            self._fcntl.flock(f, self._fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                self._fcntl.flock(f, self._fcntl.LOCK_UN)
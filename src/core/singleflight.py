@@ -0,0 +1,127 @@
+"""Single-flight coalescing of identical in-flight Bedrock calls.
+
+When several identical requests arrive while one is already on its way to Bedrock,
+they wait for that call instead of issuing their own, and all of them receive its
+result (or its exception).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable
+
+from . import fastjson
+
+
+class SingleFlight:
+    """Run at most one call per key at a time; concurrent callers share the outcome.
+
+    Sync callers (threads) and async callers (one event loop) are tracked separately.
+    """
+
+    def __init__(self):
+        self.leaders = 0
+        self.coalesced = 0
+        self._lock = threading.Lock()
+        self._calls: dict[str, Future] = {}
+        self._tasks: dict[str, asyncio.Task] = {}
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            fut = self._calls.get(key)
+            leader = fut is None
+            if leader:
+                fut = Future()
+                self._calls[key] = fut
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            return fut.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            self._forget(key)
+            fut.set_exception(e)
+            raise
+        self._forget(key)
+        fut.set_result(result)
+        return result
+
+    async def ado(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._tasks[key] = task
+            self.leaders += 1
+            task.add_done_callback(lambda t: self._finish(key, t))
+        else:
+            self.coalesced += 1
+        # shield: a disconnecting caller must not cancel the call others are waiting on
+        return await asyncio.shield(task)
+
+    def stats(self) -> dict:
+        return {
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._calls) + len(self._tasks),
+        }
+
+    def _forget(self, key: str) -> None:
+        with self._lock:
+            self._calls.pop(key, None)
+
+    def _finish(self, key: str, task: asyncio.Task) -> None:
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        if not task.cancelled():
+            # mark the exception retrieved even if every waiter went away
+            task.exception()
+
+
+class CoalescingBedrockClient:
+    """Wraps a Bedrock client so identical (model_id, body) calls in flight are merged."""
+
+    def __init__(self, inner: Any, flight: SingleFlight | None = None):
+        self.inner = inner
+        self.flight = flight or SingleFlight()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.inner, name)
+
+    @staticmethod
+    def _key(model_id: str, body: dict | bytes, content_type: str, accept: str) -> str:
+        if isinstance(body, dict):
+            body = fastjson.dumps(body, sort_keys=True)
+        h = hashlib.sha256(f"{model_id}\0{content_type}\0{accept}\0".encode("utf-8"))
+        h.update(body)
+        return h.hexdigest()
+
+    def invoke_model(
+        self,
+        model_id: str,
+        body: dict | bytes,
+        content_type: str = "application/json",
+        accept: str = "application/json",
+    ) -> dict:
+        return self.flight.do(
+            self._key(model_id, body, content_type, accept),
+            lambda: self.inner.invoke_model(model_id, body, content_type, accept),
+        )
+
+    async def ainvoke_model(
+        self,
+        model_id: str,
+        body: dict | bytes,
+        content_type: str = "application/json",
+        accept: str = "application/json",
+    ) -> dict:
+        return await self.flight.ado(
+            self._key(model_id, body, content_type, accept),
+            lambda: self.inner.ainvoke_model(model_id, body, content_type, accept),
+        )
@@ -0,0 +1,179 @@
+"""API-key tenants: hashed key lookup, per-key token-bucket rate and concurrency limits.
+
+Keys are held only as SHA-256 digests, so lookup is one dict probe on the digest of
+the presented key; the digest is then compared in constant time. Each tenant has its
+own token bucket (requests per second with a burst allowance) and cap on requests in
+flight, checked in-process before any upstream work starts. The tenant's weight is
+published to the upstream limiter, which queues work fairly across tenants.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import hmac
+import time
+import weakref
+from dataclasses import dataclass, field
+from typing import Callable
+
+from .concurrency import current_share
+
+
+class QuotaExceeded(Exception):
+    """The key is over its rate or concurrency limit; carries a Retry-After hint."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def hash_key(api_key: str) -> bytes:
+    return hashlib.sha256(api_key.encode("utf-8")).digest()
+
+
+class TokenBucket:
+    """rate tokens per second, holding at most burst. Event-loop use only (no lock).
+
+    A request costing more than burst is let through when the bucket is full and
+    leaves it in debt, so large batches are delayed rather than rejected forever.
+    """
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self._updated = time.monotonic()
+
+    def take(self, cost: float = 1.0) -> float:
+        """0.0 if the tokens were taken, else seconds until they would be."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        need = min(cost, self.burst)
+        if self.tokens >= need:
+            self.tokens -= cost
+            return 0.0
+        return (need - self.tokens) / self.rate
+
+
+@dataclass(eq=False)
+class Tenant:
+    """rate: requests (or batch items) per second, 0 = unlimited; burst defaults to
+    max(rate, 1). max_concurrency: requests in flight, 0 = unlimited. weight: share of
+    queued upstream capacity relative to other tenants."""
+
+    name: str
+    key_hash: bytes
+    rate: float = 0.0
+    burst: float = 0.0
+    max_concurrency: int = 0
+    weight: float = 1.0
+    in_flight: int = 0
+    admitted: int = 0
+    rate_limited: int = 0
+    concurrency_limited: int = 0
+    bucket: TokenBucket | None = field(default=None, repr=False)
+
+    def __post_init__(self):
+        if self.rate > 0:
+            self.bucket = TokenBucket(self.rate, self.burst or max(self.rate, 1.0))
+
+    def admit(self, cost: float = 1.0) -> Callable[[], None]:
+        """Take cost tokens and a concurrency slot; returns the (idempotent) release."""
+        if self.max_concurrency and self.in_flight >= self.max_concurrency:
+            self.concurrency_limited += 1
+            raise QuotaExceeded(f"Too many concurrent requests for API key '{self.name}'", 1.0)
+        if self.bucket is not None:
+            wait = self.bucket.take(cost)
+            if wait:
+                self.rate_limited += 1
+                raise QuotaExceeded(f"Rate limit exceeded for API key '{self.name}'", wait)
+        self.in_flight += 1
+        self.admitted += 1
+        # queued upstream calls made by this request are scheduled under this tenant's share
+        current_share.set((self.name, self.weight))
+        released = False
+
+        def release() -> None:
+            nonlocal released
+            if not released:
+                released = True
+                self.in_flight -= 1
+
+        return release
+
+    def stats(self) -> dict:
+        return {
+            "tenant": self.name,
+            "in_flight": self.in_flight,
+            "admitted": self.admitted,
+            "rate_limited": self.rate_limited,
+            "concurrency_limited": self.concurrency_limited,
+        }
+
+
+def _limits(tenant: Tenant) -> tuple:
+    return (tenant.name, tenant.key_hash, tenant.rate, tenant.burst, tenant.max_concurrency, tenant.weight)
+
+
+def release_with(obj, release: Callable[[], None]) -> None:
+    """Also release when obj is garbage collected, e.g. a response body iterator that the
+    server never started (client gone before the first chunk)."""
+    weakref.finalize(obj, release)
+
+
+class Tenants:
+    """All API keys. Built from API_KEYS, a JSON object keyed by tenant name:
+
+        {"acme": {"key_sha256": "<hex>", "rate": 5, "burst": 20, "concurrency": 4, "weight": 2},
+         "batch-jobs": {"key": "<plain key>", "rate": 50, "weight": 0.5}}
+
+    plus the legacy single API_KEY as tenant "default" (unlimited).
+    """
+
+    def __init__(self, tenants: list[Tenant]):
+        self.tenants = tenants
+        self._by_hash = {t.key_hash: t for t in tenants}
+
+    @classmethod
+    def from_config(cls, api_keys: dict, api_key: str | None = None, previous: Tenants | None = None) -> Tenants:
+        """previous: on a config reload, tenants whose key and limits are unchanged are kept,
+        with their token bucket and in-flight count."""
+        tenants = []
+        for name, spec in (api_keys or {}).items():
+            if isinstance(spec, str):
+                spec = {"key": spec}
+            key_hash = bytes.fromhex(spec["key_sha256"]) if spec.get("key_sha256") else hash_key(spec["key"])
+            tenants.append(
+                Tenant(
+                    name=name,
+                    key_hash=key_hash,
+                    rate=float(spec.get("rate") or 0),
+                    burst=float(spec.get("burst") or 0),
+                    max_concurrency=int(spec.get("concurrency") or 0),
+                    weight=float(spec.get("weight") or 1),
+                )
+            )
+        if api_key and not any(t.key_hash == hash_key(api_key) for t in tenants):
+            tenants.append(Tenant(name="default", key_hash=hash_key(api_key)))
+        if previous is not None:
+            kept = {_limits(t): t for t in previous.tenants}
+            tenants = [kept.get(_limits(t), t) for t in tenants]
+        return cls(tenants)
+
+    def __bool__(self) -> bool:
+        return bool(self.tenants)
+
+    def authenticate(self, api_key: str | None) -> Tenant | None:
+        if not api_key:
+            return None
+        digest = hash_key(api_key)
+        # Only digests are ever compared, so timing reveals nothing about the key itself;
+        # the final check is constant-time all the same.
+        tenant = self._by_hash.get(digest)
+        if tenant is None or not hmac.compare_digest(digest, tenant.key_hash):
+            return None
+        return tenant
+
+    def stats(self) -> list[dict]:
+        return [t.stats() for t in self.tenants]
@@ -0,0 +1,251 @@
+"""Response cache for recommend_objective.
+
+Recommendations are requested at temperature 0 with a fixed system prompt, so the
+same canonical request + model id + prompt version yields the same answer. The cache
+has an in-process LRU tier (TTL + size bound) and an optional SQLite tier that
+survives restarts and is shared by every worker process pointed at the same file.
+
+Only the in-memory tier is touched inline. Another worker holding the SQLite file can
+keep a query waiting for up to busy_timeout, so async callers read the disk tier in a
+worker thread (aget / aget_stale) and every write goes through a write-behind thread.
+
+With stale_seconds, expired entries are kept that much longer for get_stale: a last
+known good answer to fall back on while Bedrock is unavailable.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# rows written per transaction by the write-behind thread
+WRITE_BATCH = 64
+# seconds the writer idles on an empty queue before exiting; the next set starts another
+WRITER_IDLE_SECONDS = 1.0
+
+
+class RecommendationCache:
+    """Thread-safe LRU with TTL, optionally backed by a SQLite (WAL) file."""
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl_seconds: float = 3600,
+        db_path: str | None = None,
+        stale_seconds: float = 0.0,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path
+        self.stale_seconds = stale_seconds
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.stale_hits = 0
+        self.write_errors = 0
+        # the memory tier; never held across a SQLite call
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self._db: sqlite3.Connection | None = None
+        self._db_lock = threading.Lock()
+        self._pending: queue.Queue[tuple[str, str, float]] = queue.Queue()
+        self._writer: threading.Thread | None = None
+        self._writes = 0
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+            # other workers may be writing the same file
+            self._db.execute("PRAGMA busy_timeout=5000")
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS recommendation_cache ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+
+    def get(self, key: str) -> dict | None:
+        """Blocking on a memory miss: for sync callers (worker threads, the bulk CLI)."""
+        now = time.time()
+        value = self._get_memory(key, now)
+        if value is None and self._db is not None:
+            value = self._get_disk(key, now)
+        if value is None:
+            self._missed()
+        return value
+
+    async def aget(self, key: str) -> dict | None:
+        """Like get, but a memory miss reads SQLite in a worker thread."""
+        now = time.time()
+        value = self._get_memory(key, now)
+        if value is None and self._db is not None:
+            value = await asyncio.to_thread(self._get_disk, key, now)
+        if value is None:
+            self._missed()
+        return value
+
+    def get_stale(self, key: str) -> dict | None:
+        """The entry for key even if expired, unless it is past stale_seconds as well."""
+        now = time.time()
+        entry = self._stale_memory(key)
+        if entry is None and self._db is not None:
+            entry = self._stale_disk(key)
+        return self._servable(entry, now)
+
+    async def aget_stale(self, key: str) -> dict | None:
+        """Like get_stale, but a memory miss reads SQLite in a worker thread."""
+        now = time.time()
+        entry = self._stale_memory(key)
+        if entry is None and self._db is not None:
+            entry = await asyncio.to_thread(self._stale_disk, key)
+        return self._servable(entry, now)
+
+    def set(self, key: str, value: dict) -> None:
+        """Never blocks on SQLite: the row is queued for the write-behind thread."""
+        expires_at = time.time() + self.ttl_seconds
+        with self._lock:
+            self._remember(key, expires_at, value)
+        if self._db is not None:
+            self._pending.put((key, json.dumps(value, ensure_ascii=False), expires_at))
+            with self._lock:
+                if self._writer is None:
+                    self._writer = threading.Thread(target=self._write_behind, name="cache-writer")
+                    self._writer.start()
+
+    def flush(self) -> None:
+        """Block until every queued write has reached SQLite (or failed)."""
+        self._pending.join()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_hits": self.disk_hits,
+                "stale_hits": self.stale_hits,
+                "entries": len(self._entries),
+                "pending_writes": self._pending.qsize(),
+                "write_errors": self.write_errors,
+            }
+
+    def _get_memory(self, key: str, now: float) -> dict | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            if expires_at + self.stale_seconds <= now:
+                del self._entries[key]
+            return None
+
+    def _get_disk(self, key: str, now: float) -> dict | None:
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT value, expires_at FROM recommendation_cache WHERE key = ?",
+                (key,),
+            ).fetchone()
+        if row is None or row[1] <= now:
+            return None
+        value = json.loads(row[0])
+        with self._lock:
+            self._remember(key, row[1], value)
+            self.hits += 1
+            self.disk_hits += 1
+        return value
+
+    def _missed(self) -> None:
+        with self._lock:
+            self.misses += 1
+
+    def _stale_memory(self, key: str) -> tuple[float, dict] | None:
+        with self._lock:
+            return self._entries.get(key)
+
+    def _stale_disk(self, key: str) -> tuple[float, dict] | None:
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT expires_at, value FROM recommendation_cache WHERE key = ?",
+                (key,),
+            ).fetchone()
+        return (row[0], json.loads(row[1])) if row is not None else None
+
+    def _servable(self, entry: tuple[float, dict] | None, now: float) -> dict | None:
+        if entry is None or entry[0] + self.stale_seconds <= now:
+            return None
+        with self._lock:
+            self.stale_hits += 1
+        return entry[1]
+
+    def _remember(self, key: str, expires_at: float, value: dict) -> None:
+        """Caller holds self._lock."""
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _write_behind(self) -> None:
+        """Writer thread: drains the queue in batches, exits once it has been idle a while."""
+        while True:
+            try:
+                batch = [self._pending.get(timeout=WRITER_IDLE_SECONDS)]
+            except queue.Empty:
+                with self._lock:
+                    # set queues before it checks for a writer, so nothing can be stranded
+                    if self._pending.empty():
+                        self._writer = None
+                        return
+                continue
+            while len(batch) < WRITE_BATCH:
+                try:
+                    batch.append(self._pending.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write(batch)
+            except sqlite3.Error as e:
+                # the memory tier still has these; the disk tier is best effort
+                logger.warning("Dropped %d cache writes to %s: %s", len(batch), self.db_path, e)
+                with self._lock:
+                    self.write_errors += len(batch)
+            finally:
+                for _ in batch:
+                    self._pending.task_done()
+
+    def _write(self, batch: list[tuple[str, str, float]]) -> None:
+        with self._db_lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO recommendation_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                    batch,
+                )
+                self._db.execute("COMMIT")
+            except BaseException:
+                if self._db.in_transaction:
+                    self._db.execute("ROLLBACK")
+                raise
+            before = self._writes
+            self._writes += len(batch)
+            if self._writes // 256 != before // 256:
+                self._prune_disk()
+
+    def _prune_disk(self) -> None:
+        """Drop expired (and no longer servable stale) rows, then trim the oldest rows past 10x the memory bound."""
+        self._db.execute(
+            "DELETE FROM recommendation_cache WHERE expires_at <= ?", (time.time() - self.stale_seconds,)
+        )
+        self._db.execute(
+            "DELETE FROM recommendation_cache WHERE key IN ("
+            " SELECT key FROM recommendation_cache ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries * 10,),
+        )
@@ -0,0 +1,74 @@
+"""Model cascade: answer with a fast model first, escalate only when its answer looks poor.
+
+Each fast tier's answer must parse as a SimpleRecommendResponse and pass cheap checks
+(no empty or overlong fields, no restating the input objective, two distinct
+suggestions). The first tier that passes answers the request; the primary model is the
+last resort and its answer is taken as is.
+"""
+
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+
+from core.metrics import CASCADE_CALLS, CASCADE_LATENCY, CASCADE_REJECTIONS
+
+from .near_duplicates import normalize
+
+_FIELDS = ("reason", "suggestedDefiningObjective", "alternativeDefiningObjective")
+_OBJECTIVES = ("suggestedDefiningObjective", "alternativeDefiningObjective")
+
+
+@dataclass(frozen=True)
+class Cascade:
+    """model_ids: fast models tried in order before the primary model.
+
+    max_field_chars: longer fields mean the model rambled; escalate.
+    min_objective_words: shorter suggestions are too thin to be testable.
+    """
+
+    model_ids: tuple[str, ...]
+    max_field_chars: int = 800
+    min_objective_words: int = 4
+
+    def answering_model(self, primary_model_id: str) -> str:
+        """Stands in for the model id in cache keys: answers depend on the whole chain."""
+        return ">".join((*self.model_ids, primary_model_id))
+
+    def rejection(self, objective: str, result) -> str | None:
+        """Why a fast tier's answer is not good enough, or None to accept it."""
+        for name in _FIELDS:
+            value = getattr(result, name).strip()
+            if not value:
+                return "empty"
+            if len(value) > self.max_field_chars:
+                return "too_long"
+        asked = normalize(objective)
+        suggested, alternative = (normalize(getattr(result, name)) for name in _OBJECTIVES)
+        if asked in (suggested, alternative):
+            return "echo"
+        if suggested == alternative:
+            return "duplicate"
+        if min(len(suggested.split()), len(alternative.split())) < self.min_objective_words:
+            return "too_short"
+        return None
+
+    def accepts(self, model_id: str, started: float, objective: str, result=None, error: Exception | None = None) -> bool:
+        """Check a fast tier's answer (or failure) and record the outcome."""
+        if error is not None:
+            # pydantic ValidationError is a ValueError
+            reason = "invalid" if isinstance(error, ValueError) else "error"
+        else:
+            reason = self.rejection(objective, result)
+        CASCADE_LATENCY.observe(time.perf_counter() - started, model_id)
+        if reason is None:
+            CASCADE_CALLS.inc(model_id, "accepted")
+            return True
+        CASCADE_CALLS.inc(model_id, "error" if reason == "error" else "rejected")
+        CASCADE_REJECTIONS.inc(model_id, reason)
+        return False
+
+    def answered(self, model_id: str, started: float) -> None:
+        """The primary model answered (after every fast tier was rejected)."""
+        CASCADE_LATENCY.observe(time.perf_counter() - started, model_id)
+        CASCADE_CALLS.inc(model_id, "accepted")
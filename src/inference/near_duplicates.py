@@ -0,0 +1,170 @@
+"""Near-duplicate index: reuse a recommendation for a trivially different objective.
+
+Objectives are normalized (case, punctuation, whitespace, common contractions) and
+turned into character trigram shingles. A MinHash signature estimates the Jaccard
+similarity between two shingle sets; LSH banding finds candidates in O(bands) dict
+lookups instead of comparing against every entry. Entries only match within the same
+scope (model, prompt version and identical context), and only when they mention the
+same numbers and the same number of negations - those change the meaning of an
+objective while barely changing its text.
+
+Signature cost grows with the shingle count, so only the first MAX_SHINGLED_CHARS of
+an objective are shingled; anything past that has to match exactly (it is part of
+the scope), which keeps long objectives from ever being reused on a shared prefix.
+"""
+
+from __future__ import annotations
+
+import re
+import threading
+import time
+import unicodedata
+import zlib
+from array import array
+from collections import OrderedDict
+from typing import NamedTuple
+
+_CONTRACTIONS = [
+    (re.compile(r"\b(what|that|it|there|here|who|where|how|when|why)'s\b"), r"\1 is"),
+    (re.compile(r"\bcan't\b"), "cannot"),
+    (re.compile(r"\bwon't\b"), "will not"),
+    (re.compile(r"n't\b"), " not"),
+    (re.compile(r"'re\b"), " are"),
+    (re.compile(r"'m\b"), " am"),
+    (re.compile(r"'ll\b"), " will"),
+    (re.compile(r"'ve\b"), " have"),
+    (re.compile(r"'d\b"), " would"),
+]
+_NON_WORD = re.compile(r"[^\w]+")
+_NUMBER = re.compile(r"\d+(?:[.,]\d+)*")
+_NEGATIONS = frozenset({"not", "no", "never", "without", "cannot", "none", "nor"})
+
+_PRIME = (1 << 61) - 1
+
+MAX_SHINGLED_CHARS = 512
+
+
+def normalize(text: str) -> str:
+    text = unicodedata.normalize("NFKC", text).lower().replace("’", "'")
+    for pattern, replacement in _CONTRACTIONS:
+        text = pattern.sub(replacement, text)
+    return _NON_WORD.sub(" ", text).strip()
+
+
+def shingles(normalized: str, size: int = 3) -> set[int]:
+    padded = f" {normalized} "
+    if len(padded) <= size:
+        return {zlib.crc32(padded.encode("utf-8"))}
+    return {zlib.crc32(padded[i : i + size].encode("utf-8")) for i in range(len(padded) - size + 1)}
+
+
+def _meaning_guard(normalized: str) -> tuple:
+    words = normalized.split()
+    return tuple(sorted(_NUMBER.findall(normalized))), sum(w in _NEGATIONS for w in words)
+
+
+class Fingerprint(NamedTuple):
+    """An objective as the index sees it; compute once per request with fingerprint()."""
+
+    scope: tuple
+    signature: array
+
+
+class NearDuplicateIndex:
+    """Bounded LRU of (signature -> value) with MinHash/LSH lookup. Thread-safe."""
+
+    def __init__(
+        self,
+        threshold: float = 0.85,
+        max_entries: int = 10_000,
+        ttl_seconds: float = 3600,
+        num_perm: int = 64,
+        bands: int = 16,
+    ):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        # fixed permutation parameters: signatures are comparable for the index's lifetime
+        self._perms = [
+            (zlib.crc32(f"a{i}".encode()) | 1, zlib.crc32(f"b{i}".encode())) for i in range(num_perm)
+        ]
+        self._lock = threading.Lock()
+        self._next_id = 0
+        # id -> (scope + guard, signature, expires_at, value)
+        self._entries: OrderedDict[int, tuple] = OrderedDict()
+        self._buckets: dict[tuple, set[int]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _signature(self, hashes: set[int]) -> array:
+        return array("Q", [min([(a * h + b) % _PRIME for h in hashes]) for a, b in self._perms])
+
+    def _band_keys(self, scope: tuple, signature: array) -> list[tuple]:
+        r = self.rows
+        return [(scope, band, hash(tuple(signature[band * r : (band + 1) * r]))) for band in range(self.bands)]
+
+    def fingerprint(self, scope: str, text: str) -> Fingerprint:
+        """Scope key and MinHash signature of text, for lookup and add."""
+        normalized = normalize(text)
+        head, tail = normalized[:MAX_SHINGLED_CHARS], normalized[MAX_SHINGLED_CHARS:]
+        scope_key = (scope, _meaning_guard(normalized), zlib.crc32(tail.encode("utf-8")) if tail else None)
+        return Fingerprint(scope_key, self._signature(shingles(head)))
+
+    def lookup(self, fingerprint: Fingerprint) -> dict | None:
+        """Value of the most similar live entry in scope at or above the threshold."""
+        scope_key, signature = fingerprint
+        now = time.time()
+        best_id, best_score = None, self.threshold
+        with self._lock:
+            candidates: set[int] = set()
+            for key in self._band_keys(scope_key, signature):
+                candidates.update(self._buckets.get(key, ()))
+            for entry_id in candidates:
+                _, entry_signature, expires_at, _ = self._entries[entry_id]
+                if expires_at <= now:
+                    continue
+                score = sum(x == y for x, y in zip(signature, entry_signature)) / self.num_perm
+                if score >= best_score:
+                    best_id, best_score = entry_id, score
+            if best_id is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best_id)
+            self.hits += 1
+            return self._entries[best_id][3]
+
+    def add(self, fingerprint: Fingerprint, value: dict) -> None:
+        scope_key, signature = fingerprint
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (scope_key, signature, time.time() + self.ttl_seconds, value)
+            for key in self._band_keys(scope_key, signature):
+                self._buckets.setdefault(key, set()).add(entry_id)
+            while len(self._entries) > self.max_entries:
+                self._evict_oldest()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+            }
+
+    def _evict_oldest(self) -> None:
+        entry_id, (scope_key, signature, _, _) = self._entries.popitem(last=False)
+        for key in self._band_keys(scope_key, signature):
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del self._buckets[key]
+        self.evictions += 1
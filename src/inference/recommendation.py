@@ -1,9 +1,35 @@
 from __future__ import annotations
 
+import asyncio
+import functools
+import hashlib
 import json
-from typing import Any
+import time
+from dataclasses import dataclass, replace
+from typing import Any, AsyncIterator
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, ValidationError
+
+from core import fastjson
+from core.breaker import CircuitOpen
+from core.concurrency import Overloaded
+from core.metrics import (
+    INPUT_TOKENS_ESTIMATE,
+    JSON_RECOVERIES,
+    MICRO_BATCH_FALLBACKS,
+    MICRO_BATCH_SIZE,
+    OUTPUT_REINVOKES,
+    OUTPUT_REPAIRS,
+    stage,
+)
+from core.microbatch import MicroBatcher
+
+from .cache import RecommendationCache
+from .cascade import Cascade
+from .near_duplicates import Fingerprint, NearDuplicateIndex
+from .repair import complete_json, rename_fields
+from .stale import StaleWhileRevalidate
+from .streaming import JsonFieldStream, text_delta
 
 
 SYSTEM_PROMPT_SIMPLE = """You are a helpful assistant that improves an objective into a clearer, testable defining objective.
@@ -22,6 +48,93 @@ Output: You MUST return ONLY valid JSON with EXACTLY these keys:
 Do not wrap your JSON in markdown. Do not include any other keys.
 """
 
+SYSTEM_PROMPT_BATCH = """You are a helpful assistant that improves objectives into clearer, testable defining objectives.
+
+Input: You will receive a JSON array of items, each containing:
+  - id: string
+  - objective: string
+  - context: optional object with fields like persona, domain, instructions, satisfactionCriteria, extraNotes
+
+Handle every item independently. Output: You MUST return ONLY valid JSON with one result per input item:
+{
+  \"results\": [
+    {
+      \"id\": string (the item's id),
+      \"reason\": string,
+      \"suggestedDefiningObjective\": string,
+      \"alternativeDefiningObjective\": string
+    }
+  ]
+}
+
+Do not wrap your JSON in markdown. Do not include any other keys.
+"""
+
+ANTHROPIC_VERSION = "bedrock-2023-05-31"
+
+# Output budget of one batched call; the sum of the items' budgets is capped here
+BATCH_MAX_TOKENS = 4096
+
+# Changes whenever the prompt does, so cached answers from an older prompt are not reused
+PROMPT_VERSION = hashlib.sha256(
+    (ANTHROPIC_VERSION + SYSTEM_PROMPT_SIMPLE).encode("utf-8")
+).hexdigest()[:12]
+
+
+@dataclass(frozen=True)
+class PromptOptions:
+    """How the Bedrock request body is built.
+
+    compact: send the request as minified JSON without null fields (fewer input tokens).
+    cache_system_prompt: mark the static system prompt with an Anthropic cache_control
+        block. Bedrock only caches prompts above the model's minimum size (1024+ tokens),
+        so this pays off once the system prompt grows.
+    max_tokens_cap: upper bound for max_tokens, which is otherwise sized from the input.
+    tool_output: force the answer through the submit_recommendation tool, so it arrives
+        as structured tool input rather than free text that has to be parsed.
+    max_reinvokes: extra Bedrock calls allowed when a reply is unusable and local
+        repair cannot fix it (only made when the retry can change the outcome).
+    """
+
+    compact: bool = True
+    cache_system_prompt: bool = False
+    max_tokens_cap: int = 512
+    tool_output: bool = False
+    max_reinvokes: int = 1
+
+    @property
+    def version(self) -> str:
+        # Only options that can change the model's answer belong in cache keys
+        return f"{PROMPT_VERSION}{'c' if self.compact else 'p'}{'t' if self.tool_output else ''}"
+
+
+DEFAULT_PROMPT = PromptOptions()
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 chars per token for English/JSON); no tokenizer needed."""
+    return (len(text) + 3) // 4
+
+
+def estimate_input_tokens(body: dict) -> int:
+    system = body.get("system")
+    if isinstance(system, list):
+        system = "".join(block.get("text", "") for block in system)
+    total = estimate_tokens(system or "")
+    for message in body.get("messages") or []:
+        for block in message.get("content") or []:
+            total += estimate_tokens(block.get("text", ""))
+    return total
+
+
+def _max_tokens_for(user_text: str, cap: int) -> int:
+    """Output budget: the answer restates the objective twice plus a short reason.
+
+    Bedrock reserves max_tokens against the tokens-per-minute quota up front, so a
+    tight budget lets more calls run concurrently under the same quota.
+    """
+    return max(min(320, cap), min(cap, 160 + 3 * estimate_tokens(user_text)))
+
 
 class SimpleContext(BaseModel):
     persona: str | None = None
@@ -36,12 +149,68 @@ class SimpleObjectiveRequest(BaseModel):
     context: SimpleContext | None = None
 
 
-class SimpleRecommendResponse(BaseModel):
+class SimpleBatchRequest(BaseModel):
+    items: list[SimpleObjectiveRequest] = Field(..., min_length=1)
+
+
+class ModelAnswer(BaseModel):
+    """The fields the model generates. Model output is validated against this, so any
+    other keys in a reply (the service-set flags included) are dropped."""
+
     reason: str
     suggestedDefiningObjective: str
     alternativeDefiningObjective: str
 
 
+class SimpleRecommendResponse(ModelAnswer):
+    # Set by the service, not the model: answer reused from a near-duplicate objective
+    reused: bool = False
+    # Set by the service: expired cached answer, served while Bedrock is unavailable
+    stale: bool = False
+
+
+# Fields the model generates (excludes service-set flags)
+RESPONSE_FIELDS = ("reason", "suggestedDefiningObjective", "alternativeDefiningObjective")
+
+
+def _tool_schema() -> dict:
+    """ModelAnswer's JSON schema, for forcing the answer through a tool call."""
+    properties = ModelAnswer.model_json_schema()["properties"]
+    return {
+        "type": "object",
+        "properties": {name: properties[name] for name in RESPONSE_FIELDS},
+        "required": list(RESPONSE_FIELDS),
+        "additionalProperties": False,
+    }
+
+
+RECOMMENDATION_TOOL = {
+    "name": "submit_recommendation",
+    "description": "Submit the improved, testable defining objective.",
+    "input_schema": _tool_schema(),
+}
+_TOOL_CHOICE = {"type": "tool", "name": RECOMMENDATION_TOOL["name"]}
+
+
+def _batch_tool_schema() -> dict:
+    item = _tool_schema()
+    item["properties"] = {"id": {"type": "string"}, **item["properties"]}
+    item["required"] = ["id", *item["required"]]
+    return {
+        "type": "object",
+        "properties": {"results": {"type": "array", "items": item}},
+        "required": ["results"],
+        "additionalProperties": False,
+    }
+
+
+BATCH_TOOL = {
+    "name": "submit_recommendations",
+    "description": "Submit one improved, testable defining objective per input item.",
+    "input_schema": _batch_tool_schema(),
+}
+
+
 def _extract_text_from_anthropic_bedrock(resp: dict) -> str:
     """Extract concatenated text from a Bedrock Anthropic-style response."""
     content = resp.get("content")
@@ -62,50 +231,663 @@ def _extract_text_from_anthropic_bedrock(resp: dict) -> str:
     return ""
 
 
+_DECODER = json.JSONDecoder()
+
+
 def _safe_json_loads(text: str) -> dict:
     """Parse JSON, with a small recovery attempt if the model included extra text."""
     try:
-        return json.loads(text)
-    except json.JSONDecodeError:
-        # Recovery: extract the first {...} block
-        start = text.find("{")
-        end = text.rfind("}")
-        if start != -1 and end != -1 and end > start:
-            return json.loads(text[start : end + 1])
-        raise
+        return fastjson.loads(text)
+    except ValueError:
+        return _recover_json(text)[0]
 
 
-def recommend_objective(
-    payload: dict | SimpleObjectiveRequest,
-    bedrock_client: Any,
-    model_id: str,
-) -> SimpleRecommendResponse:
-    """Main inference function used by the API route."""
-    req = payload if isinstance(payload, SimpleObjectiveRequest) else SimpleObjectiveRequest.model_validate(payload)
-    model_input = req.model_dump()
+def _recover_json(text: str) -> tuple[dict, str]:
+    """Decode the first JSON object in text, ignoring whatever surrounds it.
+
+    raw_decode stops where the object ends, so this is one scan from the first "{";
+    trailing text is never searched for or re-parsed. An object cut off between
+    values (max_tokens) is closed instead. Returns (object, "extra_text" | "truncated").
+    """
+    start = text.find("{")
+    if start == -1:
+        raise ValueError("Model text does not contain a JSON object")
+    try:
+        return _DECODER.raw_decode(text, start)[0], "extra_text"
+    except ValueError:
+        completed = complete_json(text[start:])
+        if completed is None:
+            raise
+        return fastjson.loads(completed), "truncated"
+
+
+def _build_request_body(req: SimpleObjectiveRequest, prompt: PromptOptions = DEFAULT_PROMPT) -> dict:
+    """Anthropic Messages payload for a single objective."""
+    if prompt.compact:
+        user_text = json.dumps(canonical_request(req), ensure_ascii=False, separators=(",", ":"))
+    else:
+        user_text = json.dumps(req.model_dump(), ensure_ascii=False, indent=2)
+
+    system: str | list[dict] = SYSTEM_PROMPT_SIMPLE
+    if prompt.cache_system_prompt:
+        system = [{"type": "text", "text": SYSTEM_PROMPT_SIMPLE, "cache_control": {"type": "ephemeral"}}]
 
     body = {
-        "anthropic_version": "bedrock-2023-05-31",
-        "system": SYSTEM_PROMPT_SIMPLE,
+        "anthropic_version": ANTHROPIC_VERSION,
+        "system": system,
         "messages": [
             {
                 "role": "user",
                 "content": [
                     {
                         "type": "text",
-                        "text": json.dumps(model_input, ensure_ascii=False, indent=2),
+                        "text": user_text,
                     }
                 ],
             }
         ],
-        "max_tokens": 512,
+        "max_tokens": _max_tokens_for(user_text, prompt.max_tokens_cap),
         "temperature": 0.0,
     }
+    if prompt.tool_output:
+        body["tools"] = [RECOMMENDATION_TOOL]
+        body["tool_choice"] = _TOOL_CHOICE
+    return body
+
+
+def _prepare_body(req: SimpleObjectiveRequest, prompt: PromptOptions) -> dict:
+    with stage("build_prompt"):
+        body = _build_request_body(req, prompt)
+    INPUT_TOKENS_ESTIMATE.observe(estimate_input_tokens(body))
+    return body
 
-    resp = bedrock_client.invoke_model(model_id=model_id, body=body)
-    raw_text = _extract_text_from_anthropic_bedrock(resp)
+
+def _tool_input(resp: dict, tool: dict = RECOMMENDATION_TOOL) -> dict | None:
+    for block in resp.get("content") or ():
+        if isinstance(block, dict) and block.get("type") == "tool_use" and block.get("name") == tool["name"]:
+            return block.get("input")
+    return None
+
+
+def _parse_model_response(resp: dict) -> SimpleRecommendResponse:
+    with stage("extract"):
+        tool_input = _tool_input(resp)
+        raw_text = _extract_text_from_anthropic_bedrock(resp) if tool_input is None else ""
+    if tool_input is not None:
+        with stage("parse"):
+            return _validate_fields(tool_input)
     if not raw_text:
         raise ValueError("Bedrock response did not contain model text")
+    return _validate_model_text(raw_text)
+
+
+def _validate_model_text(raw_text: str) -> SimpleRecommendResponse:
+    """Parse and validate in one pass; only malformed JSON falls back to recovery."""
+    with stage("parse"):
+        try:
+            return _response(ModelAnswer.model_validate_json(raw_text))
+        except ValidationError as e:
+            if e.errors()[0]["type"] != "json_invalid":
+                return _validate_fields(fastjson.loads(raw_text))
+        parsed, repair = _recover_json(raw_text)
+        result = _validate_fields(parsed)
+    # counted only once the repaired reply has validated
+    if repair == "truncated":
+        OUTPUT_REPAIRS.inc("truncated")
+    else:
+        JSON_RECOVERIES.inc()
+    return result
+
+
+def _validate_fields(data: Any) -> SimpleRecommendResponse:
+    """Validate parsed output; fields under another spelling are renamed before giving up."""
+    try:
+        return _response(ModelAnswer.model_validate(data))
+    except ValidationError:
+        renamed = rename_fields(data, RESPONSE_FIELDS)
+        if renamed is None:
+            raise
+    result = _response(ModelAnswer.model_validate(renamed))
+    OUTPUT_REPAIRS.inc("keys")
+    return result
+
+
+def _response(answer: ModelAnswer, reused: bool = False, stale: bool = False) -> SimpleRecommendResponse:
+    """The API response for a validated answer; the flags only ever come from the service."""
+    return SimpleRecommendResponse.model_construct(**answer.__dict__, reused=reused, stale=stale)
+
+
+def _stored(value: dict, reused: bool = False, stale: bool = False) -> SimpleRecommendResponse:
+    """Response for an answer kept by the cache or the near-duplicate index."""
+    return _response(ModelAnswer.model_validate(value), reused=reused, stale=stale)
+
+
+def _retry_body(body: dict, resp: dict) -> dict | None:
+    """Request for a re-invoke after an unusable reply, or None if repeating cannot help.
+
+    Calls run at temperature 0, so the same request would mostly fail the same way: a
+    truncated reply gets twice the max_tokens, free text is retried through the tool.
+    """
+    if resp.get("stop_reason") == "max_tokens":
+        OUTPUT_REINVOKES.inc("truncated")
+        return {**body, "max_tokens": body["max_tokens"] * 2}
+    if "tools" not in body:
+        OUTPUT_REINVOKES.inc("invalid")
+        return {**body, "tools": [RECOMMENDATION_TOOL], "tool_choice": _TOOL_CHOICE}
+    return None
+
+
+def _invoke_primary(body: dict, bedrock_client: Any, model_id: str, prompt: PromptOptions) -> SimpleRecommendResponse:
+    """Call the primary model, re-invoking at most prompt.max_reinvokes times."""
+    for attempt in range(prompt.max_reinvokes + 1):
+        with stage("upstream"):
+            resp = bedrock_client.invoke_model(model_id=model_id, body=body)
+        try:
+            return _parse_model_response(resp)
+        except ValueError:
+            retry = _retry_body(body, resp) if attempt < prompt.max_reinvokes else None
+            if retry is None:
+                raise
+            body = retry
+
+
+async def _ainvoke_primary(
+    body: dict, bedrock_client: Any, model_id: str, prompt: PromptOptions
+) -> SimpleRecommendResponse:
+    """Async variant of _invoke_primary."""
+    for attempt in range(prompt.max_reinvokes + 1):
+        with stage("upstream"):
+            resp = await bedrock_client.ainvoke_model(model_id=model_id, body=body)
+        try:
+            return _parse_model_response(resp)
+        except ValueError:
+            retry = _retry_body(body, resp) if attempt < prompt.max_reinvokes else None
+            if retry is None:
+                raise
+            body = retry
 
-    parsed = _safe_json_loads(raw_text)
-    return SimpleRecommendResponse.model_validate(parsed)
\ No newline at end of file
+
+def _build_batch_body(reqs: list[SimpleObjectiveRequest], prompt: PromptOptions) -> dict:
+    """One Anthropic Messages payload for several objectives, ids being list positions."""
+    items = [canonical_request(req) for req in reqs]
+    max_tokens = sum(
+        _max_tokens_for(json.dumps(item, ensure_ascii=False, separators=(",", ":")), prompt.max_tokens_cap)
+        for item in items
+    )
+    user_text = json.dumps(
+        [{"id": str(i), **item} for i, item in enumerate(items)], ensure_ascii=False, separators=(",", ":")
+    )
+
+    system: str | list[dict] = SYSTEM_PROMPT_BATCH
+    if prompt.cache_system_prompt:
+        system = [{"type": "text", "text": SYSTEM_PROMPT_BATCH, "cache_control": {"type": "ephemeral"}}]
+
+    body = {
+        "anthropic_version": ANTHROPIC_VERSION,
+        "system": system,
+        "messages": [{"role": "user", "content": [{"type": "text", "text": user_text}]}],
+        "max_tokens": min(BATCH_MAX_TOKENS, max_tokens),
+        "temperature": 0.0,
+    }
+    if prompt.tool_output:
+        body["tools"] = [BATCH_TOOL]
+        body["tool_choice"] = {"type": "tool", "name": BATCH_TOOL["name"]}
+    return body
+
+
+def _parse_batch_response(resp: dict, count: int) -> list[SimpleRecommendResponse | None]:
+    """Answers by position; None where the reply has no valid entry for that id."""
+    with stage("extract"):
+        data = _tool_input(resp, BATCH_TOOL)
+        raw_text = _extract_text_from_anthropic_bedrock(resp) if data is None else ""
+    answers: list[SimpleRecommendResponse | None] = [None] * count
+    with stage("parse"):
+        if data is None:
+            data = _safe_json_loads(raw_text)
+        entries = data.get("results") if isinstance(data, dict) else data
+        for entry in entries if isinstance(entries, list) else ():
+            try:
+                index = int(entry["id"])
+                if 0 <= index < count and answers[index] is None:
+                    answers[index] = _validate_fields({k: v for k, v in entry.items() if k != "id"})
+            except (TypeError, KeyError, ValueError):
+                continue
+    return answers
+
+
+async def _arecommend_batch(
+    items: list[tuple[SimpleObjectiveRequest, dict]], bedrock_client: Any, model_id: str, prompt: PromptOptions
+) -> list[SimpleRecommendResponse | Exception]:
+    """MicroBatcher flush: one Bedrock call for several (request, single-call body) items.
+
+    Items missing or invalid in the reply fall back to their own call; a failed batch
+    call (throttling, 5xx) fails every item, as it would have failed them one by one.
+    """
+    MICRO_BATCH_SIZE.observe(len(items))
+    answers: list = [None] * len(items)
+    if len(items) > 1:
+        with stage("build_prompt"):
+            body = _build_batch_body([req for req, _ in items], prompt)
+        with stage("upstream"):
+            resp = await bedrock_client.ainvoke_model(model_id=model_id, body=body)
+        try:
+            answers = _parse_batch_response(resp, len(items))
+        except ValueError:
+            pass
+        MICRO_BATCH_FALLBACKS.inc(amount=answers.count(None))
+
+    async def single(body: dict):
+        try:
+            return await _ainvoke_primary(body, bedrock_client, model_id, prompt)
+        except Exception as e:
+            return e
+
+    missing = [i for i, answer in enumerate(answers) if answer is None]
+    for i, result in zip(missing, await asyncio.gather(*(single(items[i][1]) for i in missing))):
+        answers[i] = result
+    return answers
+
+
+def _as_request(payload: dict | SimpleObjectiveRequest) -> SimpleObjectiveRequest:
+    if isinstance(payload, SimpleObjectiveRequest):
+        return payload
+    with stage("validate_request"):
+        return SimpleObjectiveRequest.model_validate(payload)
+
+
+def _cached(cache: RecommendationCache, key: str) -> SimpleRecommendResponse | None:
+    with stage("cache_lookup"):
+        hit = cache.get(key)
+        return _stored(hit) if hit is not None else None
+
+
+async def _acached(cache: RecommendationCache, key: str) -> SimpleRecommendResponse | None:
+    """Async variant of _cached; a memory miss reads SQLite off the event loop."""
+    with stage("cache_lookup"):
+        hit = await cache.aget(key)
+        return _stored(hit) if hit is not None else None
+
+
+def _near_duplicate_scope(req: SimpleObjectiveRequest, model_id: str, prompt: PromptOptions) -> str:
+    """Near-duplicates only count under the same model, prompt and an identical context."""
+    context = canonical_request(req).get("context")
+    return f"{model_id}\0{prompt.version}\0{json.dumps(context, sort_keys=True, ensure_ascii=False)}"
+
+
+def _reuse(
+    req: SimpleObjectiveRequest,
+    model_id: str,
+    prompt: PromptOptions,
+    cache: RecommendationCache | None,
+    use_cache: bool,
+    near_duplicates: NearDuplicateIndex | None,
+) -> tuple[str | None, Fingerprint | None, SimpleRecommendResponse | None]:
+    """(cache key, near-duplicate fingerprint, earlier answer from the cache or the
+    near-duplicate index, if any). The key and fingerprint are passed on to _remember."""
+    key = cache_key(req, model_id, prompt) if cache is not None else None
+    if use_cache and key:
+        hit = _cached(cache, key)
+        if hit is not None:
+            return key, None, hit
+    return (key, *_similar(req, model_id, prompt, use_cache, near_duplicates))
+
+
+async def _areuse(
+    req: SimpleObjectiveRequest,
+    model_id: str,
+    prompt: PromptOptions,
+    cache: RecommendationCache | None,
+    use_cache: bool,
+    near_duplicates: NearDuplicateIndex | None,
+) -> tuple[str | None, Fingerprint | None, SimpleRecommendResponse | None]:
+    """Async variant of _reuse."""
+    key = cache_key(req, model_id, prompt) if cache is not None else None
+    if use_cache and key:
+        hit = await _acached(cache, key)
+        if hit is not None:
+            return key, None, hit
+    return (key, *_similar(req, model_id, prompt, use_cache, near_duplicates))
+
+
+def _similar(
+    req: SimpleObjectiveRequest,
+    model_id: str,
+    prompt: PromptOptions,
+    use_cache: bool,
+    near_duplicates: NearDuplicateIndex | None,
+) -> tuple[Fingerprint | None, SimpleRecommendResponse | None]:
+    """(fingerprint, answer to a near-duplicate objective if any). The fingerprint is
+    computed even with use_cache=False: the fresh answer is added under it."""
+    if near_duplicates is None:
+        return None, None
+    with stage("near_duplicate_lookup"):
+        fingerprint = near_duplicates.fingerprint(_near_duplicate_scope(req, model_id, prompt), req.objective)
+        similar = near_duplicates.lookup(fingerprint) if use_cache else None
+    if similar is None:
+        return fingerprint, None
+    return fingerprint, _stored(similar, reused=True)
+
+
+def _remember(
+    key: str | None,
+    fingerprint: Fingerprint | None,
+    cache: RecommendationCache | None,
+    near_duplicates: NearDuplicateIndex | None,
+    result: SimpleRecommendResponse,
+) -> None:
+    # only what the model generated: the flags describe this response, not the answer
+    value = {name: getattr(result, name) for name in RESPONSE_FIELDS}
+    if key:
+        cache.set(key, value)
+    if fingerprint is not None:
+        near_duplicates.add(fingerprint, value)
+
+
+async def _stale_answer(
+    req: SimpleObjectiveRequest,
+    key: str | None,
+    stale: StaleWhileRevalidate | None,
+    bedrock_client: Any,
+    model_id: str,
+    cache: RecommendationCache | None,
+    prompt: PromptOptions,
+    near_duplicates: NearDuplicateIndex | None,
+    cascade: Cascade | None,
+) -> SimpleRecommendResponse | None:
+    """Last known good answer while the circuit is open, if any; queues a fresh call for later."""
+    if stale is None or key is None:
+        return None
+    refresh = functools.partial(
+        arecommend_objective,
+        req,
+        bedrock_client=bedrock_client,
+        model_id=model_id,
+        cache=cache,
+        use_cache=False,
+        prompt=prompt,
+        near_duplicates=near_duplicates,
+        cascade=cascade,
+    )
+    value = await stale.serve(key, refresh)
+    return _stored(value, stale=True) if value is not None else None
+
+
+def canonical_request(req: SimpleObjectiveRequest) -> dict:
+    """Request as plain data with unset fields and an empty context dropped."""
+    data = req.model_dump(exclude_none=True)
+    if not data.get("context"):
+        data.pop("context", None)
+    return data
+
+
+def cache_key(req: SimpleObjectiveRequest, model_id: str, prompt: PromptOptions = DEFAULT_PROMPT) -> str:
+    canonical = json.dumps(
+        {"model": model_id, "prompt": prompt.version, "request": canonical_request(req)},
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def recommend_objective(
+    payload: dict | SimpleObjectiveRequest,
+    bedrock_client: Any,
+    model_id: str,
+    cache: RecommendationCache | None = None,
+    use_cache: bool = True,
+    prompt: PromptOptions = DEFAULT_PROMPT,
+    near_duplicates: NearDuplicateIndex | None = None,
+    cascade: Cascade | None = None,
+) -> SimpleRecommendResponse:
+    """Main inference function used by the API route.
+
+    With a cache, hits skip Bedrock entirely; use_cache=False forces a fresh call but
+    still stores the result. With a near-duplicate index, a close enough earlier
+    objective (same context) is answered from its result, flagged reused=True.
+    With a cascade, its fast models answer first and model_id only gets the requests
+    whose answers fail the cascade's checks.
+    """
+    req = _as_request(payload)
+    answering = cascade.answering_model(model_id) if cascade else model_id
+    key, fingerprint, earlier = _reuse(req, answering, prompt, cache, use_cache, near_duplicates)
+    if earlier is not None:
+        return earlier
+
+    body = _prepare_body(req, prompt)
+    result = _fast_tiers(req, body, bedrock_client, cascade)
+    if result is None:
+        started = time.perf_counter()
+        result = _invoke_primary(body, bedrock_client, model_id, prompt)
+        if cascade:
+            cascade.answered(model_id, started)
+    _remember(key, fingerprint, cache, near_duplicates, result)
+    return result
+
+
+def _fast_tiers(
+    req: SimpleObjectiveRequest, body: dict, bedrock_client: Any, cascade: Cascade | None
+) -> SimpleRecommendResponse | None:
+    """First fast-tier answer that passes the cascade's checks, or None to escalate.
+
+    Only a failed call or a rejected answer escalates; load shedding and an open circuit
+    are raised to the caller as they would be for the primary model.
+    """
+    for tier in cascade.model_ids if cascade else ():
+        started = time.perf_counter()
+        try:
+            with stage("upstream"):
+                resp = bedrock_client.invoke_model(model_id=tier, body=body)
+            result = _parse_model_response(resp)
+        except (Overloaded, CircuitOpen):
+            # shed or refused, not a poor answer: escalating would only add load upstream
+            raise
+        except Exception as e:
+            cascade.accepts(tier, started, req.objective, error=e)
+            continue
+        if cascade.accepts(tier, started, req.objective, result):
+            return result
+    return None
+
+
+async def arecommend_objective(
+    payload: dict | SimpleObjectiveRequest,
+    bedrock_client: Any,
+    model_id: str,
+    cache: RecommendationCache | None = None,
+    use_cache: bool = True,
+    prompt: PromptOptions = DEFAULT_PROMPT,
+    near_duplicates: NearDuplicateIndex | None = None,
+    cascade: Cascade | None = None,
+    batcher: MicroBatcher | None = None,
+    stale: StaleWhileRevalidate | None = None,
+) -> SimpleRecommendResponse:
+    """Async variant of recommend_objective; the client must provide ainvoke_model.
+
+    With a batcher, the call to model_id is packed with other requests arriving within
+    its window into one Bedrock invocation (see _arecommend_batch). With stale, a call
+    refused by an open circuit breaker is answered from the expired cache entry, if
+    there is one, flagged stale=True and refreshed in the background.
+    """
+    req = _as_request(payload)
+    answering = cascade.answering_model(model_id) if cascade else model_id
+    key, fingerprint, earlier = await _areuse(req, answering, prompt, cache, use_cache, near_duplicates)
+    if earlier is not None:
+        return earlier
+
+    body = _prepare_body(req, prompt)
+    try:
+        result = await _afast_tiers(req, body, bedrock_client, cascade)
+        if result is None:
+            started = time.perf_counter()
+            if batcher is not None:
+                result = await batcher.submit(
+                    (id(bedrock_client), model_id, prompt),
+                    (req, body),
+                    functools.partial(_arecommend_batch, bedrock_client=bedrock_client, model_id=model_id, prompt=prompt),
+                )
+            else:
+                result = await _ainvoke_primary(body, bedrock_client, model_id, prompt)
+            if cascade:
+                cascade.answered(model_id, started)
+    except CircuitOpen:
+        fallback = await _stale_answer(
+            req, key, stale, bedrock_client, model_id, cache, prompt, near_duplicates, cascade
+        )
+        if fallback is None:
+            raise
+        return fallback
+    _remember(key, fingerprint, cache, near_duplicates, result)
+    return result
+
+
+async def _afast_tiers(
+    req: SimpleObjectiveRequest, body: dict, bedrock_client: Any, cascade: Cascade | None
+) -> SimpleRecommendResponse | None:
+    """Async variant of _fast_tiers."""
+    for tier in cascade.model_ids if cascade else ():
+        started = time.perf_counter()
+        try:
+            with stage("upstream"):
+                resp = await bedrock_client.ainvoke_model(model_id=tier, body=body)
+            result = _parse_model_response(resp)
+        except (Overloaded, CircuitOpen):
+            # shed or refused, not a poor answer: escalating would only add load upstream
+            raise
+        except Exception as e:
+            cascade.accepts(tier, started, req.objective, error=e)
+            continue
+        if cascade.accepts(tier, started, req.objective, result):
+            return result
+    return None
+
+
+async def arecommend_many(
+    items: list[dict | SimpleObjectiveRequest],
+    bedrock_client: Any,
+    model_id: str,
+    concurrency: int = 8,
+    cache: RecommendationCache | None = None,
+    use_cache: bool = True,
+    prompt: PromptOptions = DEFAULT_PROMPT,
+    near_duplicates: NearDuplicateIndex | None = None,
+    cascade: Cascade | None = None,
+    batcher: MicroBatcher | None = None,
+    stale: StaleWhileRevalidate | None = None,
+) -> AsyncIterator[tuple[int, SimpleRecommendResponse | Exception]]:
+    """Run many objectives with at most `concurrency` in flight.
+
+    Yields (index, result) in completion order; a failed item yields its exception
+    instead of aborting the rest. Closing the iterator cancels unfinished items.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_one(index: int, item: dict | SimpleObjectiveRequest):
+        async with semaphore:
+            try:
+                result = await arecommend_objective(
+                    item,
+                    bedrock_client=bedrock_client,
+                    model_id=model_id,
+                    cache=cache,
+                    use_cache=use_cache,
+                    prompt=prompt,
+                    near_duplicates=near_duplicates,
+                    cascade=cascade,
+                    batcher=batcher,
+                    stale=stale,
+                )
+                return index, result
+            except Exception as e:
+                return index, e
+
+    tasks = [asyncio.ensure_future(run_one(i, item)) for i, item in enumerate(items)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def astream_recommend_objective(
+    payload: dict | SimpleObjectiveRequest,
+    bedrock_client: Any,
+    model_id: str,
+    cache: RecommendationCache | None = None,
+    use_cache: bool = True,
+    prompt: PromptOptions = DEFAULT_PROMPT,
+    near_duplicates: NearDuplicateIndex | None = None,
+    cascade: Cascade | None = None,
+    stale: StaleWhileRevalidate | None = None,
+) -> AsyncIterator[tuple[str, Any]]:
+    """Streaming variant of arecommend_objective.
+
+    Yields ("field", (name, value)) as each response field finishes generating, then
+    ("done", SimpleRecommendResponse) once the whole answer has been validated. The
+    client must provide ainvoke_model_stream (Anthropic streaming events).
+
+    Fast cascade tiers are not streamed: their answer has to pass the checks before any
+    of it is sent. Only the primary model's answer streams field by field.
+    """
+    req = _as_request(payload)
+    answering = cascade.answering_model(model_id) if cascade else model_id
+    key, fingerprint, earlier = await _areuse(req, answering, prompt, cache, use_cache, near_duplicates)
+    if earlier is None:
+        body = _prepare_body(req, prompt)
+        try:
+            earlier = await _afast_tiers(req, body, bedrock_client, cascade)
+        except CircuitOpen:
+            earlier = await _stale_answer(
+                req, key, stale, bedrock_client, model_id, cache, prompt, near_duplicates, cascade
+            )
+            if earlier is None:
+                raise
+        else:
+            if earlier is not None:
+                _remember(key, fingerprint, cache, near_duplicates, earlier)
+    if earlier is not None:
+        for name in RESPONSE_FIELDS:
+            yield "field", (name, getattr(earlier, name))
+        yield "done", earlier
+        return
+
+    started = time.perf_counter()
+    fields = JsonFieldStream()
+    stop_reason = None
+    try:
+        async for event in bedrock_client.ainvoke_model_stream(model_id=model_id, body=body):
+            if event.get("type") == "message_delta":
+                stop_reason = (event.get("delta") or {}).get("stop_reason")
+            for name, value in fields.feed(text_delta(event)):
+                if name in RESPONSE_FIELDS:
+                    yield "field", (name, value)
+    except CircuitOpen:
+        # raised before the first event, so no field has been sent yet
+        fallback = await _stale_answer(
+            req, key, stale, bedrock_client, model_id, cache, prompt, near_duplicates, cascade
+        )
+        if fallback is None:
+            raise
+        for name in RESPONSE_FIELDS:
+            yield "field", (name, getattr(fallback, name))
+        yield "done", fallback
+        return
+
+    raw_text = fields.text.strip()
+    try:
+        if not raw_text:
+            raise ValueError("Bedrock response did not contain model text")
+        result = _validate_model_text(raw_text)
+    except ValueError:
+        # the re-invoke is not streamed; its "done" answer supersedes the fields sent so far
+        retry = _retry_body(body, {"stop_reason": stop_reason}) if prompt.max_reinvokes else None
+        if retry is None:
+            raise
+        result = await _ainvoke_primary(
+            retry, bedrock_client, model_id, replace(prompt, max_reinvokes=prompt.max_reinvokes - 1)
+        )
+    if cascade:
+        cascade.answered(model_id, started)
+    _remember(key, fingerprint, cache, near_duplicates, result)
+    yield "done", result
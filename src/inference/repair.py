@@ -0,0 +1,87 @@
+"""Local repair of model output that almost matches the response schema.
+
+Repairs never invent or shorten answer text: a reply cut off inside a string value
+cannot be completed here and is left to a re-invoke with a larger max_tokens.
+"""
+
+from __future__ import annotations
+
+import re
+
+_CLOSERS = {"{": "}", "[": "]"}
+_NON_ALNUM = re.compile(r"[^a-z0-9]")
+
+
+def complete_json(text: str) -> str | None:
+    """Close a JSON object that was cut off between values, or None if a value was cut.
+
+    Scans from the first "{" and remembers the last point after a complete value; a
+    dangling key, colon or comma after it is dropped and the open brackets are closed.
+    """
+    start = text.find("{")
+    if start == -1:
+        return None
+    stack: list[str] = []
+    in_string = escape = string_is_value = expect_value = False
+    safe, safe_stack = None, ()
+    for i in range(start, len(text)):
+        ch = text[i]
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+                if string_is_value:
+                    safe, safe_stack = i + 1, tuple(stack)
+            continue
+        if ch == '"':
+            in_string = True
+            string_is_value = expect_value or stack[-1] == "["
+            expect_value = False
+        elif ch in "{[":
+            stack.append(ch)
+            expect_value = False
+            safe, safe_stack = i + 1, tuple(stack)
+        elif ch in "}]":
+            stack.pop()
+            if not stack:
+                return text[start : i + 1]
+            safe, safe_stack = i + 1, tuple(stack)
+        elif ch == ":":
+            expect_value = True
+        elif ch == ",":
+            expect_value = False
+            safe, safe_stack = i, tuple(stack)
+    if (in_string and string_is_value) or safe is None:
+        return None
+    return text[start:safe] + "".join(_CLOSERS[c] for c in reversed(safe_stack))
+
+
+def _norm(key: str) -> str:
+    return _NON_ALNUM.sub("", key.lower())
+
+
+def rename_fields(data, fields: tuple[str, ...]) -> dict | None:
+    """Map differently spelled keys (snake_case, other casing) onto the expected fields.
+
+    Also unwraps a single-key wrapper object ({"recommendation": {...}}). Returns None
+    when a field is missing under every spelling, or when nothing needed renaming.
+    """
+    if not isinstance(data, dict):
+        return None
+    if len(data) == 1:
+        (inner,) = data.values()
+        if isinstance(inner, dict):
+            return rename_fields(inner, fields) or (inner if all(f in inner for f in fields) else None)
+    by_norm = {_norm(k): k for k in data}
+    renamed = dict(data)
+    for field in fields:
+        if field in data:
+            continue
+        key = by_norm.get(_norm(field)) or by_norm.get(_norm(field).replace("defining", ""))
+        if key is None:
+            return None
+        renamed[field] = data[key]
+    return renamed if renamed.keys() != data.keys() else None
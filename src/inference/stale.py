@@ -0,0 +1,85 @@
+"""Stale-while-revalidate: last known good answers while the Bedrock circuit is open.
+
+When a call fails fast because the breaker is open, the answer cached for the same
+request is served even if it has expired (within the cache's stale_seconds), and the
+request is queued for a background refresh. Refreshes run one at a time once the
+breaker admits calls again - the first ones double as its half-open probes - so a
+recovering Bedrock is not hit by the whole backlog at once.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Awaitable, Callable
+
+from core.breaker import CLOSED, CircuitBreaker, CircuitOpen
+from core.metrics import STALE_REFRESHES, STALE_SERVED
+
+from .cache import RecommendationCache
+
+logger = logging.getLogger(__name__)
+
+Refresh = Callable[[], Awaitable]
+
+
+class StaleWhileRevalidate:
+    """Async callers on one event loop only. At most max_pending refreshes are queued."""
+
+    def __init__(
+        self,
+        cache: RecommendationCache,
+        breaker: CircuitBreaker,
+        max_pending: int = 256,
+        poll_seconds: float = 1.0,
+    ):
+        self.cache = cache
+        self.breaker = breaker
+        self.max_pending = max_pending
+        self.poll_seconds = poll_seconds
+        self._pending: dict[str, Refresh] = {}
+        self._drainer: asyncio.Task | None = None
+
+    async def serve(self, key: str, refresh: Refresh) -> dict | None:
+        """The stale answer for key (queuing refresh), or None if there is none."""
+        value = await self.cache.aget_stale(key)
+        if value is None:
+            return None
+        STALE_SERVED.inc()
+        if key not in self._pending and len(self._pending) < self.max_pending:
+            self._pending[key] = refresh
+            if self._drainer is None or self._drainer.done():
+                self._drainer = asyncio.ensure_future(self._drain())
+        return value
+
+    def stats(self) -> dict:
+        return {"pending": len(self._pending), "breaker": self.breaker.state}
+
+    def close(self) -> None:
+        if self._drainer is not None:
+            self._drainer.cancel()
+
+    async def _drain(self) -> None:
+        while self._pending:
+            wait = self.breaker.retry_after()
+            if wait > 0:
+                await asyncio.sleep(min(wait, self.poll_seconds))
+                continue
+            key = next(iter(self._pending))
+            refresh = self._pending.pop(key)
+            try:
+                await refresh()
+            except CircuitOpen:
+                # a probe failed (or another caller holds the probe slots): try again later
+                self._pending.setdefault(key, refresh)
+                STALE_REFRESHES.inc("deferred")
+                await asyncio.sleep(self.poll_seconds)
+            except Exception as e:
+                logger.warning("Stale answer refresh failed: %s", e)
+                STALE_REFRESHES.inc("failed")
+                if self.breaker.state != CLOSED:
+                    # the probe failed and reopened the breaker; keep it for the next probe
+                    self._pending.setdefault(key, refresh)
+                    await asyncio.sleep(self.poll_seconds)
+            else:
+                STALE_REFRESHES.inc("ok")
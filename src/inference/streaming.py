@@ -0,0 +1,92 @@
+"""Incremental parsing of a streamed JSON object.
+
+The model streams its JSON answer a few characters at a time. JsonFieldStream is fed
+those fragments and reports each top-level string field as soon as its closing quote
+arrives, so callers can forward `reason` before the objectives are even generated.
+"""
+
+from __future__ import annotations
+
+import json
+
+
+class JsonFieldStream:
+    """Single-pass scanner over the first top-level JSON object in a text stream.
+
+    Text before the opening brace (stray prose) is ignored; nested values are skipped.
+    """
+
+    def __init__(self):
+        self.text_parts: list[str] = []
+        self._depth = 0
+        self._started = False
+        self._finished = False
+        self._in_string = False
+        self._escape = False
+        self._capture: list[str] | None = None
+        self._expect_key = True
+        self._key: str | None = None
+
+    @property
+    def text(self) -> str:
+        return "".join(self.text_parts)
+
+    def feed(self, fragment: str) -> list[tuple[str, str]]:
+        """Consume a fragment; return the (key, value) string fields it completed."""
+        self.text_parts.append(fragment)
+        completed: list[tuple[str, str]] = []
+        if self._finished:
+            return completed
+
+        for ch in fragment:
+            if not self._started:
+                if ch == "{":
+                    self._started = True
+                    self._depth = 1
+                continue
+
+            if self._in_string:
+                if self._capture is not None:
+                    self._capture.append(ch)
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._capture is not None:
+                        value = json.loads('"' + "".join(self._capture))
+                        self._capture = None
+                        if self._expect_key:
+                            self._key = value
+                        elif self._key is not None:
+                            completed.append((self._key, value))
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._capture = [] if self._depth == 1 else None
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._finished = True
+                    break
+            elif self._depth == 1 and ch == ":":
+                self._expect_key = False
+            elif self._depth == 1 and ch == ",":
+                self._expect_key = True
+
+        return completed
+
+
+def text_delta(event: dict) -> str:
+    """Text (or tool input JSON) carried by one Anthropic streaming event; else empty."""
+    if event.get("type") == "content_block_delta":
+        delta = event.get("delta") or {}
+        if delta.get("type") == "text_delta":
+            return delta.get("text") or ""
+        if delta.get("type") == "input_json_delta":
+            return delta.get("partial_json") or ""
+    return ""
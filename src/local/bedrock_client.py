@@ -1,16 +1,117 @@
+import asyncio
 import json
-from typing import Any
+import random
+import time
+from typing import Any, AsyncIterator, Iterator
+
+from botocore.exceptions import ClientError
+
+from .recorder import load_recordings, request_fingerprint
 
 
 class BedrockClient:
     """
     DEV mock Bedrock client that mimics Anthropic Bedrock JSON responses.
     It returns: {"content": [{"type": "text", "text": "<json>"}]}
+
+    Timing is configurable so the service can be load-tested offline: time to first
+    token is lognormal around latency_ms (sigma 0 = constant) with an optional long
+    tail, and output is generated at tokens_per_second (0 = instant). Throttling and
+    5xx errors can be injected at a rate, and recorded real responses (replay_path,
+    see local/recorder.py) are served in place of the synthetic answer. Requests that
+    force a tool get the answer as tool_use input; otherwise malformed_rate is the share
+    of text answers that come back broken (wrapped in prose, truncated, misnamed keys).
+
+    model_profiles overrides latency_ms, latency_sigma and tokens_per_second per model
+    id, and can set an echo_rate: the share of answers that just restate the objective,
+    like a weak model would. Together they let a model cascade be exercised offline.
+
+    outage_seconds makes every call fail with a 503 for that long, starting
+    outage_after_seconds after the client is created: an incident to watch the circuit
+    breaker open, probe and close again.
     """
 
-    def __init__(self, region_name: str, endpoint_url: str | None = None):
+    def __init__(
+        self,
+        region_name: str,
+        endpoint_url: str | None = None,
+        max_concurrency: int = 32,
+        stream_chunk_chars: int = 16,
+        latency_ms: float = 0.0,
+        throttle_rate: float = 0.0,
+        error_rate: float = 0.0,
+        malformed_rate: float = 0.0,
+        outage_after_seconds: float = 0.0,
+        outage_seconds: float = 0.0,
+        latency_sigma: float = 0.0,
+        tail_rate: float = 0.0,
+        tail_multiplier: float = 10.0,
+        tokens_per_second: float = 0.0,
+        replay_path: str | None = None,
+        model_profiles: dict[str, dict] | None = None,
+    ):
         self.region_name = region_name
         self.endpoint_url = endpoint_url
+        self.max_concurrency = max_concurrency
+        self.stream_chunk_chars = stream_chunk_chars
+        # Fault/latency injection so routing and resilience can be exercised offline
+        self.latency_ms = latency_ms
+        self.throttle_rate = throttle_rate
+        self.error_rate = error_rate
+        self.malformed_rate = malformed_rate
+        self.outage_after_seconds = outage_after_seconds
+        self.outage_seconds = outage_seconds
+        self._created = time.monotonic()
+        self.latency_sigma = latency_sigma
+        self.tail_rate = tail_rate
+        self.tail_multiplier = tail_multiplier
+        self.tokens_per_second = tokens_per_second
+        self.model_profiles = model_profiles or {}
+        self._recordings = load_recordings(replay_path) if replay_path else {}
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    def _in_outage(self) -> bool:
+        elapsed = time.monotonic() - self._created - self.outage_after_seconds
+        return 0 <= elapsed < self.outage_seconds
+
+    def _injected_fault(self) -> ClientError | None:
+        roll = random.random()
+        if self.outage_seconds and self._in_outage():
+            code, status, message = "ServiceUnavailableException", 503, "DEV MOCK: injected outage"
+        elif roll < self.throttle_rate:
+            code, status, message = "ThrottlingException", 429, "Too many requests, please wait before trying again."
+        elif roll < self.throttle_rate + self.error_rate:
+            code, status, message = "ServiceUnavailableException", 503, "DEV MOCK: injected failure"
+        else:
+            return None
+        return ClientError(
+            {
+                "Error": {"Code": code, "Message": message},
+                "ResponseMetadata": {"HTTPStatusCode": status},
+            },
+            "InvokeModel",
+        )
+
+    def _setting(self, model_id: str, name: str) -> float:
+        return self.model_profiles.get(model_id, {}).get(name, getattr(self, name, 0.0))
+
+    def _first_token_seconds(self, model_id: str) -> float:
+        latency_ms = self._setting(model_id, "latency_ms")
+        if not latency_ms:
+            return 0.0
+        seconds = latency_ms / 1000
+        sigma = self._setting(model_id, "latency_sigma")
+        if sigma:
+            seconds *= random.lognormvariate(0.0, sigma)
+        if self.tail_rate and random.random() < self.tail_rate:
+            seconds *= self.tail_multiplier
+        return seconds
+
+    def _generation_seconds(self, model_id: str, response: dict) -> float:
+        tokens_per_second = self._setting(model_id, "tokens_per_second")
+        if not tokens_per_second:
+            return 0.0
+        return response["usage"]["output_tokens"] / tokens_per_second
 
     def invoke_model(
         self,
@@ -19,51 +120,69 @@ class BedrockClient:
         content_type: str = "application/json",
         accept: str = "application/json",
     ) -> dict:
+        time.sleep(self._first_token_seconds(model_id))
+        fault = self._injected_fault()
+        if fault is not None:
+            raise fault
+        response = self._respond(model_id, body)
+        time.sleep(self._generation_seconds(model_id, response))
+        return response
+
+    def _respond(self, model_id: str, body: dict | bytes) -> dict:
         if isinstance(body, (bytes, bytearray)):
             body = json.loads(body.decode("utf-8"))
 
+        recorded = self._recordings.get(request_fingerprint(model_id, body)) if self._recordings else None
+        if recorded is not None:
+            return recorded["response"]
+
+        response = self._synthesize(model_id, body)
+        text = "".join(c.get("text") or json.dumps(c.get("input")) for c in response["content"])
+        response["usage"] = {
+            "input_tokens": (len(json.dumps(body, ensure_ascii=False)) + 3) // 4,
+            "output_tokens": (len(text) + 3) // 4,
+        }
+        return response
+
+    def _synthesize(self, model_id: str, body: dict) -> dict:
         # Detect the Anthropic-style request payload your recommend_objective() sends
         is_anthropic = isinstance(body, dict) and "anthropic_version" in body and "messages" in body
 
         if is_anthropic:
             # Try to extract objective/context from the user message JSON
-            objective = ""
-            context = {}
+            user_payload = {}
             try:
                 msg0 = (body.get("messages") or [])[0]
                 content0 = (msg0.get("content") or [])[0]
-                user_text = content0.get("text") or ""
-                user_payload = json.loads(user_text)
-                objective = str(user_payload.get("objective", "")).strip()
-                context = user_payload.get("context") or {}
+                user_payload = json.loads(content0.get("text") or "")
             except Exception:
-                objective = objective or ""
-
-            # Deterministic “good enough” recommendation for dev
-            persona = context.get("persona") if isinstance(context, dict) else None
-            domain = context.get("domain") if isinstance(context, dict) else None
-
-            reason = "DEV MOCK: Objective is ambiguous; it lacks concrete scope, constraints, and measurable success criteria."
-            if persona or domain:
-                reason += f" (persona={persona or 'n/a'}, domain={domain or 'n/a'})"
-
-            result = {
-                "reason": reason,
-                "suggestedDefiningObjective": (
-                    f"Rewrite the objective into a testable statement with clear inputs/outputs, constraints, "
-                    f"and acceptance criteria. Objective: '{objective or 'n/a'}'."
-                ),
-                "alternativeDefiningObjective": (
-                    f"Alternative: Define success metrics and edge cases explicitly for: '{objective or 'n/a'}'. "
-                    f"Include what data is needed and what a correct response must contain."
-                ),
-            }
+                pass
+
+            if isinstance(user_payload, list):
+                # micro-batch: one result per item, keyed by id; malformed => an item goes missing
+                results = [{"id": item.get("id"), **self._recommendation(model_id, item)} for item in user_payload]
+                if len(results) > 1 and random.random() < self._setting(model_id, "malformed_rate"):
+                    results.pop(random.randrange(len(results)))
+                result = {"results": results}
+            else:
+                result = self._recommendation(model_id, user_payload if isinstance(user_payload, dict) else {})
+
+            tools = body.get("tools") or []
+            if tools:
+                return {
+                    "content": [{"type": "tool_use", "id": "toolu_devmock", "name": tools[0]["name"], "input": result}],
+                    "model": model_id,
+                    "stop_reason": "tool_use",
+                }
 
             # IMPORTANT: This is the exact response shape recommend_objective() expects
+            text, stop_reason = json.dumps(result, ensure_ascii=False), "end_turn"
+            if "results" not in result and random.random() < self._setting(model_id, "malformed_rate"):
+                text, stop_reason = self._malformed(result, text)
             return {
-                "content": [{"type": "text", "text": json.dumps(result, ensure_ascii=False)}],
+                "content": [{"type": "text", "text": text}],
                 "model": model_id,
-                "stop_reason": "end_turn",
+                "stop_reason": stop_reason,
             }
 
         # If other endpoints call invoke_model in dev, provide a generic response
@@ -71,4 +190,128 @@ class BedrockClient:
             "content": [{"type": "text", "text": json.dumps({"message": "DEV MOCK: unsupported request"})}],
             "model": model_id,
             "stop_reason": "end_turn",
-        }
\ No newline at end of file
+        }
+
+    def _recommendation(self, model_id: str, user_payload: dict) -> dict:
+        """Deterministic “good enough” recommendation for dev."""
+        objective = str(user_payload.get("objective", "")).strip()
+        context = user_payload.get("context") or {}
+        persona = context.get("persona") if isinstance(context, dict) else None
+        domain = context.get("domain") if isinstance(context, dict) else None
+
+        reason = "DEV MOCK: Objective is ambiguous; it lacks concrete scope, constraints, and measurable success criteria."
+        if persona or domain:
+            reason += f" (persona={persona or 'n/a'}, domain={domain or 'n/a'})"
+
+        result = {
+            "reason": reason,
+            "suggestedDefiningObjective": (
+                f"Rewrite the objective into a testable statement with clear inputs/outputs, constraints, "
+                f"and acceptance criteria. Objective: '{objective or 'n/a'}'."
+            ),
+            "alternativeDefiningObjective": (
+                f"Alternative: Define success metrics and edge cases explicitly for: '{objective or 'n/a'}'. "
+                f"Include what data is needed and what a correct response must contain."
+            ),
+        }
+
+        if random.random() < self._setting(model_id, "echo_rate"):
+            result["suggestedDefiningObjective"] = result["alternativeDefiningObjective"] = objective
+        return result
+
+    @staticmethod
+    def _malformed(result: dict, text: str) -> tuple[str, str]:
+        """(text, stop_reason) of a broken answer, like real models occasionally return."""
+        kind = random.choice(("prose", "unclosed", "keys", "cut", "no_json"))
+        if kind == "prose":
+            return f"Here is the improved objective:\n{text}\nLet me know if you need more.", "end_turn"
+        if kind == "unclosed":
+            return text[:-1], "max_tokens"
+        if kind == "keys":
+            renamed = {"".join("_" + c.lower() if c.isupper() else c for c in k): v for k, v in result.items()}
+            return json.dumps(renamed, ensure_ascii=False), "end_turn"
+        if kind == "cut":
+            return text[: len(text) * 2 // 3], "max_tokens"
+        return "The objective should state what a correct answer must contain.", "end_turn"
+
+    async def ainvoke_model(
+        self,
+        model_id: str,
+        body: dict | bytes,
+        content_type: str = "application/json",
+        accept: str = "application/json",
+    ) -> dict:
+        """Async twin of invoke_model, bounded like the real client's worker pool."""
+        async with self._semaphore:
+            await asyncio.sleep(self._first_token_seconds(model_id))
+            fault = self._injected_fault()
+            if fault is not None:
+                raise fault
+            response = self._respond(model_id, body)
+            await asyncio.sleep(self._generation_seconds(model_id, response))
+            return response
+
+    def _chunk_seconds(self, model_id: str) -> float:
+        """Pause between stream deltas so output arrives at tokens_per_second."""
+        tokens_per_second = self._setting(model_id, "tokens_per_second")
+        if not tokens_per_second:
+            return 0.0
+        return (self.stream_chunk_chars / 4) / tokens_per_second
+
+    def _stream_events(self, response: dict) -> Iterator[dict]:
+        """Replay a complete response as Anthropic streaming events, a few chars per delta."""
+        tool = next((c for c in response["content"] if c.get("type") == "tool_use"), None)
+        if tool is not None:
+            text = json.dumps(tool["input"], ensure_ascii=False)
+            block = {"type": "tool_use", "id": tool["id"], "name": tool["name"], "input": {}}
+            delta_type, delta_key = "input_json_delta", "partial_json"
+        else:
+            text = "".join(c.get("text", "") for c in response["content"] if c.get("type") == "text")
+            block = {"type": "text", "text": ""}
+            delta_type, delta_key = "text_delta", "text"
+        yield {"type": "message_start", "message": {"model": response["model"], "content": []}}
+        yield {"type": "content_block_start", "index": 0, "content_block": block}
+        step = max(1, self.stream_chunk_chars)
+        for i in range(0, len(text), step):
+            yield {
+                "type": "content_block_delta",
+                "index": 0,
+                "delta": {"type": delta_type, delta_key: text[i : i + step]},
+            }
+        yield {"type": "content_block_stop", "index": 0}
+        yield {"type": "message_delta", "delta": {"stop_reason": response["stop_reason"]}}
+        yield {"type": "message_stop"}
+
+    def invoke_model_stream(
+        self,
+        model_id: str,
+        body: dict | bytes,
+        content_type: str = "application/json",
+        accept: str = "application/json",
+    ) -> Iterator[dict]:
+        time.sleep(self._first_token_seconds(model_id))
+        fault = self._injected_fault()
+        if fault is not None:
+            raise fault
+        delay = self._chunk_seconds(model_id)
+        for event in self._stream_events(self._respond(model_id, body)):
+            yield event
+            if delay and event["type"] == "content_block_delta":
+                time.sleep(delay)
+
+    async def ainvoke_model_stream(
+        self,
+        model_id: str,
+        body: dict | bytes,
+        content_type: str = "application/json",
+        accept: str = "application/json",
+    ) -> AsyncIterator[dict]:
+        async with self._semaphore:
+            await asyncio.sleep(self._first_token_seconds(model_id))
+            fault = self._injected_fault()
+            if fault is not None:
+                raise fault
+            delay = self._chunk_seconds(model_id)
+            for event in self._stream_events(self._respond(model_id, body)):
+                yield event
+                await asyncio.sleep(delay if event["type"] == "content_block_delta" else 0)
\ No newline at end of file
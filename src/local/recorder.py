@@ -0,0 +1,80 @@
+"""Record real Bedrock responses so the local mock can replay them offline.
+
+Recordings are JSONL: one {"key", "model_id", "response", "latency_ms"} object per call,
+keyed by request_fingerprint so a replaying mock finds the answer for the same request.
+"""
+
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from typing import Any
+
+
+def request_fingerprint(model_id: str, body: dict | bytes) -> str:
+    """Stable key for a (model id, request body) pair."""
+    if isinstance(body, (bytes, bytearray)):
+        body = json.loads(body.decode("utf-8"))
+    canonical = json.dumps(body, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(f"{model_id}\0{canonical}".encode("utf-8")).hexdigest()
+
+
+def load_recordings(path: str) -> dict[str, dict]:
+    recordings = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                recordings[entry["key"]] = entry
+    return recordings
+
+
+class RecordingBedrockClient:
+    """Wraps a real Bedrock client and appends every successful invoke_model to a JSONL file."""
+
+    def __init__(self, inner: Any, path: str):
+        self.inner = inner
+        self.path = path
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.inner, name)
+
+    def _record(self, model_id: str, body: dict | bytes, response: dict, seconds: float) -> None:
+        line = json.dumps(
+            {
+                "key": request_fingerprint(model_id, body),
+                "model_id": model_id,
+                "response": response,
+                "latency_ms": round(seconds * 1000, 1),
+            },
+            ensure_ascii=False,
+        )
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+    def invoke_model(
+        self,
+        model_id: str,
+        body: dict | bytes,
+        content_type: str = "application/json",
+        accept: str = "application/json",
+    ) -> dict:
+        started = time.monotonic()
+        response = self.inner.invoke_model(model_id, body, content_type, accept)
+        self._record(model_id, body, response, time.monotonic() - started)
+        return response
+
+    async def ainvoke_model(
+        self,
+        model_id: str,
+        body: dict | bytes,
+        content_type: str = "application/json",
+        accept: str = "application/json",
+    ) -> dict:
+        started = time.monotonic()
+        response = await self.inner.ainvoke_model(model_id, body, content_type, accept)
+        # file append under a thread lock: keep it off the event loop
+        await asyncio.to_thread(self._record, model_id, body, response, time.monotonic() - started)
+        return response
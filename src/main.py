@@ -1,34 +1,80 @@
-from fastapi import FastAPI, HTTPException, Security
+import asyncio
+import json
+import math
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from fastapi import Depends, FastAPI, Header, HTTPException, Request, Security
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
 from fastapi.security.api_key import APIKeyHeader
 
 from core.config import Config
-from core.bedrock_client_cognito import BedrockClient as CognitoBedrockClient
-from local.bedrock_client import BedrockClient as LocalBedrockClient
+from core.config_watcher import ConfigWatcher
+from core.bedrock_router import is_throttle
+from core.breaker import CircuitOpen
+from core.concurrency import Overloaded
+from core.tenants import QuotaExceeded, Tenant, release_with
+from core.metrics import REGISTRY, MetricsMiddleware, configure_profiling
 from inference.recommendation import (
-    recommend_objective,
+    arecommend_many,
+    arecommend_objective,
+    astream_recommend_objective,
+    SimpleBatchRequest,
     SimpleObjectiveRequest,
     SimpleRecommendResponse,
 )
+from runtime import Runtime, build_runtime, prewarm
 
-config = Config.load_config()
-env = (config.get("env") or "dev").strip().lower()
 
-#  Always use Cognito unless local
-if env == "local":
-    print("Using LOCAL mock Bedrock client (ENV=local)")
-    bedrock_client = LocalBedrockClient(
-        region_name=config["region"],
-        endpoint_url=config.get("aws_endpoint"),
-    )
-else:
-    print(f"Using COGNITO Bedrock client (ENV={env})")
-    bedrock_client = CognitoBedrockClient(
-        region_name=config["region"],
-        config=config,
-        endpoint_url=config.get("aws_endpoint"),
-    )
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Secrets Manager is a blocking round trip; keep it off the event loop
+    config = await asyncio.to_thread(Config.load_config)
+    runtime = build_runtime(config)
+    configure_profiling(config["profile_sample_rate"], config["profile_dir"])
+    if config["startup_prewarm"]:
+        await prewarm(runtime)
+    app.state.runtime = runtime
+    retiring: list[Runtime] = []
+
+    async def swap_runtime(new_config: dict) -> None:
+        old = app.state.runtime
+        new = build_runtime(new_config, previous=old)
+        configure_profiling(new_config["profile_sample_rate"], new_config["profile_dir"])
+        if new_config["startup_prewarm"]:
+            await prewarm(new)
+        # Requests already running keep the runtime they were handed; new ones get this one
+        app.state.runtime = new
+        retiring.append(old)
+        old.retire()
 
-app = FastAPI(title="Cyara Recommendation Engine", version="1.0.0")
+        def give_up() -> None:
+            # upper bound: a request still holding the old runtime after the grace period loses it
+            retiring.remove(old)
+            old.close()
+
+        asyncio.get_running_loop().call_later(new_config["config_reload_grace_seconds"], give_up)
+
+    watcher = ConfigWatcher.from_environment(config, swap_runtime)
+    if watcher is not None:
+        REGISTRY.callback("config_polls_total", "counter", "Secret version checks.", lambda: watcher.polls)
+        REGISTRY.callback("config_reloads_total", "counter", "Changed configs swapped in.", lambda: watcher.reloads)
+        REGISTRY.callback(
+            "config_reload_failures_total", "counter", "Secret checks or reloads that failed.", lambda: watcher.failures
+        )
+        watcher.start()
+    try:
+        yield
+    finally:
+        if watcher is not None:
+            await watcher.stop()
+        for old in retiring:
+            old.close()
+        app.state.runtime.close()
+
+
+app = FastAPI(title="Cyara Recommendation Engine", version="1.0.0", lifespan=lifespan)
+app.add_middleware(MetricsMiddleware)
 
 # Swagger-visible API key input
 api_key_scheme = APIKeyHeader(
@@ -37,30 +83,210 @@ api_key_scheme = APIKeyHeader(
     scheme_name="ApiKeyAuth",
 )
 
-def verify_api_key(api_key: str | None):
-    expected = config.get("api_key")
-    if not expected:
+
+async def get_runtime(request: Request, env: str) -> AsyncIterator[Runtime]:
+    """Current runtime; the {env} path segment must match the configured ENV.
+
+    Held until the response, streamed body included, has finished, so a runtime replaced
+    by a config reload is only closed once the requests using it are done.
+    """
+    runtime: Runtime = request.app.state.runtime
+    if env != runtime.env:
+        raise HTTPException(status_code=404, detail="Not Found")
+    runtime.acquire()
+    try:
+        yield runtime
+    finally:
+        runtime.release()
+
+
+def verify_api_key(runtime: Runtime, api_key: str | None) -> Tenant:
+    if not runtime.tenants:
         raise HTTPException(status_code=500, detail="API_KEY is not configured")
-    if not api_key or api_key != expected:
+    tenant = runtime.tenants.authenticate(api_key)
+    if tenant is None:
         raise HTTPException(status_code=401, detail="Invalid or missing API key")
+    return tenant
+
+
+def _admit(tenant: Tenant, cost: int = 1):
+    """Apply the key's rate and concurrency limits; returns the slot's release callback."""
+    try:
+        return tenant.admit(cost)
+    except QuotaExceeded as e:
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))},
+        )
+
+
+def _pipeline_options(runtime: Runtime, cache_control: str | None) -> dict:
+    """Cache-Control: no-cache => skip the cache read; no-store => bypass it entirely."""
+    directives = (cache_control or "").lower()
+    return {
+        "cache": None if "no-store" in directives else runtime.cache,
+        "near_duplicates": None if "no-store" in directives else runtime.near_duplicates,
+        "cascade": runtime.cascade,
+        "stale": None if "no-store" in directives else runtime.stale,
+        "use_cache": "no-cache" not in directives,
+        "prompt": runtime.prompt_options,
+    }
+
+
+def _upstream_error(e: Exception) -> HTTPException:
+    """Shed load or open breaker => 503, upstream throttling => 429 (both with Retry-After), else 502."""
+    if isinstance(e, (Overloaded, CircuitOpen)):
+        return HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))},
+        )
+    if is_throttle(e):
+        return HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+    return HTTPException(status_code=502, detail=str(e))
+
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics():
+    """Prometheus text exposition."""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+def _require_model_id(runtime: Runtime) -> str:
+    model_id = runtime.primary_model_id
+    if not model_id:
+        raise HTTPException(status_code=500, detail="BEDROCK_MODEL_ID is not configured")
+    return model_id
 
 
 @app.post(
-    f"/{env}/recommendation",
+    "/{env}/recommendation",
     response_model=SimpleRecommendResponse,
     summary="Recommend clearer defining objective",
 )
 async def handle_recommendation(
     req: SimpleObjectiveRequest,
+    runtime: Runtime = Depends(get_runtime),
     api_key: str | None = Security(api_key_scheme),
+    cache_control: str | None = Header(default=None),
 ):
-    verify_api_key(api_key)
-
-    model_id = config.get("bedrock_model_id")
-    if not model_id:
-        raise HTTPException(status_code=500, detail="BEDROCK_MODEL_ID is not configured")
+    tenant = verify_api_key(runtime, api_key)
+    model_id = _require_model_id(runtime)
+    release = _admit(tenant)
 
     try:
-        return recommend_objective(req, bedrock_client=bedrock_client, model_id=model_id)
+        result = await arecommend_objective(
+            req,
+            bedrock_client=runtime.bedrock_client,
+            model_id=model_id,
+            batcher=runtime.batcher,
+            **_pipeline_options(runtime, cache_control),
+        )
     except Exception as e:
-        raise HTTPException(status_code=502, detail=str(e))
\ No newline at end of file
+        raise _upstream_error(e)
+    finally:
+        release()
+    # Serialized by pydantic directly; skips FastAPI's re-validation and jsonable_encoder pass
+    return Response(content=result.model_dump_json(), media_type="application/json")
+
+
+@app.post(
+    "/{env}/recommendation/batch",
+    summary="Recommend for many objectives; streams NDJSON as items finish",
+    response_class=StreamingResponse,
+)
+async def handle_recommendation_batch(
+    req: SimpleBatchRequest,
+    runtime: Runtime = Depends(get_runtime),
+    api_key: str | None = Security(api_key_scheme),
+    cache_control: str | None = Header(default=None),
+):
+    tenant = verify_api_key(runtime, api_key)
+    model_id = _require_model_id(runtime)
+    max_items = runtime.config["batch_max_items"]
+    if len(req.items) > max_items:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large: {len(req.items)} items (max {max_items})",
+        )
+    # every item counts against the key's rate
+    release = _admit(tenant, cost=len(req.items))
+
+    async def lines():
+        try:
+            async for index, result in arecommend_many(
+                req.items,
+                bedrock_client=runtime.bedrock_client,
+                model_id=model_id,
+                concurrency=runtime.config["batch_max_concurrency"],
+                batcher=runtime.batcher,
+                **_pipeline_options(runtime, cache_control),
+            ):
+                if isinstance(result, Exception):
+                    error = _upstream_error(result)
+                    line = {
+                        "index": index,
+                        "status": "error",
+                        "code": error.status_code,
+                        "error": error.detail,
+                    }
+                    yield json.dumps(line, ensure_ascii=False) + "\n"
+                else:
+                    yield f'{{"index": {index}, "status": "ok", "result": {result.model_dump_json()}}}\n'
+        finally:
+            release()
+
+    body = lines()
+    release_with(body, release)
+    return StreamingResponse(body, media_type="application/x-ndjson")
+
+
+def _sse(event: str, data: dict | str) -> str:
+    """data is a dict, or an already serialized JSON string."""
+    if not isinstance(data, str):
+        data = json.dumps(data, ensure_ascii=False)
+    return f"event: {event}\ndata: {data}\n\n"
+
+
+@app.post(
+    "/{env}/recommendation/stream",
+    summary="Recommend clearer defining objective; streams fields as Server-Sent Events",
+    response_class=StreamingResponse,
+)
+async def handle_recommendation_stream(
+    req: SimpleObjectiveRequest,
+    runtime: Runtime = Depends(get_runtime),
+    api_key: str | None = Security(api_key_scheme),
+    cache_control: str | None = Header(default=None),
+):
+    tenant = verify_api_key(runtime, api_key)
+    model_id = _require_model_id(runtime)
+    release = _admit(tenant)
+
+    async def events():
+        try:
+            async for kind, data in astream_recommend_objective(
+                req,
+                bedrock_client=runtime.bedrock_client,
+                model_id=model_id,
+                **_pipeline_options(runtime, cache_control),
+            ):
+                if kind == "field":
+                    name, value = data
+                    yield _sse("field", {"name": name, "value": value})
+                else:
+                    yield _sse("done", data.model_dump_json())
+        except Exception as e:
+            error = _upstream_error(e)
+            yield _sse("error", {"status": error.status_code, "detail": error.detail})
+        finally:
+            release()
+
+    body = events()
+    release_with(body, release)
+    return StreamingResponse(
+        body,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,397 @@
+"""Everything the service builds from one config load: Bedrock client chain, caches, options.
+
+Shared by the API (built in the FastAPI lifespan) and the bulk CLI.
+"""
+
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Any
+
+from core.bedrock_router import BedrockRouter
+from core.breaker import STATES, CircuitBreaker, CircuitBreakerBedrockClient
+from core.concurrency import AdaptiveLimiter, LimitedBedrockClient
+from core.metrics import REGISTRY, InstrumentedBedrockClient
+from core.microbatch import MicroBatcher
+from core.shared_store import SharedStore
+from core.tenants import Tenants
+from core.singleflight import CoalescingBedrockClient
+from local.bedrock_client import BedrockClient as LocalBedrockClient
+from inference.cache import RecommendationCache
+from inference.cascade import Cascade
+from inference.near_duplicates import NearDuplicateIndex
+from inference.recommendation import PromptOptions
+from inference.stale import StaleWhileRevalidate
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Runtime:
+    """Everything built from one config load. Routes take it per request."""
+
+    config: dict
+    env: str
+    primary_model_id: str | None
+    bedrock_client: Any
+    cache: RecommendationCache | None
+    near_duplicates: NearDuplicateIndex | None
+    cascade: Cascade | None
+    batcher: MicroBatcher | None
+    stale: StaleWhileRevalidate | None
+    tenants: Tenants
+    prompt_options: PromptOptions
+    limiter: AdaptiveLimiter | None = None
+    breaker: CircuitBreaker | None = None
+    # raw per-region clients, for prewarm; closers run on shutdown
+    base_clients: list = field(default_factory=list)
+    closers: list = field(default_factory=list)
+    # names of the /metrics callbacks registered for this runtime's objects
+    callbacks: list = field(default_factory=list)
+    # requests using this runtime; a retired runtime closes when the last one finishes
+    in_flight: int = 0
+    retired: bool = False
+
+    def acquire(self) -> None:
+        self.in_flight += 1
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        if self.retired and self.in_flight == 0:
+            self.close()
+
+    def retire(self) -> None:
+        """Replaced by a reloaded runtime: close once no request is using it any more."""
+        self.retired = True
+        if self.in_flight == 0:
+            self.close()
+
+    def close(self) -> None:
+        closers, self.closers = self.closers, []
+        for close in closers:
+            close()
+
+
+# Settings the cache and near-duplicate index are built from; unchanged on reload => kept
+_CACHE_KEYS = (
+    "cache_enabled", "cache_max_entries", "cache_ttl_seconds", "cache_db_path", "shared_store_path",
+    "breaker_enabled", "breaker_serve_stale", "cache_stale_seconds",
+)
+_NEAR_DUPLICATE_KEYS = ("near_duplicate_enabled", "near_duplicate_threshold", "near_duplicate_max_entries", "cache_ttl_seconds")
+# ... and the limiter and breaker: keeping them keeps the learned limit and an open circuit
+_LIMITER_KEYS = (
+    "limiter_enabled", "limiter_initial_limit", "bedrock_max_concurrency", "limiter_max_queue",
+    "limiter_queue_timeout_seconds", "limiter_latency_target_seconds",
+)
+_BREAKER_KEYS = (
+    "breaker_enabled", "breaker_failure_rate", "breaker_slow_call_seconds", "breaker_slow_call_rate",
+    "breaker_window", "breaker_min_calls", "breaker_open_seconds", "breaker_probes",
+)
+
+
+def _unchanged(config: dict, previous: Runtime | None, keys: tuple[str, ...]) -> bool:
+    return previous is not None and all(config[k] == previous.config[k] for k in keys)
+
+
+def build_runtime(config: dict, previous: Runtime | None = None) -> Runtime:
+    """Build the Bedrock client chain, cache and prompt options. No network calls.
+
+    previous: the runtime this one replaces on a config reload. Its cache, near-duplicate
+    index, concurrency limiter and circuit breaker are carried over when their settings
+    did not change; cache keys include the model id and prompt version, so answers never
+    leak across those.
+    """
+    env = (config.get("env") or "dev").strip().lower()
+
+    # With BEDROCK_ENDPOINTS, each endpoint may name its own model; the first one stands in
+    # for BEDROCK_MODEL_ID when that is unset.
+    primary_model_id = config.get("bedrock_model_id") or next(
+        (m for _, m in config["bedrock_endpoints"] if m), None
+    )
+    base_clients: list = []
+    closers: list = []
+    callbacks: list[str] = []
+
+    def callback(name: str, kind: str, help: str, fn) -> None:
+        REGISTRY.callback(name, kind, help, fn)
+        callbacks.append(name)
+
+    #  Always use Cognito unless local
+    if env == "local":
+        print("Using LOCAL mock Bedrock client (ENV=local)")
+
+        def make_client(region: str):
+            client = LocalBedrockClient(
+                region_name=region,
+                endpoint_url=config.get("aws_endpoint"),
+                max_concurrency=config["bedrock_max_concurrency"],
+                model_profiles=config["mock_model_profiles"],
+                **{**config["mock_profile"], **config["mock_region_profiles"].get(region, {})},
+            )
+            base_clients.append(client)
+            return InstrumentedBedrockClient(client)
+
+        bedrock_client = make_client(config["region"])
+    else:
+        print(f"Using COGNITO Bedrock client (ENV={env})")
+        # deferred so that importing this module does not import boto3
+        from core.bedrock_client_cognito import BedrockClient as CognitoBedrockClient
+        from local.recorder import RecordingBedrockClient
+
+        cognito_client = CognitoBedrockClient(
+            region_name=config["region"],
+            config=config,
+            endpoint_url=config.get("aws_endpoint"),
+            max_concurrency=config["bedrock_max_concurrency"],
+            shared_store=SharedStore(config["shared_store_path"]) if config["shared_store_path"] else None,
+        )
+        closers.append(cognito_client.close)
+
+        def make_client(region: str):
+            client = cognito_client.for_region(region)
+            if client is not cognito_client:
+                # each regional client has its own worker pool
+                closers.append(client.close)
+            base_clients.append(client)
+            if config.get("bedrock_record_path"):
+                client = RecordingBedrockClient(client, config["bedrock_record_path"])
+            return InstrumentedBedrockClient(client)
+
+        bedrock_client = make_client(config["region"])
+
+        callback(
+            "cognito_credential_refreshes_total", "counter", "Cognito logins performed.",
+            lambda: cognito_client.credential_stats()["refresh_count"],
+        )
+        callback(
+            "cognito_credential_refresh_failures_total", "counter", "Failed Cognito logins.",
+            lambda: cognito_client.credential_stats()["refresh_failures"],
+        )
+        callback(
+            "cognito_credential_shared_adoptions_total", "counter",
+            "Credentials taken from another worker via the shared store instead of logging in.",
+            lambda: cognito_client.credential_stats()["shared_adoptions"],
+        )
+        callback(
+            "cognito_credential_expires_in_seconds", "gauge", "Seconds until the current credentials expire.",
+            lambda: cognito_client.credential_stats()["expires_in_seconds"],
+        )
+
+    if config["bedrock_endpoints"]:
+        base_clients.clear()
+        router = BedrockRouter(
+            endpoints=config["bedrock_endpoints"],
+            client_factory=make_client,
+            model_id=primary_model_id,
+            eject_after_failures=config["router_eject_after_failures"],
+            cooldown_seconds=config["router_cooldown_seconds"],
+        )
+        bedrock_client = router
+
+        def _per_endpoint(field: str):
+            return lambda: [({"endpoint": s["endpoint"]}, s[field]) for s in router.stats()]
+
+        callback("bedrock_router_requests_total", "counter", "Calls per endpoint.", _per_endpoint("requests"))
+        callback("bedrock_router_failures_total", "counter", "Failed calls per endpoint.", _per_endpoint("failures"))
+        callback("bedrock_router_throttles_total", "counter", "Throttled calls per endpoint.", _per_endpoint("throttles"))
+        callback(
+            "bedrock_router_latency_ewma_seconds", "gauge", "EWMA latency per endpoint.",
+            _per_endpoint("ewma_latency_seconds"),
+        )
+        callback("bedrock_router_failovers_total", "counter", "Calls retried on another endpoint.", lambda: router.failovers)
+
+    limiter = None
+    if _unchanged(config, previous, _LIMITER_KEYS):
+        limiter = previous.limiter
+    elif config["limiter_enabled"]:
+        limiter = AdaptiveLimiter(
+            initial_limit=min(config["limiter_initial_limit"], config["bedrock_max_concurrency"]),
+            max_limit=config["bedrock_max_concurrency"],
+            max_queue=config["limiter_max_queue"],
+            queue_timeout=config["limiter_queue_timeout_seconds"],
+            latency_target=config["limiter_latency_target_seconds"] or None,
+        )
+    if limiter is not None:
+        bedrock_client = LimitedBedrockClient(bedrock_client, limiter)
+
+        callback("limiter_limit", "gauge", "Current adaptive concurrency limit.", lambda: limiter.limit)
+        callback("limiter_in_flight", "gauge", "Bedrock calls in flight.", lambda: limiter.in_flight)
+        callback("limiter_queued", "gauge", "Calls waiting for a slot.", lambda: limiter.queued)
+        callback(
+            "limiter_shed_total", "counter", "Calls rejected or timed out in the queue.",
+            lambda: limiter.rejected + limiter.timed_out,
+        )
+
+    # Outside the limiter, so an open breaker refuses calls before they queue for a slot
+    breaker = None
+    if _unchanged(config, previous, _BREAKER_KEYS):
+        breaker = previous.breaker
+    elif config["breaker_enabled"]:
+        breaker = CircuitBreaker(
+            failure_rate=config["breaker_failure_rate"],
+            slow_call_seconds=config["breaker_slow_call_seconds"],
+            slow_call_rate=config["breaker_slow_call_rate"],
+            window=config["breaker_window"],
+            min_calls=config["breaker_min_calls"],
+            open_seconds=config["breaker_open_seconds"],
+            probes=config["breaker_probes"],
+        )
+    if breaker is not None:
+        bedrock_client = CircuitBreakerBedrockClient(bedrock_client, breaker)
+
+        callback(
+            "bedrock_breaker_state", "gauge", "1 for the circuit breaker's current state (closed, open, half_open).",
+            lambda: [({"state": state}, float(state == breaker.state)) for state in STATES],
+        )
+        callback("bedrock_breaker_opens_total", "counter", "Times the circuit breaker opened.", lambda: breaker.opens)
+        callback(
+            "bedrock_breaker_rejected_total", "counter", "Calls failed fast by the open (or half-open) breaker.",
+            lambda: breaker.rejected,
+        )
+        callback(
+            "bedrock_breaker_failure_rate", "gauge", "Share of failed calls in the breaker's window.",
+            lambda: breaker.stats()["failure_rate"],
+        )
+        callback(
+            "bedrock_breaker_slow_call_rate", "gauge", "Share of slow calls in the breaker's window.",
+            lambda: breaker.stats()["slow_call_rate"],
+        )
+
+    if config["coalesce_enabled"]:
+        bedrock_client = CoalescingBedrockClient(bedrock_client)
+        flight = bedrock_client.flight
+
+        callback("singleflight_leaders_total", "counter", "Upstream calls made by single-flight leaders.", lambda: flight.leaders)
+        callback(
+            "singleflight_coalesced_total", "counter", "Calls that shared another caller's upstream call.",
+            lambda: flight.coalesced,
+        )
+
+    serve_stale = breaker is not None and config["breaker_serve_stale"]
+    cache = None
+    if _unchanged(config, previous, _CACHE_KEYS):
+        cache = previous.cache
+    elif config["cache_enabled"]:
+        cache = RecommendationCache(
+            max_entries=config["cache_max_entries"],
+            ttl_seconds=config["cache_ttl_seconds"],
+            db_path=config.get("cache_db_path") or config["shared_store_path"],
+            stale_seconds=config["cache_stale_seconds"] if serve_stale else 0.0,
+        )
+    if cache is not None:
+        def _cache_stat(field: str):
+            return lambda: cache.stats()[field]
+
+        callback("recommendation_cache_hits_total", "counter", "Cache hits (memory or disk).", _cache_stat("hits"))
+        callback("recommendation_cache_misses_total", "counter", "Cache misses.", _cache_stat("misses"))
+        callback("recommendation_cache_disk_hits_total", "counter", "Hits served from SQLite.", _cache_stat("disk_hits"))
+        callback("recommendation_cache_entries", "gauge", "Entries in the in-memory cache.", _cache_stat("entries"))
+        callback(
+            "recommendation_cache_pending_writes", "gauge", "Cache rows queued for the SQLite writer.", _cache_stat("pending_writes")
+        )
+
+    near_duplicates = None
+    if _unchanged(config, previous, _NEAR_DUPLICATE_KEYS):
+        near_duplicates = previous.near_duplicates
+    elif config["near_duplicate_enabled"]:
+        near_duplicates = NearDuplicateIndex(
+            threshold=config["near_duplicate_threshold"],
+            max_entries=config["near_duplicate_max_entries"],
+            ttl_seconds=config["cache_ttl_seconds"],
+        )
+    if near_duplicates is not None:
+        callback(
+            "recommendation_near_duplicate_hits_total", "counter", "Answers reused from a near-duplicate objective.",
+            lambda: near_duplicates.stats()["hits"],
+        )
+        callback(
+            "recommendation_near_duplicate_entries", "gauge", "Objectives in the near-duplicate index.",
+            lambda: near_duplicates.stats()["entries"],
+        )
+
+    cascade = None
+    if config["cascade_model_ids"]:
+        cascade = Cascade(
+            model_ids=tuple(config["cascade_model_ids"]),
+            max_field_chars=config["cascade_max_field_chars"],
+        )
+
+    batcher = None
+    if config["micro_batch_enabled"]:
+        batcher = MicroBatcher(
+            window_ms=config["micro_batch_window_ms"],
+            max_items=config["micro_batch_max_items"],
+        )
+
+    stale = None
+    if serve_stale:
+        if cache is None:
+            logger.warning("BREAKER_SERVE_STALE needs CACHE_ENABLED; serving nothing stale")
+        else:
+            stale = StaleWhileRevalidate(cache, breaker)
+            closers.append(stale.close)
+
+            callback(
+                "recommendation_stale_refreshes_pending", "gauge", "Answers served stale and waiting for a refresh.",
+                lambda: stale.stats()["pending"],
+            )
+
+    tenants = Tenants.from_config(config["api_keys"], config.get("api_key"), previous.tenants if previous else None)
+
+    def _per_tenant(field: str):
+        return lambda: [({"tenant": s["tenant"]}, s[field]) for s in tenants.stats()]
+
+    callback("api_key_requests_total", "counter", "Requests admitted per API key tenant.", _per_tenant("admitted"))
+    callback("api_key_in_flight", "gauge", "Requests in flight per API key tenant.", _per_tenant("in_flight"))
+    callback(
+        "api_key_rate_limited_total", "counter", "Requests rejected by the tenant's token bucket.", _per_tenant("rate_limited")
+    )
+    callback(
+        "api_key_concurrency_limited_total", "counter", "Requests rejected by the tenant's concurrency cap.",
+        _per_tenant("concurrency_limited"),
+    )
+
+    if previous is not None:
+        # features this config no longer builds: stop exporting (and keeping alive) their objects
+        for name in set(previous.callbacks) - set(callbacks):
+            REGISTRY.unregister(name)
+
+    prompt_options = PromptOptions(
+        compact=config["prompt_compact"],
+        cache_system_prompt=config["prompt_cache_system"],
+        max_tokens_cap=config["max_tokens_cap"],
+        tool_output=config["prompt_tool_output"],
+        max_reinvokes=config["output_max_reinvokes"],
+    )
+
+    return Runtime(
+        config=config,
+        env=env,
+        primary_model_id=primary_model_id,
+        bedrock_client=bedrock_client,
+        cache=cache,
+        near_duplicates=near_duplicates,
+        cascade=cascade,
+        batcher=batcher,
+        stale=stale,
+        tenants=tenants,
+        prompt_options=prompt_options,
+        limiter=limiter,
+        breaker=breaker,
+        base_clients=base_clients,
+        closers=closers,
+        callbacks=callbacks,
+    )
+
+
+async def prewarm(runtime: Runtime) -> None:
+    """Log in and open Bedrock connections for every region at once; failures only log."""
+    clients = [c for c in runtime.base_clients if hasattr(c, "prewarm")]
+    connections = max(1, runtime.config["limiter_initial_limit"] // 4)
+    results = await asyncio.gather(
+        *(asyncio.to_thread(c.prewarm, connections) for c in clients),
+        return_exceptions=True,
+    )
+    for client, result in zip(clients, results):
+        if isinstance(result, Exception):
+            logger.warning("Prewarm failed for %s: %s", client.region_name, result)
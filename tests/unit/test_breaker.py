@@ -0,0 +1,130 @@
+import asyncio
+import time
+
+import pytest
+from botocore.exceptions import ClientError
+
+from core.breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitBreakerBedrockClient, CircuitOpen
+from inference.cache import RecommendationCache
+from inference.recommendation import arecommend_objective
+from inference.stale import StaleWhileRevalidate
+from local.bedrock_client import BedrockClient as MockBedrockClient
+
+
+def error(code, status):
+    return ClientError({"Error": {"Code": code, "Message": code}, "ResponseMetadata": {"HTTPStatusCode": status}}, "InvokeModel")
+
+
+UNAVAILABLE = error("ServiceUnavailableException", 503)
+
+
+def breaker(**kwargs):
+    return CircuitBreaker(**{"window": 4, "min_calls": 4, "open_seconds": 0.05, "probes": 2, **kwargs})
+
+
+def call(b, seconds=0.01, e=None):
+    b.record(b.allow(), seconds, e)
+
+
+def test_opens_at_the_failure_rate():
+    b = breaker()
+    for e in (None, UNAVAILABLE, None):
+        call(b, e=e)
+    assert b.state == CLOSED  # under min_calls
+
+    call(b, e=UNAVAILABLE)
+    assert b.state == OPEN
+    with pytest.raises(CircuitOpen) as refused:
+        b.allow()
+    assert 0 < refused.value.retry_after <= 0.05
+    assert b.stats()["rejected"] == 1
+
+
+def test_opens_on_slow_calls():
+    b = breaker(slow_call_seconds=1.0, slow_call_rate=0.75)
+    for seconds in (2.0, 2.0, 0.1, 2.0):
+        call(b, seconds)
+    assert b.state == OPEN
+
+
+def test_throttling_and_client_errors_do_not_count():
+    b = breaker()
+    for _ in range(8):
+        call(b, e=error("ThrottlingException", 429))
+        call(b, e=error("ValidationException", 400))
+    assert b.state == CLOSED
+    assert b.stats()["window_calls"] == 0
+
+
+def test_half_open_probes_close_the_circuit():
+    b = breaker()
+    for _ in range(4):
+        call(b, e=UNAVAILABLE)
+    time.sleep(0.06)
+
+    probes = [b.allow(), b.allow()]
+    assert probes == [True, True]
+    assert b.state == HALF_OPEN
+    with pytest.raises(CircuitOpen):
+        b.allow()  # both probe slots are taken
+
+    b.record(True, 0.01)
+    assert b.state == HALF_OPEN
+    b.record(True, 0.01)
+    assert b.state == CLOSED
+    assert b.allow() is False
+    assert b.stats()["window_calls"] == 0
+
+
+def test_failed_probe_reopens():
+    b = breaker()
+    for _ in range(4):
+        call(b, e=UNAVAILABLE)
+    time.sleep(0.06)
+
+    b.record(b.allow(), 0.01, UNAVAILABLE)
+    assert b.state == OPEN
+    assert b.stats()["opens"] == 2
+    assert b.retry_after() > 0
+
+
+def test_stale_answer_served_through_an_outage():
+    async def scenario():
+        mock = MockBedrockClient("local")
+        b = CircuitBreaker(failure_rate=0.6, window=3, min_calls=3, open_seconds=0.2, probes=1)
+        cache = RecommendationCache(ttl_seconds=0.05, stale_seconds=60)
+        stale = StaleWhileRevalidate(cache, b, poll_seconds=0.01)
+        kwargs = dict(bedrock_client=CircuitBreakerBedrockClient(mock, b), model_id="model", cache=cache, stale=stale)
+        try:
+            first = await arecommend_objective({"objective": "Check the bill"}, **kwargs)
+            await asyncio.sleep(0.06)  # expired, but still servable as stale
+
+            mock.outage_seconds = 3600
+            for objective in ("Check the invoice", "Check the receipt"):
+                with pytest.raises(ClientError):
+                    await arecommend_objective({"objective": objective}, **kwargs)
+            assert b.state == OPEN
+
+            served = await arecommend_objective({"objective": "Check the bill"}, **kwargs)
+            assert served.stale is True
+            assert served.reason == first.reason
+            assert stale.stats()["pending"] == 1
+            with pytest.raises(CircuitOpen):
+                await arecommend_objective({"objective": "Never answered"}, **kwargs)
+
+            # Bedrock recovers: the queued refresh is the half-open probe and closes the circuit
+            mock.outage_seconds = 0
+            cache.ttl_seconds = 60
+            deadline = time.monotonic() + 5
+            while b.state != CLOSED and time.monotonic() < deadline:
+                await asyncio.sleep(0.01)
+            assert b.state == CLOSED
+            assert stale.stats()["pending"] == 0
+
+            fresh = await arecommend_objective({"objective": "Check the bill"}, **kwargs)
+            assert fresh.stale is False
+            assert cache.stats()["hits"] == 1
+        finally:
+            stale.close()
+
+    asyncio.run(scenario())
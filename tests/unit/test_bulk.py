@@ -0,0 +1,88 @@
+import json
+
+import pytest
+
+import bulk
+from bulk import Progress
+
+OBJECTIVES = ["Check the bill", "Verify the refund", "Confirm the address", "Cancel the order", "Track the parcel"]
+
+
+@pytest.fixture(autouse=True)
+def local_config(monkeypatch):
+    monkeypatch.setenv("VERCEL", "1")  # keep the repo's .env out of it
+    for name in ("SECRET_NAME", "REGION", "CACHE_DB_PATH", "SHARED_STORE_PATH", "CONFIG_SNAPSHOT_PATH"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv("ENV", "local")
+    monkeypatch.setenv("API_KEY", "k")
+    monkeypatch.setenv("BEDROCK_MODEL_ID", "model")
+
+
+@pytest.fixture
+def files(tmp_path):
+    source = tmp_path / "objectives.jsonl"
+    lines = [json.dumps({"id": f"tc-{i}", "objective": o}) + "\n" for i, o in enumerate(OBJECTIVES)]
+    source.write_text("".join(lines))
+    return source, tmp_path / "results.jsonl", [len(line.encode()) for line in lines]
+
+
+def results(path):
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+def test_watermark_advances_over_contiguous_finished_lines(tmp_path):
+    progress = Progress(str(tmp_path / "checkpoint"))
+    for line in range(4):
+        progress.read(line, line * 10, line * 10 + 10)
+    with progress.lock:
+        progress.finish(2)
+        progress.finish(0)
+    assert (progress.watermark, progress.done, progress.input_offset) == (1, {2}, 10)
+
+    with progress.lock:
+        progress.finish(1)
+    assert (progress.watermark, progress.done, progress.input_offset) == (3, set(), 30)
+
+    with open(tmp_path / "out", "wb") as sink, progress.lock:
+        sink.write(b"x" * 7)
+        progress.save(sink)
+    loaded = Progress.load(str(tmp_path / "checkpoint"))
+    assert (loaded.watermark, loaded.input_offset, loaded.output_offset, loaded.done) == (3, 30, 7, set())
+
+
+@pytest.mark.parametrize("mode", ["async", "thread"])
+def test_resumes_from_the_checkpoint(files, mode):
+    source, output, sizes = files
+    # a crash after lines 0 and 2 were checkpointed, while line 1 was being written
+    kept = [
+        {"line": 0, "id": "tc-0", "status": "ok", "result": "earlier"},
+        {"line": 2, "id": "tc-2", "status": "ok", "result": "earlier"},
+    ]
+    saved = "".join(json.dumps(r) + "\n" for r in kept)
+    output.write_text(saved + '{"line": 1, "status": "ok", "resu')
+    checkpoint = output.with_name(output.name + ".checkpoint")
+    checkpoint.write_text(json.dumps({"line": 1, "input_offset": sizes[0], "output_offset": len(saved.encode()), "done": [2]}))
+
+    assert bulk.main([str(source), str(output), "--mode", mode, "--workers", "2"]) == 0
+
+    records = results(output)
+    assert sorted(r["line"] for r in records) == [0, 1, 2, 3, 4]
+    assert records[:2] == kept  # finished lines are not redone
+    assert all(r["status"] == "ok" and r["id"] == f"tc-{r['line']}" for r in records[2:])
+    assert json.loads(checkpoint.read_text()) == {
+        "line": 5,
+        "input_offset": sum(sizes),
+        "output_offset": output.stat().st_size,
+        "done": [],
+    }
+
+    # nothing left to do: a rerun appends nothing
+    assert bulk.main([str(source), str(output), "--mode", mode]) == 0
+    assert results(output) == records
+
+
+def test_fresh_starts_over(files):
+    source, output, _ = files
+    assert bulk.main([str(source), str(output)]) == 0
+    assert bulk.main([str(source), str(output), "--fresh"]) == 0
+    assert sorted(r["line"] for r in results(output)) == [0, 1, 2, 3, 4]
@@ -0,0 +1,162 @@
+import asyncio
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from inference import cache as cache_module
+from inference.cache import RecommendationCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_module, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "cache.db")
+
+
+def rows(db_path):
+    with sqlite3.connect(db_path) as db:
+        return [key for (key,) in db.execute("SELECT key FROM recommendation_cache ORDER BY key")]
+
+
+def flushed(cache, timeout=5.0):
+    """flush() in a thread, so a write stranded in the queue fails the test instead of hanging it."""
+    done = threading.Thread(target=cache.flush, daemon=True)
+    done.start()
+    done.join(timeout)
+    return not done.is_alive()
+
+
+def test_entries_expire_after_the_ttl(clock):
+    cache = RecommendationCache(ttl_seconds=10)
+    cache.set("k", {"v": 1})
+    clock.now += 9.9
+    assert cache.get("k") == {"v": 1}
+    clock.now += 0.2
+    assert cache.get("k") is None
+    assert cache.stats()["entries"] == 0
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = RecommendationCache(max_entries=2)
+    cache.set("a", {"v": "a"})
+    cache.set("b", {"v": "b"})
+    cache.get("a")
+    cache.set("c", {"v": "c"})
+    assert cache.get("b") is None
+    assert cache.get("a") == {"v": "a"}
+    assert cache.get("c") == {"v": "c"}
+
+
+def test_stale_entries_are_served_only_within_stale_seconds(clock):
+    cache = RecommendationCache(ttl_seconds=10, stale_seconds=60)
+    cache.set("k", {"v": 1})
+    clock.now += 30
+    assert cache.get("k") is None  # expired, but kept for get_stale
+    assert cache.get_stale("k") == {"v": 1}
+    assert asyncio.run(cache.aget_stale("k")) == {"v": 1}
+    clock.now += 40.1
+    assert cache.get_stale("k") is None
+    assert cache.stats()["stale_hits"] == 2
+
+
+def test_a_second_cache_on_the_same_file_sees_flushed_rows(db_path):
+    writer = RecommendationCache(db_path=db_path)
+    writer.set("k", {"v": 1})
+    assert flushed(writer)
+
+    reader = RecommendationCache(db_path=db_path)
+    assert asyncio.run(reader.aget("k")) == {"v": 1}
+    assert reader.get("k") == {"v": 1}  # now from memory
+    assert (reader.hits, reader.disk_hits) == (2, 1)
+
+
+def test_stale_rows_survive_a_restart(db_path, clock):
+    writer = RecommendationCache(ttl_seconds=10, db_path=db_path, stale_seconds=60)
+    writer.set("k", {"v": 1})
+    assert flushed(writer)
+    clock.now += 30
+
+    reader = RecommendationCache(ttl_seconds=10, db_path=db_path, stale_seconds=60)
+    assert reader.get("k") is None
+    assert asyncio.run(reader.aget_stale("k")) == {"v": 1}
+
+
+def test_failed_writes_are_counted_and_memory_still_serves(db_path):
+    cache = RecommendationCache(db_path=db_path)
+    with sqlite3.connect(db_path) as db:
+        db.execute(
+            "CREATE TRIGGER broken BEFORE INSERT ON recommendation_cache BEGIN SELECT RAISE(ABORT, 'disk full'); END"
+        )
+    cache.set("a", {"v": 1})
+    cache.set("b", {"v": 2})
+    assert flushed(cache)
+
+    assert cache.stats()["write_errors"] == 2
+    assert cache.stats()["pending_writes"] == 0
+    assert cache.get("a") == {"v": 1}
+    assert rows(db_path) == []
+
+
+def test_writer_exits_when_idle_and_restarts_on_the_next_write(db_path, monkeypatch):
+    monkeypatch.setattr(cache_module, "WRITER_IDLE_SECONDS", 0.01)
+    cache = RecommendationCache(db_path=db_path)
+    cache.set("a", {"v": 1})
+    assert flushed(cache)
+    deadline = time.monotonic() + 5
+    while cache._writer is not None and time.monotonic() < deadline:
+        time.sleep(0.005)
+    assert cache._writer is None
+
+    cache.set("b", {"v": 2})
+    assert flushed(cache)
+    assert rows(db_path) == ["a", "b"]
+
+
+def test_no_write_is_stranded_while_the_writer_exits(db_path, monkeypatch):
+    # writes land just as the writer's idle wait runs out, again and again
+    monkeypatch.setattr(cache_module, "WRITER_IDLE_SECONDS", 0.0005)
+    cache = RecommendationCache(max_entries=1000, db_path=db_path)
+    for i in range(300):
+        cache.set(f"k{i:03}", {"v": i})
+        if i % 3:
+            time.sleep(0.0005)
+    assert flushed(cache)
+    assert len(rows(db_path)) == 300
+
+
+def test_disk_is_pruned_to_ten_times_the_memory_bound(db_path, clock):
+    cache = RecommendationCache(max_entries=1, db_path=db_path)
+    for i in range(256):
+        clock.now += 1
+        cache.set(f"k{i:03}", {"v": i})
+    assert flushed(cache)
+    assert rows(db_path) == [f"k{i:03}" for i in range(246, 256)]
+
+
+def test_prune_drops_rows_past_the_stale_window(db_path, clock):
+    cache = RecommendationCache(max_entries=100, ttl_seconds=10, db_path=db_path, stale_seconds=5)
+    cache.set("old", {"v": 0})
+    assert flushed(cache)
+    clock.now += 20
+    for i in range(255):
+        cache.set(f"k{i:03}", {"v": i})
+    assert flushed(cache)
+    assert "old" not in rows(db_path)
+    assert len(rows(db_path)) == 255
@@ -0,0 +1,118 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from botocore.exceptions import ClientError
+
+from core.breaker import CircuitOpen
+from core.concurrency import Overloaded
+from core.metrics import CASCADE_CALLS, CASCADE_REJECTIONS
+from inference.cascade import Cascade
+from inference.recommendation import arecommend_objective, recommend_objective
+from local.bedrock_client import BedrockClient as MockBedrockClient
+
+OBJECTIVE = "Check the customer's bill is correct"
+GOOD = {
+    "reason": "The objective is vague.",
+    "suggestedDefiningObjective": "Confirm the invoice total matches the plan price",
+    "alternativeDefiningObjective": "Verify that no unexpected charges appear on the bill",
+}
+
+
+class Tracking(MockBedrockClient):
+    """Mock that records the model ids it was called with and can fail chosen ones."""
+
+    def __init__(self, fail=None, **kwargs):
+        super().__init__("local", **kwargs)
+        self.fail = fail or {}
+        self.models = []
+
+    def _call(self, model_id):
+        self.models.append(model_id)
+        if model_id in self.fail:
+            raise self.fail[model_id]
+
+    def invoke_model(self, model_id, body, **kwargs):
+        self._call(model_id)
+        return super().invoke_model(model_id, body, **kwargs)
+
+    async def ainvoke_model(self, model_id, body, **kwargs):
+        self._call(model_id)
+        return await super().ainvoke_model(model_id, body, **kwargs)
+
+
+def recommend(client, mode, cascade=Cascade(("fast",))):
+    payload = {"objective": OBJECTIVE}
+    if mode == "sync":
+        return recommend_objective(payload, bedrock_client=client, model_id="primary", cascade=cascade)
+    return asyncio.run(arecommend_objective(payload, bedrock_client=client, model_id="primary", cascade=cascade))
+
+
+modes = pytest.mark.parametrize("mode", ["sync", "async"])
+
+
+@modes
+def test_a_good_fast_answer_is_used(mode):
+    client = Tracking()
+    before = CASCADE_CALLS.value("fast", "accepted")
+
+    result = recommend(client, mode)
+
+    assert client.models == ["fast"]
+    assert OBJECTIVE in result.suggestedDefiningObjective
+    assert CASCADE_CALLS.value("fast", "accepted") - before == 1
+
+
+@modes
+def test_an_echoed_answer_escalates_to_the_primary(mode):
+    client = Tracking(model_profiles={"fast": {"echo_rate": 1.0}})
+    before = CASCADE_REJECTIONS.value("fast", "echo")
+
+    result = recommend(client, mode)
+
+    assert client.models == ["fast", "primary"]
+    assert result.suggestedDefiningObjective != OBJECTIVE
+    assert CASCADE_REJECTIONS.value("fast", "echo") - before == 1
+
+
+@modes
+def test_a_fast_tier_error_escalates_to_the_next_tier(mode):
+    throttled = ClientError({"Error": {"Code": "ThrottlingException"}}, "InvokeModel")
+    client = Tracking(fail={"fast": throttled})
+    before = CASCADE_CALLS.value("fast", "error")
+
+    result = recommend(client, mode, Cascade(("fast", "faster")))
+
+    assert client.models == ["fast", "faster"]
+    assert OBJECTIVE in result.suggestedDefiningObjective
+    assert CASCADE_CALLS.value("fast", "error") - before == 1
+
+
+@modes
+@pytest.mark.parametrize("refusal", [Overloaded("shed", retry_after=1.0), CircuitOpen("open", retry_after=5.0)])
+def test_load_shedding_and_an_open_circuit_are_raised_not_escalated(mode, refusal):
+    client = Tracking(fail={"fast": refusal})
+
+    with pytest.raises(type(refusal)):
+        recommend(client, mode)
+
+    assert client.models == ["fast"]
+
+
+@pytest.mark.parametrize(
+    "change, reason",
+    [
+        ({"reason": "  "}, "empty"),
+        ({"reason": "x" * 801}, "too_long"),
+        ({"alternativeDefiningObjective": "CHECK the customer's bill is correct!"}, "echo"),
+        ({"alternativeDefiningObjective": GOOD["suggestedDefiningObjective"].upper()}, "duplicate"),
+        ({"suggestedDefiningObjective": "Check the invoice"}, "too_short"),
+        ({}, None),
+    ],
+)
+def test_rejects_low_quality_answers(change, reason):
+    assert Cascade(("fast",)).rejection(OBJECTIVE, SimpleNamespace(**{**GOOD, **change})) == reason
+
+
+def test_cache_keys_depend_on_the_whole_chain():
+    assert Cascade(("fast", "faster")).answering_model("primary") == "fast>faster>primary"
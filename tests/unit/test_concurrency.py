@@ -0,0 +1,115 @@
+import asyncio
+
+import pytest
+
+from core.concurrency import AdaptiveLimiter, Overloaded, current_share
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_sheds_when_the_queue_is_full():
+    async def scenario():
+        limiter = AdaptiveLimiter(initial_limit=1, max_queue=1, queue_timeout=1.0)
+        await limiter.acquire()
+        waiting = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        assert limiter.queued == 1
+
+        with pytest.raises(Overloaded) as shed:
+            await limiter.acquire()
+        assert shed.value.retry_after >= 1
+
+        limiter.release(0.01)
+        await waiting
+        return limiter.stats()
+
+    stats = run(scenario())
+    assert stats["rejected"] == 1
+    assert stats["admitted"] == 2
+    assert (stats["in_flight"], stats["queued"]) == (1, 0)
+
+
+def test_queue_wait_times_out():
+    async def scenario():
+        limiter = AdaptiveLimiter(initial_limit=1, queue_timeout=1.0)
+        await limiter.acquire()
+        with pytest.raises(Overloaded):
+            await limiter.acquire(timeout=0.02)
+        return limiter.stats()
+
+    stats = run(scenario())
+    assert stats["timed_out"] == 1
+    assert stats["queued"] == 0
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def scenario():
+        limiter = AdaptiveLimiter(initial_limit=1)
+        await limiter.acquire()
+        waiting = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        limiter.release(0.01)
+        return limiter.stats()
+
+    stats = run(scenario())
+    assert (stats["in_flight"], stats["queued"]) == (0, 0)
+
+
+def test_throttling_cuts_the_limit_once_per_round_trip():
+    limiter = AdaptiveLimiter(initial_limit=10, backoff_ratio=0.5)
+    limiter.in_flight = 2
+    limiter.release(1.0, congested=True)
+    limiter.release(1.0, congested=True)
+    assert limiter.limit == 5
+    assert limiter.decreases == 1
+
+
+def test_latency_over_target_counts_as_congestion():
+    limiter = AdaptiveLimiter(initial_limit=10, latency_target=0.5, backoff_ratio=0.5)
+    limiter.in_flight = 1
+    limiter.release(2.0)
+    assert limiter.limit == 5
+
+
+def test_grows_only_while_the_limit_is_the_bottleneck():
+    async def scenario():
+        limiter = AdaptiveLimiter(initial_limit=2)
+        await limiter.acquire()
+        limiter.release(0.01)
+        assert limiter.limit == 2  # one call in flight: the limit was not in the way
+
+        await limiter.acquire()
+        await limiter.acquire()
+        limiter.release(0.01)
+        return limiter.limit
+
+    assert run(scenario()) == 2.5
+
+
+def test_light_share_is_not_starved_by_a_backlog():
+    async def scenario():
+        limiter = AdaptiveLimiter(initial_limit=1, max_queue=16)
+        order = []
+
+        async def call(share, name):
+            current_share.set((share, 1.0))
+            await limiter.acquire()
+            order.append(name)
+            await asyncio.sleep(0)
+            limiter.release(0.01)
+
+        await limiter.acquire()
+        tasks = [asyncio.ensure_future(call("bulk", f"bulk{i}")) for i in range(4)]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.ensure_future(call("light", "light")))
+        await asyncio.sleep(0)
+        limiter.release(0.01)
+        await asyncio.gather(*tasks)
+        return order
+
+    assert run(scenario()) == ["bulk0", "light", "bulk1", "bulk2", "bulk3"]
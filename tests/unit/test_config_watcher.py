@@ -0,0 +1,137 @@
+import asyncio
+import json
+import uuid
+
+import pytest
+
+from core.config import Config
+from core.config_snapshot import ConfigSnapshot
+from core.config_watcher import ConfigWatcher, current_version
+
+BASE = {"API_KEY": "k1", "BEDROCK_MODEL_ID": "m1"}
+
+
+class FakeSecrets:
+    """Stand-in Secrets Manager client: versioned secret values, boto3 keyword style."""
+
+    def __init__(self, secret):
+        self.versions = {}
+        self.current = None
+        self.describes = 0
+        self.gets = 0
+        self.put(secret)
+
+    def put(self, secret):
+        self.current = str(uuid.uuid4())
+        self.versions[self.current] = secret
+
+    def describe_secret(self, SecretId):
+        self.describes += 1
+        stages = {v: ["AWSCURRENT"] if v == self.current else ["AWSPREVIOUS"] for v in self.versions}
+        return {"Name": SecretId, "VersionIdsToStages": stages}
+
+    def get_secret_value(self, SecretId, VersionId=None):
+        self.gets += 1
+        return {"SecretString": json.dumps(self.versions[VersionId or self.current])}
+
+
+@pytest.fixture(autouse=True)
+def env(monkeypatch):
+    monkeypatch.setenv("ENV", "local")
+
+
+def watcher(secrets, on_change, **kwargs):
+    return ConfigWatcher("rec", "eu-west-1", Config._load_secrets(BASE, "eu-west-1"), on_change, client=secrets, **kwargs)
+
+
+class Applied:
+    def __init__(self, fail=0):
+        self.configs = []
+        self.fail = fail
+
+    async def __call__(self, config):
+        if self.fail:
+            self.fail -= 1
+            raise RuntimeError("runtime build failed")
+        self.configs.append(config)
+
+
+def test_current_version():
+    assert current_version({"VersionIdsToStages": {"a": ["AWSPREVIOUS"], "b": ["AWSCURRENT", "x"]}}) == "b"
+    assert current_version({}) is None
+
+
+def test_unchanged_version_is_not_fetched_again():
+    secrets = FakeSecrets(BASE)
+    applied = Applied()
+    w = watcher(secrets, applied)
+
+    assert asyncio.run(w.check()) is False  # same content as the running config
+    assert asyncio.run(w.check()) is False
+    assert (secrets.describes, secrets.gets) == (2, 1)
+    assert applied.configs == []
+    assert w.version == secrets.current
+
+
+def test_changed_secret_is_applied_and_snapshotted(tmp_path):
+    secrets = FakeSecrets(BASE)
+    applied = Applied()
+    snapshot = ConfigSnapshot(str(tmp_path / "snapshot.json"))
+    w = watcher(secrets, applied, snapshot=snapshot)
+
+    secrets.put({**BASE, "BEDROCK_MODEL_ID": "m2"})
+    assert asyncio.run(w.check()) is True
+    assert [c["bedrock_model_id"] for c in applied.configs] == ["m2"]
+    assert w.config["bedrock_model_id"] == "m2"
+    assert w.version == secrets.current
+    assert snapshot.load("rec")["BEDROCK_MODEL_ID"] == "m2"
+    assert w.stats()["reloads"] == 1
+
+
+def test_failed_reload_is_retried(tmp_path):
+    secrets = FakeSecrets(BASE)
+    applied = Applied(fail=1)
+    snapshot = ConfigSnapshot(str(tmp_path / "snapshot.json"))
+    w = watcher(secrets, applied, snapshot=snapshot)
+    secrets.put({**BASE, "BEDROCK_MODEL_ID": "m2"})
+
+    assert asyncio.run(w.check()) is False
+    assert w.failures == 1
+    assert w.version is None  # not recorded, so the next poll fetches the version again
+    assert w.config["bedrock_model_id"] == "m1"
+    assert snapshot.load("rec") is None
+
+    assert asyncio.run(w.check()) is True
+    assert [c["bedrock_model_id"] for c in applied.configs] == ["m2"]
+    assert w.version == secrets.current
+    assert snapshot.load("rec")["BEDROCK_MODEL_ID"] == "m2"
+
+
+def test_poll_failure_is_counted_not_raised():
+    class Broken(FakeSecrets):
+        def describe_secret(self, SecretId):
+            raise ConnectionError("no route to Secrets Manager")
+
+    w = watcher(Broken(BASE), Applied())
+    assert asyncio.run(w.check()) is False
+    assert w.stats()["failures"] == 1
+
+
+def test_runs_on_its_interval():
+    secrets = FakeSecrets(BASE)
+    applied = Applied()
+
+    async def scenario():
+        w = watcher(secrets, applied, interval_seconds=0.01)
+        w.start()
+        secrets.put({**BASE, "API_KEY": "k2"})
+        for _ in range(200):
+            if applied.configs:
+                break
+            await asyncio.sleep(0.01)
+        await w.stop()
+        return w
+
+    w = asyncio.run(scenario())
+    assert [c["api_key"] for c in applied.configs] == ["k2"]
+    assert w.polls >= 1
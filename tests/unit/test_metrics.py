@@ -0,0 +1,19 @@
+from core.metrics import Counter, Histogram, Registry
+
+
+def test_label_values_are_escaped():
+    counter = Counter("errors_total", "Errors.", ("code",))
+    counter.inc('bad "quote" \\ and\nnewline')
+    assert counter.render()[-1] == 'errors_total{code="bad \\"quote\\" \\\\ and\\nnewline"} 1.0'
+
+
+def test_histogram_and_callback_labels_are_escaped():
+    registry = Registry()
+    histogram = registry.histogram("latency_seconds", "Latency.", ("route",), buckets=(1,))
+    histogram.observe(0.5, 'a"b')
+    registry.callback("per_endpoint", "gauge", "Per endpoint.", lambda: [({"endpoint": "us\\east"}, 1)])
+
+    metrics = registry.render()
+    assert 'latency_seconds_bucket{route="a\\"b",le="1"} 1' in metrics
+    assert 'per_endpoint{endpoint="us\\\\east"} 1.0' in metrics
+
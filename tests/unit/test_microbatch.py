@@ -0,0 +1,158 @@
+import asyncio
+import json
+import time
+
+from core.metrics import MICRO_BATCH_FALLBACKS
+from core.microbatch import MicroBatcher
+from inference.recommendation import PromptOptions, _parse_batch_response, arecommend_objective
+from local.bedrock_client import BedrockClient as MockBedrockClient
+
+OBJECTIVES = ["Check the bill", "Verify the refund", "Confirm the address", "Cancel the order"]
+ANSWER = {"reason": "r", "suggestedDefiningObjective": "s", "alternativeDefiningObjective": "a"}
+
+
+class Recorder:
+    """Flush that records its batches and answers each item with (item, batch size)."""
+
+    def __init__(self):
+        self.batches = []
+
+    async def __call__(self, items):
+        self.batches.append(list(items))
+        return [item if isinstance(item, Exception) else (item, len(items)) for item in items]
+
+
+def test_items_within_the_window_share_a_flush():
+    flush = Recorder()
+
+    async def scenario():
+        batcher = MicroBatcher(window_ms=20, max_items=8)
+        return await asyncio.gather(
+            batcher.submit("a", 1, flush), batcher.submit("a", 2, flush), batcher.submit("b", 3, flush)
+        )
+
+    assert asyncio.run(scenario()) == [(1, 2), (2, 2), (3, 1)]
+    assert sorted(map(sorted, flush.batches)) == [[1, 2], [3]]
+
+
+def test_a_full_batch_flushes_without_waiting_for_the_window():
+    flush = Recorder()
+
+    async def scenario():
+        batcher = MicroBatcher(window_ms=10_000, max_items=2)
+        started = time.monotonic()
+        results = await asyncio.gather(batcher.submit("a", 1, flush), batcher.submit("a", 2, flush))
+        return results, time.monotonic() - started, batcher.stats()
+
+    results, seconds, stats = asyncio.run(scenario())
+    assert results == [(1, 2), (2, 2)]
+    assert seconds < 1
+    assert stats == {"batches": 1, "items": 2, "open": 0}
+
+
+def test_errors_reach_only_their_submitter_unless_the_flush_fails():
+    async def failing(items):
+        raise RuntimeError("batch call failed")
+
+    async def scenario():
+        batcher = MicroBatcher(window_ms=5)
+        mixed = await asyncio.gather(
+            batcher.submit("a", 1, Recorder()), batcher.submit("a", ValueError("bad item"), None), return_exceptions=True
+        )
+        failed = await asyncio.gather(
+            batcher.submit("b", 1, failing), batcher.submit("b", 2, failing), return_exceptions=True
+        )
+        return mixed, failed
+
+    mixed, failed = asyncio.run(scenario())
+    assert mixed[0] == (1, 2)
+    assert str(mixed[1]) == "bad item"
+    assert [str(e) for e in failed] == ["batch call failed"] * 2
+
+
+def test_batch_reply_entries_are_matched_by_id():
+    entries = [
+        {"id": "1", **ANSWER},
+        {"id": "1", **ANSWER, "reason": "duplicate"},
+        {"id": "7", **ANSWER},
+        {"id": "x", **ANSWER},
+        {"id": "0", "reason": "incomplete"},
+        {**ANSWER},
+    ]
+    resp = {"content": [{"type": "text", "text": json.dumps({"results": entries})}]}
+    answers = _parse_batch_response(resp, 3)
+    assert answers[0] is None
+    assert answers[1].reason == "r"
+    assert answers[2] is None
+
+
+class Counting:
+    """Passes calls through to the mock, counting them."""
+
+    def __init__(self, inner):
+        self.inner = inner
+        self.calls = 0
+
+    async def ainvoke_model(self, model_id, body, content_type="application/json", accept="application/json"):
+        self.calls += 1
+        return await self.inner.ainvoke_model(model_id, body, content_type, accept)
+
+
+class Unparsable(Counting):
+    """Batched replies are garbage; single calls are answered normally."""
+
+    async def ainvoke_model(self, model_id, body, content_type="application/json", accept="application/json"):
+        if body["messages"][0]["content"][0]["text"].startswith("["):
+            self.calls += 1
+            return {"content": [{"type": "text", "text": "Sorry, I cannot help with that."}], "stop_reason": "end_turn"}
+        return await super().ainvoke_model(model_id, body, content_type, accept)
+
+
+def run_batch(client, prompt=PromptOptions()):
+    async def scenario():
+        batcher = MicroBatcher(window_ms=20, max_items=8)
+        return await asyncio.gather(
+            *(
+                arecommend_objective({"objective": o}, bedrock_client=client, model_id="m", prompt=prompt, batcher=batcher)
+                for o in OBJECTIVES
+            )
+        )
+
+    return asyncio.run(scenario())
+
+
+def test_a_clean_batch_reply_needs_one_call():
+    client = Counting(MockBedrockClient("local"))
+    before = MICRO_BATCH_FALLBACKS.value()
+
+    results = run_batch(client)
+
+    for objective, result in zip(OBJECTIVES, results):
+        assert f"'{objective}'" in result.suggestedDefiningObjective
+    assert client.calls == 1
+    assert MICRO_BATCH_FALLBACKS.value() == before
+
+
+def test_items_missing_from_the_batch_reply_fall_back_to_their_own_call():
+    # tool output keeps the single calls well formed; the batched reply always loses one item
+    client = Counting(MockBedrockClient("local", malformed_rate=1.0))
+    before = MICRO_BATCH_FALLBACKS.value()
+
+    results = run_batch(client, PromptOptions(tool_output=True))
+
+    for objective, result in zip(OBJECTIVES, results):
+        assert f"'{objective}'" in result.suggestedDefiningObjective
+    assert MICRO_BATCH_FALLBACKS.value() - before == 1
+    assert client.calls == 2
+
+
+def test_an_unparsable_batch_reply_falls_back_for_every_item():
+    client = Unparsable(MockBedrockClient("local"))
+    before = MICRO_BATCH_FALLBACKS.value()
+
+    results = run_batch(client)
+
+    for objective, result in zip(OBJECTIVES, results):
+        assert f"'{objective}'" in result.suggestedDefiningObjective
+    assert MICRO_BATCH_FALLBACKS.value() - before == len(OBJECTIVES)
+    assert client.calls == 1 + len(OBJECTIVES)
@@ -0,0 +1,108 @@
+import pytest
+
+from inference import near_duplicates as near_duplicates_module
+from inference.near_duplicates import MAX_SHINGLED_CHARS, NearDuplicateIndex, normalize
+from inference.recommendation import recommend_objective
+from local.bedrock_client import BedrockClient as MockBedrockClient
+
+OBJECTIVE = "Verify that the customer's refund has been processed within 5 days"
+
+
+def indexed(*objectives, scope="model|v1", **kwargs):
+    index = NearDuplicateIndex(**kwargs)
+    for objective in objectives:
+        index.add(index.fingerprint(scope, objective), {"objective": objective})
+    return index
+
+
+def found(index, objective, scope="model|v1"):
+    value = index.lookup(index.fingerprint(scope, objective))
+    return value and value["objective"]
+
+
+def test_normalizes_case_punctuation_and_contractions():
+    assert normalize("  Don’t CANCEL the order!! ") == "do not cancel the order"
+    assert normalize("It's what we've got") == "it is what we have got"
+
+
+@pytest.mark.parametrize(
+    "paraphrase",
+    [
+        "verify that the customer's refund has been processed within 5 days.",
+        "VERIFY that the customers refund has been processed within 5 days!",
+        "Verify  that the customer’s refund has been  processed within 5 days",
+        "Verify that the customer’s refund was processed within 5 days",
+    ],
+)
+def test_paraphrases_match(paraphrase):
+    assert found(indexed(OBJECTIVE), paraphrase) == OBJECTIVE
+
+
+@pytest.mark.parametrize(
+    "objective",
+    [
+        "Verify that the customer's refund has been processed within 7 days",
+        "Verify that the customer's refund has been processed within 5.5 days",
+        "Verify that the customer's refund has not been processed within 5 days",
+        "Verify that the customer's refund hasn't been processed within 5 days",
+        "Check the delivery address of the order within 5 days",
+    ],
+)
+def test_a_different_number_negation_or_objective_does_not_match(objective):
+    index = indexed(OBJECTIVE)
+    assert found(index, objective) is None
+    assert index.stats()["misses"] == 1
+
+
+def test_matches_only_within_the_same_scope():
+    index = indexed(OBJECTIVE, scope="model|v1")
+    assert found(index, OBJECTIVE, scope="model|v2") is None
+    assert found(index, OBJECTIVE, scope="other-model|v1") is None
+
+
+def test_text_past_the_shingled_prefix_must_match_exactly():
+    head = "Review the account history " * (MAX_SHINGLED_CHARS // 20)
+    index = indexed(head + "and close the account")
+    assert found(index, head + "and close the account.") == head + "and close the account"
+    assert found(index, head + "and open the account") is None
+
+
+def test_returns_the_most_similar_entry():
+    index = indexed("Verify that the refund was processed", OBJECTIVE)
+    assert found(index, OBJECTIVE + ".") == OBJECTIVE
+
+
+def test_entries_expire_and_are_evicted_oldest_first(monkeypatch):
+    class Clock:
+        now = 1000.0
+
+        def time(self):
+            return self.now
+
+    clock = Clock()
+    monkeypatch.setattr(near_duplicates_module, "time", clock)
+    index = indexed("Check the bill", "Verify the refund", max_entries=1, ttl_seconds=10)
+    assert found(index, "check the bill") is None
+    assert found(index, "verify the refund") == "Verify the refund"
+    assert index.stats()["evictions"] == 1
+
+    clock.now += 10
+    assert found(index, "verify the refund") is None
+
+
+def test_recommendation_for_a_paraphrase_is_reused():
+    index = NearDuplicateIndex()
+    client = MockBedrockClient("local")
+
+    def recommend(objective):
+        return recommend_objective({"objective": objective}, bedrock_client=client, model_id="m", near_duplicates=index)
+
+    first = recommend(OBJECTIVE)
+    reused = recommend(OBJECTIVE.upper() + "!")
+    negated = recommend(OBJECTIVE.replace("has been", "has not been"))
+
+    assert not first.reused
+    assert reused.reused
+    assert reused.suggestedDefiningObjective == first.suggestedDefiningObjective
+    assert not negated.reused
+    assert "has not been" in negated.suggestedDefiningObjective
@@ -0,0 +1,44 @@
+import json
+
+from inference.cache import RecommendationCache
+from inference.near_duplicates import NearDuplicateIndex
+from inference.recommendation import SimpleObjectiveRequest, cache_key, recommend_objective
+
+FLAGGED = {
+    "reason": "r",
+    "suggestedDefiningObjective": "s",
+    "alternativeDefiningObjective": "a",
+    "reused": True,
+    "stale": True,
+}
+
+
+class Replies:
+    """Stand-in Bedrock client answering every call with the same reply text."""
+
+    def __init__(self, text):
+        self.text = text
+        self.calls = 0
+
+    def invoke_model(self, model_id, body, content_type="application/json", accept="application/json"):
+        self.calls += 1
+        return {"content": [{"type": "text", "text": self.text}], "stop_reason": "end_turn"}
+
+
+def test_service_flags_in_a_reply_are_ignored():
+    client = Replies(json.dumps(FLAGGED))
+    cache = RecommendationCache()
+    near_duplicates = NearDuplicateIndex()
+    options = dict(bedrock_client=client, model_id="m", cache=cache, near_duplicates=near_duplicates)
+
+    fresh = recommend_objective({"objective": "Check the bill"}, **options)
+    assert (fresh.reused, fresh.stale) == (False, False)
+
+    cached = recommend_objective({"objective": "Check the bill"}, **options)
+    assert (cached.reused, cached.stale) == (False, False)
+    similar = recommend_objective({"objective": "check the bill!!"}, **options)
+    assert (similar.reused, similar.stale) == (True, False)
+    assert client.calls == 1
+
+    stored = cache.get(cache_key(SimpleObjectiveRequest(objective="Check the bill"), "m"))
+    assert set(stored) == {"reason", "suggestedDefiningObjective", "alternativeDefiningObjective"}
@@ -0,0 +1,40 @@
+import asyncio
+import json
+import threading
+
+from local.bedrock_client import BedrockClient as MockBedrockClient
+from local.recorder import RecordingBedrockClient, load_recordings, request_fingerprint
+
+BODY = {"messages": [{"role": "user", "content": [{"type": "text", "text": '{"objective": "Check the bill"}'}]}]}
+
+
+class Recording(RecordingBedrockClient):
+    """Notes the thread each response is written from."""
+
+    def _record(self, *args):
+        self.writer = threading.current_thread()
+        super()._record(*args)
+
+
+def test_async_calls_are_recorded_off_the_event_loop(tmp_path):
+    path = str(tmp_path / "recordings.jsonl")
+    client = Recording(MockBedrockClient("local"), path)
+
+    response = asyncio.run(client.ainvoke_model("m", BODY))
+
+    assert client.writer is not threading.main_thread()
+    assert load_recordings(path)[request_fingerprint("m", BODY)]["response"] == response
+
+
+def test_recordings_are_replayed_for_the_same_request(tmp_path):
+    path = str(tmp_path / "recordings.jsonl")
+    recorded = {"content": [{"type": "text", "text": "recorded"}], "stop_reason": "end_turn"}
+
+    class Canned:
+        def invoke_model(self, *args):
+            return recorded
+
+    RecordingBedrockClient(Canned(), path).invoke_model("m", json.dumps(BODY).encode())
+
+    replaying = MockBedrockClient("local", replay_path=path)
+    assert replaying.invoke_model("m", BODY)["content"] == recorded["content"]
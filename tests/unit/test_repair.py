@@ -0,0 +1,52 @@
+import json
+
+import pytest
+
+from inference.repair import complete_json, rename_fields
+
+FIELDS = ("reason", "suggestedDefiningObjective", "alternativeDefiningObjective")
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ('Here you go: {"a": "b"} hope that helps {', '{"a": "b"}'),
+        ('{"a": "b", "c": ', '{"a": "b"}'),
+        ('{"a": "b", "c"', '{"a": "b"}'),
+        ('{"a": "b", "ke', '{"a": "b"}'),
+        ('{"a": "b",', '{"a": "b"}'),
+        ('{"a": {"b": "c", "d": ["e", "f"', '{"a": {"b": "c", "d": ["e", "f"]}}'),
+        ('{"a": "x { [ \\" ]", "b": [', '{"a": "x { [ \\" ]", "b": []}'),
+    ],
+)
+def test_closes_json_cut_between_values(text, expected):
+    completed = complete_json(text)
+    assert completed == expected
+    json.loads(completed)
+
+
+@pytest.mark.parametrize("text", ['{"a": "b", "c": "cut off mid-sent', '["a", "b"', "no json here"])
+def test_leaves_text_cut_inside_a_value_alone(text):
+    assert complete_json(text) is None
+
+
+def test_renames_other_spellings():
+    data = {"reason": "r", "suggested_defining_objective": "s", "AlternativeObjective": "a"}
+    assert rename_fields(data, FIELDS) == {
+        **data,
+        "suggestedDefiningObjective": "s",
+        "alternativeDefiningObjective": "a",
+    }
+
+
+def test_unwraps_a_single_key_wrapper():
+    inner = {"reason": "r", "suggestedDefiningObjective": "s", "alternativeDefiningObjective": "a"}
+    assert rename_fields({"recommendation": inner}, FIELDS) == inner
+    assert rename_fields({"recommendation": {"reason": "r"}}, FIELDS) is None
+
+
+def test_nothing_to_rename_or_missing_field():
+    complete = {"reason": "r", "suggestedDefiningObjective": "s", "alternativeDefiningObjective": "a"}
+    assert rename_fields(complete, FIELDS) is None
+    assert rename_fields({"reason": "r", "suggested_objective": "s"}, FIELDS) is None
+    assert rename_fields(["not", "a", "dict"], FIELDS) is None
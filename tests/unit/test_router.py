@@ -0,0 +1,131 @@
+import asyncio
+
+import pytest
+from botocore.exceptions import ClientError
+
+from core import bedrock_router as router_module
+from core.bedrock_router import BedrockRouter
+from local.bedrock_client import BedrockClient as MockBedrockClient
+
+BODY = {"messages": [{"role": "user", "content": [{"type": "text", "text": '{"objective": "Check the bill"}'}]}]}
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def monotonic(self):
+        return self.now
+
+
+def route(regions, **kwargs):
+    """A router over one mock per region, each with its own fault/latency profile."""
+    mocks = {region: MockBedrockClient(region, **profile) for region, profile in regions.items()}
+    router = BedrockRouter([(region, None) for region in regions], mocks.__getitem__, explore_ratio=0.0, **kwargs)
+    return router, mocks
+
+
+def stats(router):
+    return {s["endpoint"].split("/")[0]: s for s in router.stats()}
+
+
+@pytest.mark.parametrize("fault", [{"throttle_rate": 1.0}, {"error_rate": 1.0}])
+def test_fails_over_from_a_throttled_or_erroring_region(fault):
+    router, _ = route({"east": fault, "west": {}}, eject_after_failures=5)
+
+    router.invoke_model("m", BODY)
+    asyncio.run(router.ainvoke_model("m", BODY))
+
+    assert router.failovers == 2
+    east, west = stats(router)["east"], stats(router)["west"]
+    assert (east["failures"], west["requests"], west["failures"]) == (2, 2, 0)
+    assert east["throttles"] == (2 if "throttle_rate" in fault else 0)
+
+
+def test_other_errors_are_not_failed_over():
+    class Rejecting:
+        def invoke_model(self, *args):
+            raise ClientError({"Error": {"Code": "ValidationException"}, "ResponseMetadata": {"HTTPStatusCode": 400}}, "InvokeModel")
+
+    clients = {"east": Rejecting(), "west": MockBedrockClient("west")}
+    router = BedrockRouter([("east", None), ("west", None)], clients.__getitem__, explore_ratio=0.0)
+    with pytest.raises(ClientError):
+        router.invoke_model("m", BODY)
+    assert router.failovers == 0
+
+
+def test_the_last_error_is_raised_when_every_region_fails():
+    router, _ = route({"east": {"error_rate": 1.0}, "west": {"throttle_rate": 1.0}})
+    with pytest.raises(ClientError) as failed:
+        router.invoke_model("m", BODY)
+    assert failed.value.response["Error"]["Code"] == "ThrottlingException"
+
+
+def test_failing_region_is_ejected_and_recovers_after_the_cooldown(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(router_module, "time", clock)
+    router, mocks = route({"east": {"error_rate": 1.0}, "west": {}}, eject_after_failures=2, cooldown_seconds=30)
+
+    router.invoke_model("m", BODY)
+    router.invoke_model("m", BODY)
+    assert stats(router)["east"]["ejected"]
+    assert stats(router)["east"]["ejections"] == 1
+
+    router.invoke_model("m", BODY)  # straight to west
+    assert router.failovers == 2
+    assert stats(router)["east"]["requests"] == 2
+
+    mocks["east"].error_rate = 0.0
+    clock.now += 30
+    assert not stats(router)["east"]["ejected"]
+    router.invoke_model("m", BODY)
+    assert stats(router)["east"]["requests"] == 3
+    assert stats(router)["east"]["failures"] == 2
+
+
+def test_ejected_regions_are_still_tried_when_nothing_else_is_left(monkeypatch):
+    monkeypatch.setattr(router_module, "time", Clock())
+    router, mocks = route({"east": {"error_rate": 1.0}}, eject_after_failures=1)
+    with pytest.raises(ClientError):
+        router.invoke_model("m", BODY)
+    mocks["east"].error_rate = 0.0
+    assert router.invoke_model("m", BODY)["content"]
+
+
+def test_prefers_the_region_with_the_lower_ewma_latency():
+    router, _ = route({"slow": {"latency_ms": 40}, "fast": {"latency_ms": 1}})
+
+    async def scenario():
+        for _ in range(10):
+            await router.ainvoke_model("m", BODY)
+
+    asyncio.run(scenario())
+    slow, fast = stats(router)["slow"], stats(router)["fast"]
+    assert (slow["requests"], fast["requests"]) == (1, 9)  # each is measured once, then the faster wins
+    assert fast["ewma_latency_seconds"] < slow["ewma_latency_seconds"]
+    assert router.failovers == 0
+
+
+def test_errors_count_against_the_score():
+    router, _ = route({"east": {}, "west": {}})
+    east, west = router.endpoints
+    east.ewma_latency = west.ewma_latency = 1.0
+    router._record_failure(east, ClientError({"Error": {"Code": "ThrottlingException"}}, "InvokeModel"))
+    assert east.score() > west.score()
+    assert router._ranked()[0] is west
+
+
+def test_each_region_gets_its_own_model_id():
+    seen = []
+
+    class Capturing(MockBedrockClient):
+        def invoke_model(self, model_id, *args):
+            seen.append(model_id)
+            return super().invoke_model(model_id, *args)
+
+    router = BedrockRouter(
+        [("east", "us.profile"), ("west", None)], Capturing, model_id="primary", explore_ratio=0.0
+    )
+    router.invoke_model("primary", BODY)
+    router.invoke_model("other", BODY)
+    assert seen == ["us.profile", "other"]
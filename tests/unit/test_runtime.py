@@ -0,0 +1,59 @@
+import pytest
+
+from core.breaker import OPEN
+from core.config import Config
+from core.metrics import REGISTRY
+from runtime import build_runtime
+
+
+@pytest.fixture
+def config(monkeypatch):
+    monkeypatch.setenv("VERCEL", "1")  # keep the repo's .env out of it
+    for name in ("SECRET_NAME", "REGION", "CACHE_DB_PATH", "SHARED_STORE_PATH", "CONFIG_SNAPSHOT_PATH", "BEDROCK_ENDPOINTS"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv("ENV", "local")
+    monkeypatch.setenv("API_KEY", "k")
+    monkeypatch.setenv("BEDROCK_MODEL_ID", "model")
+    return Config.load_config()
+
+
+def test_reload_keeps_the_limiter_and_breaker_state(config):
+    first = build_runtime(config)
+    first.limiter.limit = 7
+    first.breaker._transition(OPEN)
+
+    second = build_runtime({**config, "prompt_compact": not config["prompt_compact"]}, previous=first)
+
+    assert second.limiter is first.limiter
+    assert second.breaker is first.breaker
+    assert second.breaker.state == OPEN
+    assert second.cache is first.cache
+
+
+def test_changed_settings_build_a_new_limiter_and_breaker(config):
+    first = build_runtime(config)
+    second = build_runtime(
+        {**config, "limiter_max_queue": config["limiter_max_queue"] + 1, "breaker_probes": config["breaker_probes"] + 1},
+        previous=first,
+    )
+    assert second.limiter is not first.limiter
+    assert second.breaker is not first.breaker
+
+    third = build_runtime({**config, "limiter_enabled": False, "breaker_enabled": False}, previous=second)
+    assert (third.limiter, third.breaker) == (None, None)
+
+
+def test_reload_stops_exporting_features_it_no_longer_builds(config):
+    first = build_runtime(config)
+    assert "bedrock_breaker_state" in REGISTRY.render()
+
+    second = build_runtime({**config, "breaker_enabled": False, "cache_enabled": False}, previous=first)
+
+    metrics = REGISTRY.render()
+    assert "bedrock_breaker_state" not in metrics
+    assert "recommendation_cache_hits_total" not in metrics
+    assert "limiter_limit" in metrics
+    assert "bedrock_breaker_state" not in second.callbacks
+
+    build_runtime(config, previous=second)
+    assert "bedrock_breaker_state" in REGISTRY.render()
@@ -0,0 +1,119 @@
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("fcntl")
+
+from core.bedrock_client_cognito import BedrockClient
+from core.shared_store import SharedStore
+
+CONFIG = {
+    "user_pool_id": "pool",
+    "client_id": "client",
+    "identity_pool_id": "identities",
+    "cognito_username": "svc",
+    "cognito_password": "pw",
+}
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "shared.db")
+
+
+class Logins:
+    """Stand-in for the Cognito login: counts calls and hands out numbered keys."""
+
+    def __init__(self, seconds=0.05, valid_for=900.0):
+        self.seconds = seconds
+        self.valid_for = valid_for
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            self.calls += 1
+            n = self.calls
+        time.sleep(self.seconds)
+        return f"AK{n}", "secret", "token", time.time() + self.valid_for
+
+
+def worker(path, logins):
+    """A client as one uvicorn worker would build it: its own connection to the store."""
+    client = BedrockClient("eu-west-1", CONFIG, shared_store=SharedStore(path))
+    client._get_temp_credentials = logins
+    return client
+
+
+def test_values_expire(path):
+    store = SharedStore(path)
+    store.set("live", {"a": 1}, time.time() + 60)
+    store.set("dead", {"a": 2}, time.time() - 1)
+
+    assert store.get("live") == {"a": 1}
+    assert store.get("dead") is None
+    assert store.get("missing") is None
+    assert SharedStore(path).get("live") == {"a": 1}
+
+
+def test_lock_is_exclusive_across_connections(path):
+    first, second = SharedStore(path), SharedStore(path)
+    held = threading.Event()
+    events = []
+
+    def hold():
+        with first.lock("refresh"):
+            held.set()
+            time.sleep(0.1)
+            events.append("first released")
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    held.wait()
+    with second.lock("refresh"):
+        events.append("second acquired")
+    holder.join()
+
+    assert events == ["first released", "second acquired"]
+
+
+def test_concurrent_workers_log_in_once(path):
+    logins = Logins()
+    clients = [worker(path, logins) for _ in range(4)]
+    results = [None] * len(clients)
+
+    def fetch(i):
+        results[i] = clients[i]._fetch_credentials(60)
+
+    threads = [threading.Thread(target=fetch, args=(i,)) for i in range(len(clients))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert logins.calls == 1
+    assert {r["access_key"] for r in results} == {"AK1"}
+    assert sum(c.shared_adoptions for c in clients) == len(clients) - 1
+    assert sum(c.refresh_count for c in clients) == 1
+
+
+def test_adopts_published_credentials_without_logging_in(path):
+    logins = Logins()
+    worker(path, logins)._fetch_credentials(60)
+    late = worker(path, logins)
+
+    assert late._fetch_credentials(60)["access_key"] == "AK1"
+    assert logins.calls == 1
+    assert late.shared_adoptions == 1
+
+
+def test_expiring_shared_credentials_are_replaced(path):
+    logins = Logins(valid_for=30)
+    worker(path, logins)._fetch_credentials(10)
+    logins.valid_for = 900
+
+    # AK1 expires within the 60s this caller needs: log in and publish AK2
+    assert worker(path, logins)._fetch_credentials(60)["access_key"] == "AK2"
+    assert worker(path, logins)._fetch_credentials(60)["access_key"] == "AK2"
+    assert logins.calls == 2
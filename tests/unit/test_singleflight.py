@@ -0,0 +1,111 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from core.singleflight import CoalescingBedrockClient, SingleFlight
+
+
+class Upstream:
+    """Counts calls and answers after a short delay, like a slow Bedrock."""
+
+    def __init__(self, error=None):
+        self.calls = 0
+        self.error = error
+
+    async def ainvoke_model(self, model_id, body, content_type="application/json", accept="application/json"):
+        self.calls += 1
+        await asyncio.sleep(0.02)
+        if self.error is not None:
+            raise self.error
+        return {"model": model_id, "call": self.calls}
+
+
+def test_concurrent_identical_calls_share_one_upstream_call():
+    upstream = Upstream()
+    flight = SingleFlight()
+
+    async def scenario():
+        results = await asyncio.gather(*(flight.ado("k", lambda: upstream.ainvoke_model("m", {})) for _ in range(5)))
+        later = await flight.ado("k", lambda: upstream.ainvoke_model("m", {}))
+        return results, later
+
+    results, later = asyncio.run(scenario())
+    assert results == [{"model": "m", "call": 1}] * 5
+    assert later == {"model": "m", "call": 2}  # finished calls are not reused
+    assert flight.stats() == {"leaders": 2, "coalesced": 4, "in_flight": 0}
+
+
+def test_waiters_share_the_exception():
+    upstream = Upstream(error=RuntimeError("upstream failed"))
+    flight = SingleFlight()
+
+    async def scenario():
+        return await asyncio.gather(
+            *(flight.ado("k", lambda: upstream.ainvoke_model("m", {})) for _ in range(3)), return_exceptions=True
+        )
+
+    results = asyncio.run(scenario())
+    assert [str(r) for r in results] == ["upstream failed"] * 3
+    assert upstream.calls == 1
+
+
+def test_a_cancelled_caller_does_not_cancel_the_shared_call():
+    upstream = Upstream()
+    flight = SingleFlight()
+
+    async def scenario():
+        leaving = asyncio.ensure_future(flight.ado("k", lambda: upstream.ainvoke_model("m", {})))
+        staying = asyncio.ensure_future(flight.ado("k", lambda: upstream.ainvoke_model("m", {})))
+        await asyncio.sleep(0)
+        leaving.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leaving
+        return await staying
+
+    assert asyncio.run(scenario()) == {"model": "m", "call": 1}
+
+
+def test_threads_coalesce():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        release.wait(5)
+        return "answer"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do("k", slow))) for _ in range(4)]
+    threads[0].start()
+    while not calls:
+        time.sleep(0.001)
+    for t in threads[1:]:
+        t.start()
+    while flight.coalesced < 3:
+        time.sleep(0.001)
+    release.set()
+    for t in threads:
+        t.join()
+
+    assert results == ["answer"] * 4
+    assert len(calls) == 1
+
+
+def test_client_merges_equal_bodies_regardless_of_key_order():
+    upstream = Upstream()
+    client = CoalescingBedrockClient(upstream)
+
+    async def scenario():
+        return await asyncio.gather(
+            client.ainvoke_model("m", {"a": 1, "b": 2}),
+            client.ainvoke_model("m", {"b": 2, "a": 1}),
+            client.ainvoke_model("other", {"a": 1, "b": 2}),
+        )
+
+    first, second, other = asyncio.run(scenario())
+    assert first is second
+    assert other["model"] == "other"
+    assert upstream.calls == 2
@@ -0,0 +1,56 @@
+import json
+
+from inference.streaming import JsonFieldStream, text_delta
+
+ANSWER = (
+    'Sure! {"reason": "Too \\"vague\\" \\u00e9", "nested": {"reason": "skip me"}, "list": ["skip"], '
+    '"suggestedDefiningObjective": "X", "alternativeDefiningObjective": "Y"} and a postscript {"reason": "no"}'
+)
+
+
+def feed_in(fragments):
+    stream = JsonFieldStream()
+    emitted = []
+    for fragment in fragments:
+        emitted.append(stream.feed(fragment))
+    return stream, emitted
+
+
+def test_reports_top_level_string_fields_once_complete():
+    stream, emitted = feed_in([ANSWER])
+    assert emitted == [
+        [("reason", 'Too "vague" é'), ("suggestedDefiningObjective", "X"), ("alternativeDefiningObjective", "Y")]
+    ]
+    assert stream.text == ANSWER
+
+
+def test_fields_arrive_with_their_closing_quote_one_character_at_a_time():
+    stream, emitted = feed_in(ANSWER)
+    fields = [(i, f) for i, completed in enumerate(emitted) for f in completed]
+
+    assert [f for _, f in fields] == [
+        ("reason", 'Too "vague" é'),
+        ("suggestedDefiningObjective", "X"),
+        ("alternativeDefiningObjective", "Y"),
+    ]
+    # each field is reported on the fragment holding its closing quote, not later
+    assert all(ANSWER[i] == '"' for i, _ in fields)
+    assert stream.text == ANSWER
+
+
+def test_escapes_split_across_fragments():
+    text = json.dumps({"reason": 'a "quoted" \\ path'})
+    _, emitted = feed_in([text[:15], text[15:16], text[16:]])
+    assert [f for completed in emitted for f in completed] == [("reason", 'a "quoted" \\ path')]
+
+
+def test_non_string_values_are_skipped():
+    _, emitted = feed_in(['{"score": 0.9, "ok": true, "reason": "r"}'])
+    assert emitted == [[("reason", "r")]]
+
+
+def test_text_delta():
+    assert text_delta({"type": "content_block_delta", "delta": {"type": "text_delta", "text": "ab"}}) == "ab"
+    assert text_delta({"type": "content_block_delta", "delta": {"type": "input_json_delta", "partial_json": '{"a'}}) == '{"a'
+    assert text_delta({"type": "message_delta", "delta": {"stop_reason": "end_turn"}}) == ""
+    assert text_delta({"type": "content_block_delta"}) == ""
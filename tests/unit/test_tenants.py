@@ -0,0 +1,167 @@
+import asyncio
+import contextvars
+import gc
+
+import pytest
+
+from core import tenants as tenants_module
+from core.concurrency import AdaptiveLimiter, current_share
+from core.tenants import QuotaExceeded, Tenant, Tenants, TokenBucket, hash_key, release_with
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture(autouse=True)
+def share():
+    # admit() sets the share in the caller's context, which is the test's here
+    token = current_share.set(("", 1.0))
+    yield
+    current_share.reset(token)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(tenants_module, "time", clock)
+    return clock
+
+
+def test_authenticates_by_key_digest():
+    tenants = Tenants.from_config(
+        {"acme": {"key_sha256": hash_key("acme-key").hex()}, "jobs": "jobs-key"},
+        api_key="legacy-key",
+    )
+    assert tenants.authenticate("acme-key").name == "acme"
+    assert tenants.authenticate("jobs-key").name == "jobs"
+    assert tenants.authenticate("legacy-key").name == "default"
+    assert all(t.key_hash != b"acme-key" for t in tenants.tenants)
+
+
+@pytest.mark.parametrize("key", ["unknown", "", None, "acme-key ", hash_key("acme-key").hex()])
+def test_rejects_unknown_and_empty_keys(key):
+    tenants = Tenants.from_config({"acme": {"key": "acme-key"}})
+    assert tenants.authenticate(key) is None
+
+
+def test_reload_keeps_unchanged_tenants_with_their_state():
+    first = Tenants.from_config({"acme": {"key": "a", "rate": 5}, "jobs": {"key": "j", "rate": 1}})
+    first.tenants[0].in_flight = 3
+    second = Tenants.from_config({"acme": {"key": "a", "rate": 5}, "jobs": {"key": "j", "rate": 2}}, previous=first)
+    assert second.tenants[0] is first.tenants[0]
+    assert second.tenants[1] is not first.tenants[1]
+
+
+def test_token_bucket_refills_at_its_rate(clock):
+    bucket = TokenBucket(rate=2, burst=2)
+    assert bucket.take() == 0.0
+    assert bucket.take() == 0.0
+    assert bucket.take() == pytest.approx(0.5)
+    clock.now += 0.5
+    assert bucket.take() == 0.0
+
+
+def test_token_bucket_lets_a_large_cost_through_into_debt(clock):
+    bucket = TokenBucket(rate=2, burst=2)
+    assert bucket.take(5) == 0.0  # bucket full: allowed, leaves it 3 tokens short
+    assert bucket.tokens == -3
+    assert bucket.take(1) == pytest.approx(2.0)  # (1 - -3) / 2
+    assert bucket.take(5) == pytest.approx(2.5)  # needs a full bucket, not 5 tokens
+    clock.now += 2.5
+    assert bucket.take(5) == 0.0
+
+
+def test_rate_limited_admission_carries_retry_after(clock):
+    tenant = Tenant("acme", hash_key("k"), rate=1, burst=1)
+    tenant.admit()()
+    with pytest.raises(QuotaExceeded) as limited:
+        tenant.admit()
+    assert limited.value.retry_after == pytest.approx(1.0)
+    assert (tenant.admitted, tenant.rate_limited) == (1, 1)
+
+
+def test_concurrency_cap_and_idempotent_release():
+    tenant = Tenant("acme", hash_key("k"), max_concurrency=1)
+    release = tenant.admit()
+    with pytest.raises(QuotaExceeded) as limited:
+        tenant.admit()
+    assert limited.value.retry_after == 1.0
+
+    release()
+    release()
+    assert tenant.in_flight == 0
+    tenant.admit()
+    assert tenant.stats() == {
+        "tenant": "acme",
+        "in_flight": 1,
+        "admitted": 2,
+        "rate_limited": 0,
+        "concurrency_limited": 1,
+    }
+
+
+def test_concurrency_rejection_takes_no_tokens(clock):
+    tenant = Tenant("acme", hash_key("k"), rate=1, burst=2, max_concurrency=1)
+    tenant.admit()
+    with pytest.raises(QuotaExceeded):
+        tenant.admit()
+    assert tenant.bucket.tokens == 1
+
+
+def test_released_when_the_holder_is_collected():
+    tenant = Tenant("acme", hash_key("k"))
+
+    class Body:
+        pass
+
+    body = Body()
+    release_with(body, tenant.admit())
+    assert tenant.in_flight == 1
+    del body
+    gc.collect()
+    assert tenant.in_flight == 0
+
+
+def test_admission_schedules_under_the_tenant_share():
+    tenant = Tenant("acme", hash_key("k"), weight=3)
+    context = contextvars.copy_context()
+    context.run(tenant.admit)
+    assert context[current_share] == ("acme", 3)
+    assert current_share.get() == ("", 1.0)
+
+
+def test_weighted_share_gets_queued_slots_in_proportion():
+    heavy = Tenant("heavy", hash_key("h"), weight=2)
+    light = Tenant("light", hash_key("l"), weight=1)
+
+    async def scenario():
+        limiter = AdaptiveLimiter(initial_limit=1, max_queue=16)
+        order = []
+
+        async def call(tenant, i):
+            release = tenant.admit()
+            try:
+                await limiter.acquire()
+                order.append(f"{tenant.name}{i}")
+                await asyncio.sleep(0)
+                limiter.release(0.01)
+            finally:
+                release()
+
+        await limiter.acquire()
+        tasks = [asyncio.ensure_future(call(heavy, i)) for i in range(4)]
+        tasks += [asyncio.ensure_future(call(light, i)) for i in range(4)]
+        await asyncio.sleep(0)
+        limiter.release(0.01)
+        await asyncio.gather(*tasks)
+        return order
+
+    # virtual finish times: heavy 0.5, 1, 1.5, 2 and light 1, 2, 3, 4 (ties in arrival order)
+    assert asyncio.run(scenario()) == [
+        "heavy0", "heavy1", "light0", "heavy2", "heavy3", "light1", "light2", "light3"
+    ]